@@ -297,11 +297,17 @@ export class EstoqueService {
         .limit(1)
         .get();
 
-      if (snapshot.empty) {
-        return null;
+      if (!snapshot.empty) {
+        return { id: snapshot.docs[0].id, ...snapshot.docs[0].data() };
       }
 
-      return { id: snapshot.docs[0].id, ...snapshot.docs[0].data() };
+      // Sem rascunho do usuário: usa o rascunho automático do fornecedor (reorder_engine)
+      const autoDoc = await this.db.collection('draft_orders').doc(`auto_${supplierId}`).get();
+      if (autoDoc.exists && autoDoc.data()?.status === 'draft') {
+        return { id: autoDoc.id, ...autoDoc.data() };
+      }
+
+      return null;
     } catch (error) {
       console.error('Erro ao buscar rascunho:', error);
       return null;
@@ -349,13 +355,24 @@ export class EstoqueService {
 
   async getUserDrafts(userId: string) {
     try {
-      const snapshot = await this.db.collection('draft_orders')
-        .where('created_by', '==', userId)
-        .where('status', '==', 'draft')
-        .get();
+      const [ownSnapshot, autoSnapshot] = await Promise.all([
+        this.db.collection('draft_orders')
+          .where('created_by', '==', userId)
+          .where('status', '==', 'draft')
+          .get(),
+        // Rascunhos automáticos (tools/calculations/reorder_engine.py) são de todos os usuários
+        this.db.collection('draft_orders')
+          .where('source', '==', 'reorder_engine')
+          .where('status', '==', 'draft')
+          .get(),
+      ]);
 
       // Ordenar no lado do cliente para evitar necessidade de índice composto
-      const drafts = snapshot.docs.map(doc => ({ id: doc.id, ...doc.data() }));
+      const byId = new Map<string, any>();
+      for (const doc of [...ownSnapshot.docs, ...autoSnapshot.docs]) {
+        byId.set(doc.id, { id: doc.id, ...doc.data() });
+      }
+      const drafts = Array.from(byId.values());
       return drafts.sort((a: any, b: any) => {
         const dateA = a.created_at?.toDate?.() || new Date(0);
         const dateB = b.created_at?.toDate?.() || new Date(0);
@@ -65,7 +65,10 @@ export class RelatoriosService {
         const stock = ing.currentStock || ing.current_stock || 0;
         const price = ing.price || 0;
         const grossQty = ing.grossQuantity || ing.gross_quantity || 1;
-        const unitPrice = grossQty > 0 ? price / grossQty : 0;
+        // Custo médio ponderado (tools/estoque/inventory_valuation.py), senão último preço
+        const unitPrice = typeof ing.average_cost === 'number'
+          ? ing.average_cost
+          : (grossQty > 0 ? price / grossQty : 0);
         const value = stock * unitPrice;
 
         totalValue += value;
@@ -1,54 +1,348 @@
 #!/usr/bin/env python3
 """
 Helper para inicializar Firebase com database montuvia1 (São Paulo)
+
+O cliente Firestore é criado uma única vez por processo (lazy, thread-safe)
+e compartilhado por todos os tools. Opções do canal gRPC podem ser
+configuradas por variáveis de ambiente ou por configure_firestore_client().
+
+Backend de storage (STORAGE_BACKEND):
+- firestore (padrão): database montuvia1 com firebase-credentials.json
+- emulator: Firestore Emulator em FIRESTORE_EMULATOR_HOST (sem credenciais)
+- memory: banco em memória (tools/common/memory_store.py) para benchmark
+  offline; MEMORY_STORE_LATENCY_MS simula latência por round trip e
+  MEMORY_STORE_PATH persiste o estado entre processos
+
+Todos os backends passam pelo proxy de tools/common/instrumentation.py, que
+conta leituras/escritas/deletes/queries por etapa (get_op_stats()).
 """
 
 import os
+import sys
+import time
+import atexit
+import threading
+import weakref
 from pathlib import Path
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, storage
-from google.cloud import firestore
-from google.oauth2 import service_account
+
+# firebase_admin / google.cloud são importados sob demanda (startup rápido
+# para tools e subcomandos que não chegam a falar com o Firebase)
 
 # Load environment variables
 PROJECT_ROOT = Path(__file__).parent  # firebase_helper.py is in project root
 env_path = PROJECT_ROOT / '.env'
 load_dotenv(env_path)
 
+CREDENTIALS_PATH = PROJECT_ROOT / 'firebase-credentials.json'
+DATABASE_ID = 'montuvia1'  # Database in São Paulo
+
+STORAGE_BACKENDS = ('firestore', 'emulator', 'memory')
+
+# Opções do canal gRPC (sobrescrevíveis via env ou configure_firestore_client)
+CHANNEL_OPTIONS = {
+    'grpc.keepalive_time_ms': int(os.getenv('FIRESTORE_GRPC_KEEPALIVE_MS', '30000')),
+    'grpc.keepalive_timeout_ms': int(os.getenv('FIRESTORE_GRPC_KEEPALIVE_TIMEOUT_MS', '10000')),
+    'grpc.max_send_message_length': int(os.getenv('FIRESTORE_GRPC_MAX_MESSAGE_MB', '32')) * 1024 * 1024,
+    'grpc.max_receive_message_length': int(os.getenv('FIRESTORE_GRPC_MAX_MESSAGE_MB', '32')) * 1024 * 1024,
+    # 1 = subchannel pool próprio do canal (não compartilhado com outros canais do processo)
+    'grpc.use_local_subchannel_pool': int(os.getenv('FIRESTORE_GRPC_LOCAL_SUBCHANNEL_POOL', '0')),
+}
+
+_lock = threading.Lock()
+_service_account_creds = None
+_firestore_client = None
+_async_clients = weakref.WeakKeyDictionary()  # event loop → AsyncClient
+_client_stats = {
+    'builds': 0,
+    'cacheHits': 0,
+    'setupMs': 0.0,
+}
+
+def _check_credentials_file():
+    if not CREDENTIALS_PATH.exists():
+        raise FileNotFoundError(
+            f"firebase-credentials.json not found at {CREDENTIALS_PATH}"
+        )
+
+def init_firebase_app():
+    """
+    Inicializa o Firebase Admin uma única vez por processo
+
+    Tools não devem chamar firebase_admin.initialize_app diretamente.
+
+    Returns:
+        firebase_admin.App: App padrão
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _lock:
+        if not firebase_admin._apps:
+            _check_credentials_file()
+            cred = credentials.Certificate(str(CREDENTIALS_PATH))
+            firebase_admin.initialize_app(cred, {
+                'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET'),
+            })
+        return firebase_admin.get_app()
+
+def configure_firestore_client(**channel_options):
+    """
+    Ajusta opções do canal gRPC antes da criação do cliente
+
+    Ex: configure_firestore_client(**{'grpc.keepalive_time_ms': 60000})
+
+    Raises:
+        RuntimeError: Se o cliente já foi criado neste processo
+    """
+    with _lock:
+        if _firestore_client is not None:
+            raise RuntimeError("Cliente Firestore já criado; configure antes do primeiro uso")
+        CHANNEL_OPTIONS.update(channel_options)
+
+def _load_service_account_creds():
+    global _service_account_creds
+    if _service_account_creds is None:
+        from google.oauth2 import service_account
+
+        _check_credentials_file()
+        _service_account_creds = service_account.Credentials.from_service_account_file(
+            str(CREDENTIALS_PATH)
+        )
+    return _service_account_creds
+
+def _install_grpc_channel(db):
+    """
+    Cria o canal gRPC do cliente com CHANNEL_OPTIONS
+
+    O google-cloud-firestore fixa apenas keepalive_time_ms e firestore.Client
+    não aceita transport próprio; aqui o cliente GAPIC é montado com um
+    FirestoreGrpcTransport sobre o canal configurado. Se os atributos
+    internos do Client mudarem (AttributeError/TypeError), nada é trocado e
+    fica o canal padrão da biblioteca.
+    """
+    try:
+        from google.cloud.firestore_v1.services.firestore import client as firestore_api_client
+        from google.cloud.firestore_v1.services.firestore.transports import grpc as firestore_grpc
+    except ImportError:
+        return
+
+    if getattr(db, '_emulator_host', None) is not None:
+        return
+
+    try:
+        if not hasattr(db, '_firestore_api_internal'):
+            raise AttributeError("firestore.Client sem '_firestore_api_internal'")
+        transport_class = firestore_grpc.FirestoreGrpcTransport
+        channel = transport_class.create_channel(
+            db._target,
+            credentials=db._credentials,
+            options=list(CHANNEL_OPTIONS.items()),
+        )
+        transport = transport_class(host=db._target, channel=channel)
+        firestore_api = firestore_api_client.FirestoreClient(
+            transport=transport, client_options=db._client_options
+        )
+    except (AttributeError, TypeError) as e:
+        print(f"⚠ Opções do canal gRPC ignoradas, usando o canal padrão: {e}", file=sys.stderr)
+        return
+
+    # Só troca depois que transporte e cliente GAPIC foram criados
+    db._transport = transport
+    db._firestore_api_internal = firestore_api
+
 def get_firestore_client():
     """
     Retorna cliente Firestore configurado para database montuvia1
 
+    O cliente é criado na primeira chamada e reutilizado pelo resto do
+    processo (credenciais lidas do disco uma única vez).
+
     Returns:
         firestore.Client: Cliente Firestore conectado ao database montuvia1
     """
-    creds_path = PROJECT_ROOT / 'firebase-credentials.json'
+    global _firestore_client
 
-    if not creds_path.exists():
-        raise FileNotFoundError(
-            f"firebase-credentials.json not found at {creds_path}"
-        )
+    client = _firestore_client
+    if client is not None:
+        _client_stats['cacheHits'] += 1
+        return client
+
+    with _lock:
+        if _firestore_client is not None:
+            _client_stats['cacheHits'] += 1
+            return _firestore_client
 
-    # Inicializar Firebase Admin se ainda não foi
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(str(creds_path))
-        firebase_admin.initialize_app(cred, {
-            'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET'),
-        })
+        started = time.perf_counter()
+        backend = get_storage_backend()
 
-    # Criar cliente Firestore com credenciais explícitas
-    creds = service_account.Credentials.from_service_account_file(
-        str(creds_path)
+        if backend == 'memory':
+            db = _build_memory_store()
+        elif backend == 'emulator':
+            db = _build_emulator_client()
+        else:
+            from google.cloud import firestore
+            creds = _load_service_account_creds()
+
+            db = firestore.Client(
+                project=os.getenv('FIREBASE_PROJECT_ID', 'restges-montuvia'),
+                credentials=creds,
+                database=DATABASE_ID
+            )
+            _install_grpc_channel(db)
+
+        _client_stats['builds'] += 1
+        _client_stats['setupMs'] = (time.perf_counter() - started) * 1000
+        _firestore_client = _instrument(db)
+
+    # Inicializar Firebase Admin (Storage) fora do lock do cliente
+    if backend == 'firestore':
+        init_firebase_app()
+    return _firestore_client
+
+def get_storage_backend():
+    """Backend configurado em STORAGE_BACKEND (firestore | emulator | memory)"""
+    backend = os.getenv('STORAGE_BACKEND', 'firestore').lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND inválido: {backend}. Use: {', '.join(STORAGE_BACKENDS)}")
+    return backend
+
+def _build_memory_store():
+    from tools.common.memory_store import MemoryStore
+
+    store = MemoryStore(
+        latency_ms=float(os.getenv('MEMORY_STORE_LATENCY_MS', '0')),
+        jitter_ms=float(os.getenv('MEMORY_STORE_JITTER_MS', '0')),
     )
+    path = os.getenv('MEMORY_STORE_PATH')
+    if path:
+        if Path(path).exists():
+            store.load(path)
+        atexit.register(store.dump, path, only_changes=True)
+    return store
+
+def _build_emulator_client():
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore
 
-    db = firestore.Client(
+    os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+    return firestore.Client(
         project=os.getenv('FIREBASE_PROJECT_ID', 'restges-montuvia'),
-        credentials=creds,
-        database='montuvia1'  # Database in São Paulo
+        credentials=AnonymousCredentials(),
+        database=DATABASE_ID
     )
 
-    return db
+def _instrument(db, is_async=False):
+    """Embrulha o cliente no proxy de contabilidade (FIRESTORE_INSTRUMENTATION=0 desliga)"""
+    from tools.common.instrumentation import (
+        instrumentation_enabled, InstrumentedClient, AsyncInstrumentedClient
+    )
+
+    if not instrumentation_enabled():
+        return db
+    return AsyncInstrumentedClient(db) if is_async else InstrumentedClient(db)
+
+def _raw_client(db):
+    return getattr(db, '_inner', db)
+
+def use_client(client):
+    """
+    Substitui o cliente compartilhado do processo (ex: MemoryStore já populado)
+
+    Usado por benchmarks/testes de carga que preparam os dados em memória.
+    """
+    global _firestore_client
+    with _lock:
+        _firestore_client = _instrument(_raw_client(client))
+        _async_clients.clear()
+
+def server_timestamp():
+    """Sentinel de timestamp do servidor compatível com o backend ativo"""
+    if get_storage_backend() == 'memory':
+        from tools.common.memory_store import SERVER_TIMESTAMP
+        return SERVER_TIMESTAMP
+    from google.cloud import firestore
+    return firestore.SERVER_TIMESTAMP
+
+def increment(value):
+    """Transform de incremento atômico compatível com o backend ativo"""
+    if get_storage_backend() == 'memory':
+        from tools.common.memory_store import Increment
+        return Increment(value)
+    from google.cloud import firestore
+    return firestore.Increment(value)
+
+def transform_values(write_result):
+    """
+    Valores finais dos transforms (increment, server_timestamp) de uma escrita commitada
+
+    Args:
+        write_result: Item do retorno de batch.commit()
+
+    Returns:
+        list: Valores Python, na ordem dos transforms da escrita
+    """
+    values = list(getattr(write_result, 'transform_results', None) or [])
+    if get_storage_backend() == 'memory':
+        return values
+    from google.cloud.firestore_v1 import _helpers
+    return [_helpers.decode_value(value, None) for value in values]
+
+def get_async_firestore_client():
+    """
+    Retorna cliente Firestore assíncrono (AsyncClient) para o database montuvia1
+
+    O canal gRPC assíncrono fica preso ao event loop em que foi criado, então
+    o cache é por event loop (um cliente por asyncio.run). As credenciais
+    continuam sendo lidas do disco uma única vez por processo.
+
+    Returns:
+        firestore.AsyncClient: Cliente assíncrono
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+
+    if get_storage_backend() == 'memory':
+        from tools.common.memory_store import AsyncMemoryStore
+        return _instrument(AsyncMemoryStore(_raw_client(get_firestore_client())), is_async=True)
+
+    from google.cloud import firestore
+
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            if get_storage_backend() == 'emulator':
+                from google.auth.credentials import AnonymousCredentials
+                os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+                credentials = AnonymousCredentials()
+            else:
+                credentials = _load_service_account_creds()
+            client = firestore.AsyncClient(
+                project=os.getenv('FIREBASE_PROJECT_ID', 'restges-montuvia'),
+                credentials=credentials,
+                database=DATABASE_ID
+            )
+            client = _instrument(client, is_async=True)
+            _async_clients[loop] = client
+
+    return client
+
+def get_client_stats():
+    """
+    Estatísticas do cliente compartilhado neste processo
+
+    estimatedSavedMs = custo de setup × chamadas servidas pelo cache
+    (cada uma antes recriava credenciais e cliente).
+
+    Returns:
+        dict: {'builds', 'cacheHits', 'setupMs', 'estimatedSavedMs'}
+    """
+    return {
+        **_client_stats,
+        'setupMs': round(_client_stats['setupMs'], 2),
+        'estimatedSavedMs': round(_client_stats['setupMs'] * _client_stats['cacheHits'], 2),
+    }
 
 def get_storage_bucket():
     """
@@ -57,4 +351,6 @@ def get_storage_bucket():
     Returns:
         storage.Bucket: Bucket do Firebase Storage
     """
+    from firebase_admin import storage
+    init_firebase_app()
     return storage.bucket()
@@ -0,0 +1,81 @@
+"""
+Reorder engine: pedidos já enviados contam como estoque a caminho
+
+Roda no MemoryStore (STORAGE_BACKEND=memory), sem o database montuvia1.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'tools' / 'vendas'))
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ.setdefault('WRITE_RATE_START', '0')
+
+from firebase_helper import get_firestore_client, use_client
+from tools.common import write_scheduler
+from tools.common.memory_store import MemoryStore
+from tools.calculations.reorder_engine import build_draft_orders
+from update_stock_from_sales import update_stock_from_sales
+
+@pytest.fixture
+def db():
+    use_client(MemoryStore())
+    write_scheduler._shared = None  # o scheduler do processo guarda o cliente anterior
+    db = get_firestore_client()
+    db.seed('suppliers', {'sup1': {'name': 'Hortifruti', 'delivery_time': 2}})
+    db.seed('ingredients', {
+        'limao': {
+            'name': 'Limão', 'unit': 'kg', 'current_stock': 3, 'currentStock': 3,
+            'min_stock': 5, 'max_stock': 20, 'avg_daily_consumption': 1,
+            'supplier_id': 'sup1', 'price': 8
+        }
+    })
+    db.seed('recipes', {
+        'caipirinha': {'name': 'Caipirinha', 'portions': 1,
+                       'ingredients': [{'ingredientId': 'limao', 'quantity': 0.1, 'unit': 'kg'}]}
+    })
+    return db
+
+def finalize_draft(db, draft_id):
+    """Mesmas escritas de EstoqueService.finalizeDraft (pedido + recebimento aguardando entrega)"""
+    draft = db.collection('draft_orders').document(draft_id).get().to_dict()
+    items = [dict(item, unit_price=item.get('unit_price') or 1) for item in draft['items']]
+    purchase_ref = db.collection('purchases').document()
+    receiving_ref = db.collection('receivings').document()
+    purchase_ref.set({
+        'supplier_id': draft['supplier_id'], 'status': 'pending', 'receiving_id': receiving_ref.id,
+        'items': [{'ingredient_id': i['ingredient_id'], 'quantity': i['quantity'], 'unit': i['unit']} for i in items]
+    })
+    receiving_ref.set({
+        'purchase_id': purchase_ref.id, 'supplier_id': draft['supplier_id'], 'status': 'awaiting_delivery',
+        'checklist': [{'ingredient_id': i['ingredient_id'], 'ordered_qty': i['quantity'], 'received_qty': 0}
+                      for i in items]
+    })
+    db.collection('draft_orders').document(draft_id).delete()
+
+def test_finalized_order_then_new_upload_does_not_duplicate_draft(db):
+    first = build_draft_orders(user='u1')
+    assert [d['id'] for d in first['drafts']] == ['auto_sup1']
+
+    finalize_draft(db, 'auto_sup1')
+
+    update_stock_from_sales({'validSales': [{'recipeId': 'caipirinha', 'quantity': 5}]}, 'upload_2')
+    second = build_draft_orders(user='u1')
+
+    assert second['drafts'] == []
+    assert not db.collection('draft_orders').document('auto_sup1').get().exists
+
+def test_cancelled_order_is_not_counted(db):
+    build_draft_orders(user='u1')
+    finalize_draft(db, 'auto_sup1')
+    for collection in ('purchases', 'receivings'):
+        for doc in db.collection(collection).stream():
+            doc.reference.update({'status': 'cancelled'})
+
+    again = build_draft_orders(user='u1')
+    assert [d['id'] for d in again['drafts']] == ['auto_sup1']
@@ -0,0 +1,55 @@
+"""
+Baixa de estoque por vendas: increment atômico + saldos do ledger commitados
+
+Roda no MemoryStore (STORAGE_BACKEND=memory), sem o database montuvia1.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'tools' / 'vendas'))
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ.setdefault('WRITE_RATE_START', '0')
+
+from firebase_helper import get_firestore_client, use_client
+from tools.common import write_scheduler
+from tools.common.memory_store import MemoryStore
+import update_stock_from_sales
+
+@pytest.fixture
+def db():
+    use_client(MemoryStore())
+    write_scheduler._shared = None  # o scheduler do processo guarda o cliente anterior
+    db = get_firestore_client()
+    db.seed('ingredients', {'limao': {'name': 'Limão', 'unit': 'kg', 'currentStock': 3}})
+    db.seed('recipes', {
+        'caipirinha': {'name': 'Caipirinha', 'portions': 1,
+                       'ingredients': [{'ingredientId': 'limao', 'quantity': 1, 'unit': 'kg'}]}
+    })
+    return db
+
+def test_concurrent_adjustment_is_not_overwritten(db, monkeypatch):
+    plan = update_stock_from_sales.plan_stock_updates
+
+    def plan_then_receive(*args):
+        planned = plan(*args)
+        # Recebimento gravado entre a leitura do ingrediente e o commit da baixa
+        db.collection('ingredients').document('limao').update({'currentStock': 10})
+        return planned
+
+    monkeypatch.setattr(update_stock_from_sales, 'plan_stock_updates', plan_then_receive)
+    result = update_stock_from_sales.update_stock_from_sales(
+        {'validSales': [{'recipeId': 'caipirinha', 'quantity': 12}]}, 'upload_1'
+    )
+
+    assert result['errors'] == []
+    assert db.collection('ingredients').document('limao').get().to_dict()['currentStock'] == -2
+
+    movements = [doc.to_dict() for doc in db.collection('stock_movements').stream()]
+    assert [(m['previous_stock'], m['new_stock'], m['quantity']) for m in movements] == [(10, -2, -12)]
+    assert [w['newStock'] for w in result['warnings']] == [-2]
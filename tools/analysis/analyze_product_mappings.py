@@ -7,20 +7,37 @@ Gera relatório detalhado de:
 2. Inconsistências e duplicatas
 3. Sugestões de padronização
 4. Produtos não mapeados
+
+Uso:
+    python tools/analysis/analyze_product_mappings.py [--replica] [--sync-replica] [--no-cache]
+        [--from 2024-01] [--to 2024-03]
+
+--replica lê mapeamentos/receitas da réplica local SQLite
+(tools/replica/local_replica.py) em vez de varrer o Firestore;
+--sync-replica atualiza a réplica (incremental) antes.
+
+Execuções são incrementais: o cache (.tmp/mapping_analysis_cache.json)
+guarda o relatório Zig já agregado (relido só se o Excel mudar) e os
+matches fuzzy por (nome Zig normalizado, fingerprint do conjunto de
+receitas): o fuzzy só roda para nomes Zig ainda não vistos ou quando o
+conjunto de receitas muda. O hash de cada mapeamento entra só nos
+contadores do relatório (novos/alterados, inalterados, removidos).
+--no-cache recalcula tudo.
+
+Vendas por produto vêm do histórico Parquet (tools/vendas/sales_history.py,
+período via --from/--to); sem histórico ingerido, do Excel de janeiro.
 """
 
 import os
 import sys
+import hashlib
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
-from google.cloud import firestore
 from firebase_helper import get_firestore_client
-import pandas as pd
-from fuzzywuzzy import fuzz
-from collections import defaultdict
+from tools.vendas.sales_history import LEGACY_ZIG_REPORT, history_available, product_sales_counts
+from tools.analysis.find_near_duplicates import find_clusters, normalize_key
+from datetime import datetime
 import json
 
 # Load environment variables
@@ -28,14 +45,126 @@ project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
 load_dotenv(env_path)
 
-# Initialize Firebase
-creds_path = project_root / 'firebase-credentials.json'
-cred = credentials.Certificate(str(creds_path))
-firebase_admin.initialize_app(cred)
-db = get_firestore_client()
-
-def get_mappings():
-    """Busca todos os mapeamentos do Firebase"""
+CACHE_PATH = Path(os.getenv('MAPPING_ANALYSIS_CACHE', project_root / '.tmp' / 'mapping_analysis_cache.json'))
+CACHE_VERSION = 2
+FUZZY_THRESHOLD = 60
+
+def get_confidence(mapping):
+    """Confidence do mapeamento como float (o campo aparece como str ou número)"""
+    conf = mapping.get('confidence', 0)
+    if isinstance(conf, str):
+        try:
+            return float(conf)
+        except ValueError:
+            return 0.0
+    return float(conf) if conf else 0.0
+
+def normalize_name(name):
+    return ' '.join(str(name or '').lower().split())
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+def recipe_fingerprint(recipes):
+    """Identifica o conjunto de receitas (IDs e nomes) usado nos matches fuzzy"""
+    return _digest(sorted((r['doc_id'], r.get('name', '')) for r in recipes))
+
+def mapping_hash(mapping):
+    """Hash dos campos do mapeamento que entram no relatório"""
+    return _digest([mapping.get(k) for k in ('sku', 'product_name_zig', 'recipe_name', 'recipe_id', 'confidence')])
+
+class AnalysisCache:
+    """
+    Cache entre execuções da análise
+
+    Matches fuzzy só valem para o fingerprint de receitas com que foram
+    calculados: ao salvar, entradas de outros fingerprints e nomes que não
+    apareceram nesta execução são descartadas.
+    """
+
+    def __init__(self, path=CACHE_PATH, enabled=True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.data = {'version': CACHE_VERSION, 'zig': None, 'mappings': {}, 'fuzzy': {}}
+        self.stats = {'fuzzyHits': 0, 'fuzzyComputed': 0, 'mappingsChanged': 0, 'mappingsUnchanged': 0,
+                      'mappingsRemoved': 0, 'zigCached': False}
+        self._used_fuzzy = set()
+
+        if enabled and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('version') == CACHE_VERSION:
+                    self.data = saved
+            except (OSError, ValueError):
+                pass  # cache corrompido: recalcula
+
+    def zig_products(self, excel_path, loader):
+        """Produtos do Excel, relidos só se mtime/tamanho mudaram"""
+        stat = Path(excel_path).stat()
+        key = {'path': str(excel_path), 'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+        cached = self.data.get('zig')
+        if self.enabled and cached and cached['key'] == key:
+            self.stats['zigCached'] = True
+            return cached['products']
+
+        products = loader(excel_path)
+        self.data['zig'] = {'key': key, 'products': products}
+        return products
+
+    def diff_mappings(self, mappings):
+        """
+        Compara os mapeamentos com a execução anterior (contadores em stats)
+
+        Returns:
+            set: doc_ids novos ou alterados
+        """
+        previous = self.data.get('mappings', {}) if self.enabled else {}
+        current = {m['doc_id']: mapping_hash(m) for m in mappings}
+        changed = {doc_id for doc_id, h in current.items() if previous.get(doc_id) != h}
+
+        self.stats['mappingsChanged'] = len(changed)
+        self.stats['mappingsUnchanged'] = len(current) - len(changed)
+        self.stats['mappingsRemoved'] = len(set(previous) - set(current))
+        self.data['mappings'] = current
+        return changed
+
+    def matches(self, zig_name, recipes, fingerprint):
+        """find_better_matches com cache por (nome normalizado, fingerprint)"""
+        key = f"{fingerprint}:{normalize_name(zig_name)}"
+        self._used_fuzzy.add(key)
+        cached = self.data['fuzzy'].get(key)
+        if self.enabled and cached is not None:
+            self.stats['fuzzyHits'] += 1
+            return cached
+
+        self.stats['fuzzyComputed'] += 1
+        result = find_better_matches(zig_name, recipes)
+        self.data['fuzzy'][key] = result
+        return result
+
+    def save(self):
+        if not self.enabled:
+            return
+        self.data['fuzzy'] = {k: v for k, v in self.data['fuzzy'].items() if k in self._used_fuzzy}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+def load_from_replica(collection):
+    """Documentos da réplica local, no mesmo formato de get_mappings/get_recipes"""
+    from tools.replica.local_replica import load_documents
+
+    return [{**data, 'doc_id': doc_id} for doc_id, data in load_documents(collection)]
+
+def get_mappings(use_replica=False):
+    """Busca todos os mapeamentos do Firebase (ou da réplica local)"""
+    if use_replica:
+        return load_from_replica('product_mappings')
+
+    db = get_firestore_client()
     mappings_ref = db.collection('product_mappings')
     mappings = []
 
@@ -46,8 +175,12 @@ def get_mappings():
 
     return mappings
 
-def get_recipes():
-    """Busca todas as receitas do Firebase"""
+def get_recipes(use_replica=False):
+    """Busca todas as receitas do Firebase (ou da réplica local)"""
+    if use_replica:
+        return load_from_replica('recipes')
+
+    db = get_firestore_client()
     recipes_ref = db.collection('recipes')
     recipes = []
 
@@ -58,14 +191,34 @@ def get_recipes():
 
     return recipes
 
-def load_zig_data():
-    """Carrega dados originais do relatório Zig"""
-    excel_path = project_root / "Relatório de produtos vendidos - janeiro.xlsx"
+def _records(products):
+    # Tipos numpy → nativos (o resultado vai para o cache em JSON)
+    return [
+        {key: (value.item() if hasattr(value, 'item') else value) for key, value in record.items()}
+        for record in products.to_dict('records')
+    ]
+
+def read_zig_report(excel_path):
+    """Lê o Excel do Zig e agrega produtos únicos com contagem de vendas"""
+    import pandas as pd
+
     df = pd.read_excel(excel_path)
 
     # Produtos únicos com contagem de vendas
-    products = df.groupby(['SKU', 'Nome do Produto']).size().reset_index(name='vendas_janeiro')
-    return products.to_dict('records')
+    return _records(df.groupby(['SKU', 'Nome do Produto']).size().reset_index(name='vendas'))
+
+def load_zig_data(cache=None, start=None, end=None):
+    """
+    Produtos do Zig com contagem de vendas no período
+
+    Com histórico de vendas a consulta lê só as colunas e partições do
+    período; sem histórico, lê o Excel de janeiro (do cache se não mudou).
+    """
+    if history_available():
+        return _records(product_sales_counts(start, end))
+    if cache is None:
+        return read_zig_report(LEGACY_ZIG_REPORT)
+    return cache.zig_products(LEGACY_ZIG_REPORT, read_zig_report)
 
 def analyze_name_patterns(mappings, recipes):
     """Analisa padrões nos nomes para sugerir padronizações"""
@@ -100,36 +253,34 @@ def analyze_name_patterns(mappings, recipes):
                 'suggested': ' '.join(zig_name.split())
             })
 
-    # Verificar duplicatas semânticas
-    recipe_names = [r['name'] for r in recipes]
-    seen = defaultdict(list)
-
-    for recipe in recipes:
-        normalized = recipe['name'].lower().strip()
-        seen[normalized].append(recipe)
-
-    for normalized, recipe_list in seen.items():
-        if len(recipe_list) > 1:
-            patterns['duplicates'].append({
-                'normalized': normalized,
-                'variants': [r['name'] for r in recipe_list],
-                'ids': [r['doc_id'] for r in recipe_list]
-            })
+    # Verificar duplicatas semânticas (quase-duplicatas: tamanhos, acentos, grafia)
+    items = [{'id': r['doc_id'], 'name': r['name']} for r in recipes if r.get('name')]
+    for cluster in find_clusters(items):
+        recipe_list = [items[i] for i in cluster['members']]
+        patterns['duplicates'].append({
+            'normalized': normalize_key(recipe_list[0]['name']),
+            'variants': [r['name'] for r in recipe_list],
+            'ids': [r['id'] for r in recipe_list],
+            'score': cluster['score']
+        })
 
     return patterns
 
-def generate_report(mappings, recipes, zig_products, patterns):
-    """Gera relatório completo de análise"""
+def generate_report(mappings, recipes, zig_products, patterns, cache=None):
+    """
+    Gera relatório completo de análise
 
-    # Helper para converter confidence para float
-    def get_confidence(mapping):
-        conf = mapping.get('confidence', 0)
-        if isinstance(conf, str):
-            try:
-                return float(conf)
-            except:
-                return 0.0
-        return float(conf) if conf else 0.0
+    Com cache, os matches fuzzy de mapeamentos inalterados vêm da execução
+    anterior: a chave (nome normalizado, fingerprint das receitas) só muda
+    quando o nome do mapeamento ou o conjunto de receitas muda.
+    """
+    cache = cache or AnalysisCache(enabled=False)
+    fingerprint = recipe_fingerprint(recipes)
+    cache.diff_mappings(mappings)  # só contadores (cache.stats)
+    sales_index = build_sales_index(zig_products)
+
+    def matches(m):
+        return cache.matches(m['product_name_zig'], recipes, fingerprint)
 
     # Estatísticas gerais
     high_confidence = [m for m in mappings if get_confidence(m) > 0.8]
@@ -137,7 +288,7 @@ def generate_report(mappings, recipes, zig_products, patterns):
     unmapped = [m for m in mappings if not m.get('recipe_id') or get_confidence(m) == 0]
 
     report = {
-        'timestamp': pd.Timestamp.now().isoformat(),
+        'timestamp': datetime.now().isoformat(),
         'statistics': {
             'total_mappings': len(mappings),
             'high_confidence': len(high_confidence),
@@ -162,7 +313,7 @@ def generate_report(mappings, recipes, zig_products, patterns):
                 'recipe_name': m.get('recipe_name', 'N/A'),
                 'recipe_id': m.get('recipe_id', 'N/A'),
                 'confidence': f"{get_confidence(m):.1%}",
-                'suggested_alternatives': find_better_matches(m['product_name_zig'], recipes)[:3]
+                'suggested_alternatives': matches(m)[:3]
             }
             for m in sorted(low_confidence, key=lambda x: get_confidence(x))
         ],
@@ -170,8 +321,8 @@ def generate_report(mappings, recipes, zig_products, patterns):
             {
                 'sku': m['sku'],
                 'zig_name': m['product_name_zig'],
-                'vendas_janeiro': get_sales_count(m['sku'], zig_products),
-                'suggested_matches': find_better_matches(m['product_name_zig'], recipes)[:5]
+                'vendas': get_sales_count(m['sku'], sales_index),
+                'suggested_matches': matches(m)[:5]
             }
             for m in unmapped
         ],
@@ -180,17 +331,21 @@ def generate_report(mappings, recipes, zig_products, patterns):
             'extra_spaces': patterns['extra_spaces'],
             'duplicates': patterns['duplicates']
         },
-        'recommendations': generate_recommendations(mappings, patterns)
+        'recommendations': generate_recommendations(mappings, patterns),
+        'cache': cache.stats
     }
 
     return report
 
-def find_better_matches(zig_name, recipes, threshold=60):
+def find_better_matches(zig_name, recipes, threshold=FUZZY_THRESHOLD):
     """Encontra melhores matches possíveis"""
+    from fuzzywuzzy import fuzz
+
     matches = []
+    zig_name = zig_name.lower()
 
     for recipe in recipes:
-        ratio = fuzz.token_sort_ratio(zig_name.lower(), recipe['name'].lower())
+        ratio = fuzz.token_sort_ratio(zig_name, recipe['name'].lower())
         if ratio >= threshold:
             matches.append({
                 'recipe_name': recipe['name'],
@@ -200,27 +355,21 @@ def find_better_matches(zig_name, recipes, threshold=60):
 
     return sorted(matches, key=lambda x: int(x['similarity'].rstrip('%')), reverse=True)
 
-def get_sales_count(sku, zig_products):
-    """Retorna contagem de vendas do SKU"""
+def build_sales_index(zig_products):
+    """SKU → vendas (primeira ocorrência, como na busca linear anterior)"""
+    index = {}
     for p in zig_products:
-        if p['SKU'] == sku:
-            return p.get('vendas_janeiro', 0)
-    return 0
+        index.setdefault(p['SKU'], p.get('vendas', 0))
+    return index
+
+def get_sales_count(sku, sales_index):
+    """Retorna contagem de vendas do SKU"""
+    return sales_index.get(sku, 0)
 
 def generate_recommendations(mappings, patterns):
     """Gera recomendações de ações"""
     recs = []
 
-    # Helper para converter confidence
-    def get_confidence(mapping):
-        conf = mapping.get('confidence', 0)
-        if isinstance(conf, str):
-            try:
-                return float(conf)
-            except:
-                return 0.0
-        return float(conf) if conf else 0.0
-
     # Recomendação 1: Revisar baixa confiança
     low_conf_count = len([m for m in mappings if get_confidence(m) <= 0.8])
     if low_conf_count > 0:
@@ -301,7 +450,7 @@ def save_report(report, output_path):
             f.write("\n\n❌ PRODUTOS NÃO MAPEADOS\n")
             f.write("-"*80 + "\n")
             for i, p in enumerate(report['unmapped_products'], 1):
-                f.write(f"\n{i}. SKU: {p['sku']} | Vendas: {p['vendas_janeiro']}\n")
+                f.write(f"\n{i}. SKU: {p['sku']} | Vendas: {p['vendas']}\n")
                 f.write(f"   Nome: {p['zig_name']}\n")
                 if p['suggested_matches']:
                     f.write(f"   Sugestões:\n")
@@ -321,21 +470,30 @@ def save_report(report, output_path):
     return json_path, txt_path
 
 def main():
+    use_replica = '--replica' in sys.argv[1:] or '--sync-replica' in sys.argv[1:]
+    cache = AnalysisCache(enabled='--no-cache' not in sys.argv[1:])
+    period = {flag: sys.argv[sys.argv.index(flag) + 1] for flag in ('--from', '--to') if flag in sys.argv[1:-1]}
+
     print("🔍 Analisando mapeamentos Zig × Ficha Técnica...\n")
 
+    if '--sync-replica' in sys.argv[1:]:
+        from tools.replica.local_replica import sync_replica
+        sync_replica(['product_mappings', 'recipes'])
+
     # Buscar dados
-    print("1️⃣ Carregando dados do Firebase...")
-    mappings = get_mappings()
-    recipes = get_recipes()
+    print(f"1️⃣ Carregando dados {'da réplica local' if use_replica else 'do Firebase'}...")
+    mappings = get_mappings(use_replica)
+    recipes = get_recipes(use_replica)
 
     print("2️⃣ Carregando dados do relatório Zig...")
-    zig_products = load_zig_data()
+    zig_products = load_zig_data(cache, period.get('--from'), period.get('--to'))
 
     print("3️⃣ Analisando padrões e qualidade de dados...")
     patterns = analyze_name_patterns(mappings, recipes)
 
     print("4️⃣ Gerando relatório completo...")
-    report = generate_report(mappings, recipes, zig_products, patterns)
+    report = generate_report(mappings, recipes, zig_products, patterns, cache)
+    cache.save()
 
     # Salvar relatório
     output_dir = project_root / 'tools' / 'analysis'
@@ -357,6 +515,10 @@ def main():
     print(f"  ❌ Não mapeados: {report['statistics']['unmapped']}")
     print(f"\nReceitas no sistema: {report['statistics']['total_recipes']}")
     print(f"Produtos no Zig: {report['statistics']['total_zig_products']}")
+    stats = report['cache']
+    print(f"\nCache: {stats['mappingsChanged']} mapeamentos alterados, "
+          f"{stats['fuzzyComputed']} matches calculados / {stats['fuzzyHits']} do cache"
+          f"{', Excel do cache' if stats['zigCached'] else ''}")
     print("\n" + "="*80)
     print("\n🎯 Próximo passo: Revisar relatório e aprovar correções\n")
 
@@ -17,8 +17,6 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
 from google.cloud import firestore
 from firebase_helper import get_firestore_client
 import json
@@ -29,15 +27,6 @@ project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
 load_dotenv(env_path)
 
-# Initialize Firebase
-creds_path = project_root / 'firebase-credentials.json'
-cred = credentials.Certificate(str(creds_path))
-
-# Verifica se Firebase já foi inicializado
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = get_firestore_client()
-
 def load_cleanup_config():
     """Carrega configuração de limpeza aprovada pelo usuário"""
     config_path = project_root / 'tools' / 'analysis' / 'cleanup_config.json'
@@ -68,6 +57,7 @@ def normalize_text(text):
 
 def apply_capitalization_fixes(dry_run=True):
     """Aplica correções de capitalization"""
+    db = get_firestore_client()
     print("\n1️⃣ Aplicando correções de capitalization...")
 
     # Atualizar product_mappings
@@ -113,6 +103,7 @@ def apply_capitalization_fixes(dry_run=True):
 
 def update_approved_mappings(mapping_updates, dry_run=True):
     """Atualiza mapeamentos aprovados pelo usuário"""
+    db = get_firestore_client()
     print("\n2️⃣ Atualizando mapeamentos aprovados...")
 
     if not mapping_updates:
@@ -156,6 +147,7 @@ def update_approved_mappings(mapping_updates, dry_run=True):
 
 def merge_duplicate_recipes(duplicates, dry_run=True):
     """Consolida receitas duplicadas"""
+    db = get_firestore_client()
     print("\n3️⃣ Consolidando receitas duplicadas...")
 
     if not duplicates:
@@ -209,39 +201,17 @@ def merge_duplicate_recipes(duplicates, dry_run=True):
     return merged_count
 
 def create_backup():
-    """Cria backup dos dados antes de modificar"""
-    print("\n💾 Criando backup...")
+    """Cria backup dos dados antes de modificar (NDJSON comprimido, ver tools/backup)"""
+    from tools.backup.export_collections import export_collections
 
-    backup_dir = project_root / 'backups'
-    backup_dir.mkdir(exist_ok=True)
+    print("\n💾 Criando backup...")
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_path = backup_dir / f'firebase_backup_{timestamp}.json'
-
-    backup_data = {
-        'timestamp': timestamp,
-        'mappings': [],
-        'recipes': []
-    }
-
-    # Backup mappings
-    for doc in db.collection('product_mappings').stream():
-        backup_data['mappings'].append({
-            'id': doc.id,
-            **doc.to_dict()
-        })
-
-    # Backup recipes
-    for doc in db.collection('recipes').stream():
-        backup_data['recipes'].append({
-            'id': doc.id,
-            **doc.to_dict()
-        })
-
-    with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, indent=2, ensure_ascii=False, default=str)
-
-    print(f"   ✅ Backup salvo: {backup_path}")
+    backup_path = project_root / 'backups' / f'firebase_backup_{timestamp}'
+
+    result = export_collections(['product_mappings', 'recipes'], out_dir=backup_path, quiet=True)
+
+    print(f"   ✅ Backup salvo: {backup_path} ({result['documents']} documentos)")
     return backup_path
 
 def main():
@@ -309,6 +279,7 @@ def main():
         print("✅ LIMPEZA COMPLETA")
         print(f"   {total_changes} alterações aplicadas com sucesso")
         print(f"   Backup disponível em: {backup_path}")
+        print(f"   Para desfazer: python3 tools/cli.py restore {backup_path}")
 
     print("="*80)
 
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Detecção de quase-duplicatas em receitas e ingredientes
+
+Pega variações que a comparação exata não vê ("Porção de Patacones (200G)"
+× "Porção de patacones 250g", acentos, espaços, abreviações) sem comparar
+todos os pares:
+
+1. Normaliza: minúsculas, sem acentos, sem tamanhos/medidas (200g, 1,5 L,
+   500ml) e sem palavras vazias (de, da, com, ...)
+2. Gera candidatos por dois bloqueios:
+   - chave exata do nome normalizado (variações só de tamanho/acentuação)
+   - MinHash de trigramas + LSH em bandas (nomes parecidos caem no mesmo
+     bucket em pelo menos uma banda)
+3. Pontua só os candidatos (Jaccard dos trigramas) e agrupa em clusters
+   (union-find) acima do limite; números que não são medida ('Combo 1' ×
+   'Combo 2') precisam coincidir e toda palavra de um nome precisa ter par
+   no outro (igual, abreviada ou com erro de digitação), então 'Coca Cola'
+   × 'Coca Cola Zero' não vira duplicata
+4. Tamanhos diferentes ('Chopp 300ml' × 'Chopp 500ml') também distinguem:
+   são SKUs com preço próprio. Esses grupos saem em size_variants, só
+   para revisão (caso Patacones: 200G × 250g do mesmo prato)
+
+Saída ranqueada no formato de merge_duplicates do cleanup_config.json
+(keep_id, remove_ids, canonical_name), pronta para
+clean_product_data.merge_duplicate_recipes; --update-config grava só esses,
+nunca os size_variants. Ingredientes saem no mesmo formato para revisão
+manual (não há merge automático de ingredientes).
+
+Uso:
+    python tools/analysis/find_near_duplicates.py [--threshold 0.6] [--update-config]
+"""
+
+import re
+import sys
+import json
+import zlib
+import argparse
+import unicodedata
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_THRESHOLD = 0.6
+NUM_PERM = 64
+BANDS = 16  # 16 bandas × 4 linhas: pares com Jaccard ≳ 0.5 viram candidatos
+SHINGLE = 3
+TOKEN_THRESHOLD = 0.5  # Jaccard mínimo entre palavras para aceitar erro de digitação
+MINHASH_PRIME = 4294967311
+MINHASH_SEED = 42
+
+STOPWORDS = {'de', 'da', 'do', 'das', 'dos', 'com', 'e', 'a', 'o', 'na', 'no', 'em', 'para', 'c'}
+SIZE_PATTERN = re.compile(r'\s*\(?\b\d+(?:[.,]\d+)?\s*(?:kg|g|gr|grs|mg|l|lt|ml|cl|un|und|unid|cm|oz)\b\.?\)?',
+                          re.IGNORECASE)
+SIZE_VALUE = re.compile(r'(\d+(?:[.,]\d+)?)\s*([a-z]+)')
+# Unidade → (unidade base, fator): '1L' e '1000ml' são o mesmo tamanho
+SIZE_UNITS = {
+    'kg': ('g', 1000), 'g': ('g', 1), 'gr': ('g', 1), 'grs': ('g', 1), 'mg': ('g', 0.001),
+    'l': ('ml', 1000), 'lt': ('ml', 1000), 'ml': ('ml', 1), 'cl': ('ml', 10),
+    'un': ('un', 1), 'und': ('un', 1), 'unid': ('un', 1), 'cm': ('cm', 1), 'oz': ('oz', 1)
+}
+
+_rng = np.random.default_rng(MINHASH_SEED)
+_PERM_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+
+# ==================== NORMALIZAÇÃO ====================
+
+def strip_accents(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+def normalize_key(name):
+    """Nome comparável: sem acentos, medidas, pontuação e palavras vazias"""
+    text = strip_accents(str(name or '').lower())
+    text = SIZE_PATTERN.sub(' ', text)
+    tokens = re.findall(r'[a-z0-9]+', text)
+    return ' '.join(t for t in tokens if t not in STOPWORDS)
+
+def strip_size(name):
+    """Nome original sem o tamanho ('Porção de Patacones (250g)' → 'Porção de Patacones')"""
+    return ' '.join(SIZE_PATTERN.sub('', str(name or '')).split())
+
+def sizes(name):
+    """Tamanhos do nome em unidade base ('Chopp 0,5 L' → {(500.0, 'ml')})"""
+    found = set()
+    for match in SIZE_PATTERN.finditer(str(name or '').lower()):
+        value = SIZE_VALUE.search(match.group())
+        if value:
+            unit, factor = SIZE_UNITS[value.group(2)]
+            found.add((round(float(value.group(1).replace(',', '.')) * factor, 3), unit))
+    return frozenset(found)
+
+def shingles(key):
+    padded = f" {key} "
+    if len(padded) <= SHINGLE:
+        return {padded}
+    return {padded[i:i + SHINGLE] for i in range(len(padded) - SHINGLE + 1)}
+
+def numbers(key):
+    """Números que sobram após tirar medidas ('combo 2', 'p01') distinguem itens"""
+    return set(re.findall(r'\d+', key))
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def token_matches(token, others):
+    """Palavra presente no outro nome: igual, abreviação (prefixo) ou erro de digitação"""
+    for other in others:
+        short, long = sorted((token, other), key=len)
+        if short == long or (len(short) >= 3 and long.startswith(short)):
+            return True
+        if jaccard(shingles(token), shingles(other)) >= TOKEN_THRESHOLD:
+            return True
+    return False
+
+def same_tokens(key_a, key_b):
+    """Toda palavra de cada nome tem par no outro ('coca cola' × 'coca cola zero' não casa)"""
+    tokens_a, tokens_b = key_a.split(), key_b.split()
+    return (all(token_matches(t, tokens_b) for t in tokens_a)
+            and all(token_matches(t, tokens_a) for t in tokens_b))
+
+def accent_count(name):
+    """Letras acentuadas no nome (grafia completa pesa a favor na hora de manter)"""
+    return sum(1 for c in str(name) if c != strip_accents(c))
+
+# ==================== CANDIDATOS ====================
+
+def minhash_signatures(shingle_sets):
+    """Assinaturas MinHash (n × NUM_PERM), uma permutação por coluna"""
+    signatures = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint64)
+    for row, items in enumerate(shingle_sets):
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in items), dtype=np.uint64, count=len(items))
+        signatures[row] = ((np.outer(hashes, _PERM_A) + _PERM_B) % MINHASH_PRIME).min(axis=0)
+    return signatures
+
+def candidate_pairs(keys, shingle_sets):
+    """
+    Pares candidatos por chave exata + buckets LSH
+
+    Returns:
+        dict: {(i, j): motivo} com i < j
+    """
+    pairs = {}
+    by_key = defaultdict(list)
+    for i, key in enumerate(keys):
+        by_key[key].append(i)
+    for members in by_key.values():
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                pairs[(i, j)] = 'nome_normalizado'
+
+    if len(keys) > 1:
+        signatures = minhash_signatures(shingle_sets)
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            buckets = defaultdict(list)
+            for i, chunk in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+                buckets[chunk.tobytes()].append(i)
+            for members in buckets.values():
+                for x, i in enumerate(members):
+                    for j in members[x + 1:]:
+                        pairs.setdefault((i, j), 'minhash')
+    return pairs
+
+def find_clusters(items, threshold=DEFAULT_THRESHOLD, size_variants=False):
+    """
+    Agrupa quase-duplicatas
+
+    Args:
+        items (list): [{'id', 'name', ...}]
+        size_variants (bool): Agrupa só pares que diferem no tamanho (revisão)
+            em vez dos de mesmo tamanho (merge)
+
+    Returns:
+        list: [{'members': [índices], 'score', 'reason'}] com 2+ membros, do mais parecido ao menos
+    """
+    keys = [normalize_key(item['name']) for item in items]
+    shingle_sets = [shingles(key) for key in keys]
+    size_sets = [sizes(item['name']) for item in items]
+
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    best = {}
+    for (i, j), reason in candidate_pairs(keys, shingle_sets).items():
+        score = 1.0 if keys[i] == keys[j] else jaccard(shingle_sets[i], shingle_sets[j])
+        if score < threshold or numbers(keys[i]) != numbers(keys[j]) or not same_tokens(keys[i], keys[j]):
+            continue
+        if (size_sets[i] != size_sets[j]) != size_variants:
+            continue
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+        best[(i, j)] = (score, reason)
+
+    groups = defaultdict(list)
+    for i in range(len(items)):
+        groups[find(i)].append(i)
+
+    top = {}
+    for (i, _), scored in best.items():
+        root = find(i)
+        top[root] = max(top.get(root, scored), scored)
+
+    clusters = []
+    for root, members in groups.items():
+        if len(members) < 2:
+            continue
+        score, reason = top[root]
+        clusters.append({'members': sorted(members), 'score': round(score, 3), 'reason': reason})
+    return sorted(clusters, key=lambda c: (-c['score'], -len(c['members'])))
+
+# ==================== CANDIDATOS A MERGE ====================
+
+def merge_candidate(cluster, items, weight):
+    """
+    Entrada de merge_duplicates: mantém o item mais referenciado
+
+    Empate no peso fica com o nome acentuado ('Porção' em vez de 'Porcao').
+
+    Args:
+        weight (callable): item → peso (mapeamentos, uso em receitas, ...)
+    """
+    members = [items[i] for i in cluster['members']]
+    keep = max(members, key=lambda item: (weight(item), accent_count(item['name'])))
+    names = {normalize_key(strip_size(item['name'])) for item in members}
+    size_sets = {sizes(item['name']) for item in members}
+    # Variações só de tamanho (caso Patacones): nome sugerido sem o tamanho
+    canonical = strip_size(keep['name']) if len(names) == 1 and len(size_sets) > 1 else keep['name']
+    return {
+        'keep_id': keep['id'],
+        'remove_ids': [item['id'] for item in members if item['id'] != keep['id']],
+        'canonical_name': canonical,
+        'score': cluster['score'],
+        'reason': cluster['reason'],
+        'variants': [item['name'] for item in members]
+    }
+
+def find_duplicate_recipes(recipes, mapping_counts=None, threshold=DEFAULT_THRESHOLD, size_variants=False):
+    """Receitas quase-duplicadas (ignora arquivadas), mantendo a de mais mapeamentos"""
+    mapping_counts = mapping_counts or {}
+    items = [r for r in recipes if r.get('name') and not r.get('archived')]
+    weight = lambda r: (mapping_counts.get(r['id'], 0), len(r.get('ingredients') or []))
+    return [merge_candidate(c, items, weight) for c in find_clusters(items, threshold, size_variants)]
+
+def find_duplicate_ingredients(ingredients, usage_counts=None, threshold=DEFAULT_THRESHOLD, size_variants=False):
+    """Ingredientes quase-duplicados, mantendo o mais usado em receitas"""
+    usage_counts = usage_counts or {}
+    items = [i for i in ingredients if i.get('name')]
+    weight = lambda i: usage_counts.get(i['id'], 0)
+    return [merge_candidate(c, items, weight) for c in find_clusters(items, threshold, size_variants)]
+
+# ==================== EXECUÇÃO ====================
+
+def load_data(db):
+    recipes = [dict(doc.to_dict(), id=doc.id) for doc in db.collection('recipes').stream()]
+    ingredients = [dict(doc.to_dict(), id=doc.id) for doc in db.collection('ingredients').stream()]
+
+    mapping_counts = defaultdict(int)
+    for doc in db.collection('product_mappings').stream():
+        recipe_id = doc.to_dict().get('recipe_id')
+        if recipe_id:
+            mapping_counts[recipe_id] += 1
+
+    usage_counts = defaultdict(int)
+    for recipe in recipes:
+        for line in recipe.get('ingredients') or []:
+            ing_id = line.get('ingredientId') or line.get('id')
+            if ing_id:
+                usage_counts[ing_id] += 1
+    return recipes, ingredients, mapping_counts, usage_counts
+
+def update_cleanup_config(merge_duplicates):
+    """Grava merge_duplicates em tools/analysis/cleanup_config.json (preserva o resto)"""
+    config_path = PROJECT_ROOT / 'tools' / 'analysis' / 'cleanup_config.json'
+    config = {'apply_capitalization': False, 'remove_extra_spaces': False, 'update_mappings': []}
+    if config_path.exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    config['merge_duplicates'] = merge_duplicates
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    return config_path
+
+def main():
+    from firebase_helper import get_firestore_client
+
+    parser = argparse.ArgumentParser(description='Quase-duplicatas de receitas e ingredientes')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Similaridade mínima (Jaccard de trigramas, 0-1)')
+    parser.add_argument('--update-config', action='store_true',
+                        help='Grava as receitas em merge_duplicates do cleanup_config.json')
+    args = parser.parse_args()
+
+    print("🔎 Procurando quase-duplicatas...\n")
+    recipes, ingredients, mapping_counts, usage_counts = load_data(get_firestore_client())
+
+    recipe_merges = find_duplicate_recipes(recipes, mapping_counts, args.threshold)
+    ingredient_merges = find_duplicate_ingredients(ingredients, usage_counts, args.threshold)
+    recipe_sizes = find_duplicate_recipes(recipes, mapping_counts, args.threshold, size_variants=True)
+    ingredient_sizes = find_duplicate_ingredients(ingredients, usage_counts, args.threshold, size_variants=True)
+
+    report = {
+        'threshold': args.threshold,
+        'recipes': len(recipes),
+        'ingredients': len(ingredients),
+        'merge_duplicates': recipe_merges,
+        'ingredient_duplicates': ingredient_merges,
+        # Só revisão: tamanhos diferentes costumam ser SKUs com preço próprio
+        'size_variants': recipe_sizes,
+        'ingredient_size_variants': ingredient_sizes
+    }
+    report_path = PROJECT_ROOT / 'tools' / 'analysis' / 'near_duplicates_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    sections = (
+        ('RECEITAS', recipe_merges),
+        ('INGREDIENTES', ingredient_merges),
+        ('RECEITAS — SÓ TAMANHO (revisar)', recipe_sizes),
+        ('INGREDIENTES — SÓ TAMANHO (revisar)', ingredient_sizes),
+    )
+    for title, merges in sections:
+        print(f"\n🔄 {title}: {len(merges)} grupos")
+        print("-"*80)
+        for i, merge in enumerate(merges[:20], 1):
+            print(f"{i}. {merge['canonical_name']}  ({merge['score']:.2f}, {merge['reason']})")
+            for variant in merge['variants']:
+                print(f"      - {variant}")
+
+    print(f"\n📄 Relatório: {report_path}")
+    if args.update_config:
+        config_path = update_cleanup_config(recipe_merges)
+        print(f"📝 {len(recipe_merges)} grupos gravados em {config_path} — revise e rode 'python3 tools/cli.py clean'")
+
+if __name__ == '__main__':
+    main()
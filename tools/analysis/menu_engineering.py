@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Engenharia de cardápio: popularidade × margem de contribuição por receita
+
+Classificação clássica (Kasavana & Smith), por bar e no total:
+    popular   = participação nas vendas ≥ 70% × (1 / nº de itens vendidos)
+    rentável  = margem unitária ≥ margem média ponderada pelas vendas
+    ⭐ estrela (popular, rentável)     🐴 burro de carga (popular, margem baixa)
+    🧩 quebra-cabeça (pouco vendido, rentável)   🐶 cão (pouco vendido, margem baixa)
+
+Margem = suggestedPrice − costPerPortion (tools/calculations/recipe_costs.py);
+sem preço sugerido usa o preço médio praticado nas vendas. Receitas sem
+custo calculado saem marcadas (costMissing) porque a margem fica inflada.
+
+Vendas vêm do histórico Parquet (tools/vendas/sales_history.py) e são
+agregadas por (bar, [mês,] receita) com groupby — nenhum documento de
+'vendas' é lido. Gera menu_engineering_report.json e .csv.
+
+Uso:
+    python tools/analysis/menu_engineering.py [--from 2024-01] [--to 2024-12]
+        [--by-month] [--output-dir tools/analysis]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.vendas.sales_history import read_sales
+
+ALL_BARS = 'todos'
+POPULARITY_FACTOR = 0.7
+CLASSES = {
+    (True, True): 'estrela',
+    (True, False): 'burro_de_carga',
+    (False, True): 'quebra_cabeca',
+    (False, False): 'cao',
+}
+ACTIONS = {
+    'estrela': 'Manter destaque e padrão de qualidade',
+    'burro_de_carga': 'Revisar custo/porção ou reajustar preço',
+    'quebra_cabeca': 'Dar visibilidade (cardápio, garçons) ou reposicionar',
+    'cao': 'Avaliar retirar do cardápio',
+}
+
+def _number(data, *keys):
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            return float(value)
+    return 0.0
+
+def load_catalog(db):
+    """
+    SKU → receita e preço/custo de cada receita
+
+    Returns:
+        tuple: (DataFrame sku/recipe_id, DataFrame recipe_id/name/price/cost)
+    """
+    mappings = pd.DataFrame(
+        [
+            {'sku': str(data['sku']), 'recipe_id': data['recipe_id']}
+            for data in (doc.to_dict() for doc in db.collection('product_mappings').stream())
+            if data.get('sku') and data.get('recipe_id')
+        ],
+        columns=['sku', 'recipe_id']
+    ).drop_duplicates('sku')
+
+    recipes = pd.DataFrame(
+        [
+            {
+                'recipe_id': doc.id,
+                'name': data.get('name', ''),
+                'category': data.get('category', ''),
+                'price': _number(data, 'suggestedPrice', 'suggested_price'),
+                'cost': _number(data, 'costPerPortion', 'cost_per_portion')
+            }
+            for doc, data in ((doc, doc.to_dict()) for doc in db.collection('recipes').stream())
+        ],
+        columns=['recipe_id', 'name', 'category', 'price', 'cost']
+    )
+    return mappings, recipes
+
+def aggregate_sales(sales, mappings, by_month=False):
+    """
+    Quantidade e receita por (bar, [mês,] receita), mais o total de todos os bares
+
+    Returns:
+        tuple: (DataFrame agregado, nº de vendas sem receita mapeada)
+    """
+    sales = sales.merge(mappings, on='sku', how='left')
+    unmapped = int(sales['recipe_id'].isna().sum())
+    sales = sales.dropna(subset=['recipe_id'])
+
+    keys = ['month', 'recipe_id'] if by_month else ['recipe_id']
+    per_bar = sales.groupby(['bar', *keys], observed=True, as_index=False)[['quantity', 'totalValue']].sum()
+    overall = sales.groupby(keys, observed=True, as_index=False)[['quantity', 'totalValue']].sum()
+    overall.insert(0, 'bar', ALL_BARS)
+    return pd.concat([per_bar, overall], ignore_index=True), unmapped
+
+def classify(aggregated, recipes, by_month=False):
+    """
+    Margem, participação e classe de cada receita dentro do seu grupo
+
+    Returns:
+        DataFrame: uma linha por (bar, [mês,] receita)
+    """
+    group = ['bar', 'month'] if by_month else ['bar']
+    df = aggregated.merge(recipes, on='recipe_id', how='left')
+    df = df[df['quantity'] > 0].fillna({'name': '', 'category': '', 'price': 0.0, 'cost': 0.0})
+
+    realized = df['totalValue'] / df['quantity']
+    has_price = df['price'] > 0
+    df['priceSource'] = np.where(has_price, 'sugerido', 'vendas')
+    df['price'] = df['price'].where(has_price, realized)
+    df['costMissing'] = ~(df['cost'] > 0)
+    df['margin'] = df['price'] - df['cost']
+
+    grouped = df.groupby(group, observed=True)
+    total_qty = grouped['quantity'].transform('sum')
+    items = grouped['recipe_id'].transform('count')
+    df['mixShare'] = df['quantity'] / total_qty
+    df['popularityThreshold'] = POPULARITY_FACTOR / items
+    df['marginThreshold'] = (df['margin'] * df['quantity']).groupby([df[g] for g in group]).transform('sum') / total_qty
+
+    popular = df['mixShare'] >= df['popularityThreshold']
+    profitable = df['margin'] >= df['marginThreshold']
+    df['classification'] = [CLASSES[key] for key in zip(popular, profitable)]
+    df['totalMargin'] = df['margin'] * df['quantity']
+    return df.sort_values([*group, 'totalMargin'], ascending=[True] * len(group) + [False])
+
+def build_report(df, start, end, by_month, unmapped, elapsed_ms):
+    group = ['bar', 'month'] if by_month else ['bar']
+    sections = []
+    for key, rows in df.groupby(group, observed=True, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        section = dict(zip(group, key))
+        section.update({
+            'items': len(rows),
+            'quantity': round(float(rows['quantity'].sum()), 2),
+            'revenue': round(float(rows['totalValue'].sum()), 2),
+            'totalMargin': round(float(rows['totalMargin'].sum()), 2),
+            'popularityThreshold': round(float(rows['popularityThreshold'].iloc[0]), 4),
+            'marginThreshold': round(float(rows['marginThreshold'].iloc[0]), 2),
+            'classes': rows['classification'].value_counts().to_dict(),
+            'recipes': [
+                {
+                    'recipeId': r.recipe_id,
+                    'name': r.name,
+                    'class': r.classification,
+                    'action': ACTIONS[r.classification],
+                    'quantity': round(float(r.quantity), 2),
+                    'mixShare': round(float(r.mixShare), 4),
+                    'price': round(float(r.price), 2),
+                    'priceSource': r.priceSource,
+                    'cost': round(float(r.cost), 2) if not r.costMissing else None,
+                    'margin': round(float(r.margin), 2),
+                    'totalMargin': round(float(r.totalMargin), 2),
+                    'costMissing': bool(r.costMissing)
+                }
+                for r in rows.itertuples(index=False)
+            ]
+        })
+        sections.append(section)
+
+    return {
+        'period': {'from': start, 'to': end},
+        'byMonth': by_month,
+        'unmappedSales': unmapped,
+        'recipesWithoutCost': int(df.loc[df['costMissing'], 'recipe_id'].nunique()),
+        'elapsedMs': round(elapsed_ms, 1),
+        'sections': sections
+    }
+
+def save_report(report, df, output_dir, by_month):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    json_path = output_dir / 'menu_engineering_report.json'
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    columns = ['bar', *(['month'] if by_month else []), 'recipe_id', 'name', 'category', 'classification', 'quantity',
+               'mixShare', 'price', 'priceSource', 'cost', 'margin', 'totalMargin', 'costMissing']
+    csv_path = output_dir / 'menu_engineering_report.csv'
+    df[columns].round(4).to_csv(csv_path, index=False)
+    return json_path, csv_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Engenharia de cardápio (popularidade × margem) por bar')
+    parser.add_argument('--from', dest='start', help='Início do período (YYYY-MM ou YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='Fim do período (inclusivo)')
+    parser.add_argument('--by-month', action='store_true', help='Classifica cada mês separadamente')
+    parser.add_argument('--output-dir', default=str(PROJECT_ROOT / 'tools' / 'analysis'))
+    args = parser.parse_args()
+
+    print("🍽️  Engenharia de cardápio...\n")
+    started = time.perf_counter()
+
+    print("1️⃣ Carregando receitas e mapeamentos...")
+    mappings, recipes = load_catalog(get_firestore_client())
+
+    print("2️⃣ Agregando vendas do histórico...")
+    sales = read_sales(args.start, args.end, columns=['sku', 'quantity', 'totalValue', 'bar', 'month'])
+    if sales.empty:
+        print("❌ Nenhuma venda no histórico para o período (python tools/cli.py sales-history ingest <export>)")
+        sys.exit(1)
+    aggregated, unmapped = aggregate_sales(sales, mappings, args.by_month)
+
+    print("3️⃣ Classificando receitas...")
+    df = classify(aggregated, recipes, args.by_month)
+    report = build_report(df, args.start, args.end, args.by_month, unmapped,
+                          (time.perf_counter() - started) * 1000)
+    json_path, csv_path = save_report(report, df, args.output_dir, args.by_month)
+
+    print(f"\n✅ {len(sales)} vendas em {report['elapsedMs']:.0f}ms\n")
+    print(f"📄 Relatório JSON: {json_path}")
+    print(f"📊 Relatório CSV: {csv_path}")
+
+    print("\n" + "="*80)
+    for section in report['sections']:
+        label = section['bar'] + (f" / {section['month']}" if args.by_month else '')
+        counts = section['classes']
+        print(f"{label:<30} ⭐ {counts.get('estrela', 0):>3}  🐴 {counts.get('burro_de_carga', 0):>3}  "
+              f"🧩 {counts.get('quebra_cabeca', 0):>3}  🐶 {counts.get('cao', 0):>3}   "
+              f"margem R$ {section['totalMargin']:,.2f}")
+    if report['recipesWithoutCost']:
+        print(f"\n⚠️  {report['recipesWithoutCost']} receitas sem custo calculado "
+              f"(python tools/cli.py recipe-costs --full)")
+    if unmapped:
+        print(f"⚠️  {unmapped} vendas de SKUs sem receita mapeada ficaram de fora")
+    print("="*80)
+
+if __name__ == '__main__':
+    main()
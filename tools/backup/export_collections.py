@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Backup de collections do Firestore em NDJSON comprimido
+
+Cada collection é lida em páginas ordenadas por ID (memória constante) e
+gravada em partes '<collection>/part-00000.ndjson.gz'. Collections rodam
+em paralelo. O manifest.json registra, por parte, documentos, bytes e
+sha256, e é regravado a cada parte concluída: um export interrompido
+continua de onde parou com --resume.
+
+Uso:
+    python tools/backup/export_collections.py [--collections vendas,recipes]
+        [--out backups/export_20240115_120000] [--compression gzip|zstd|none]
+        [--workers 4] [--page-size 1000] [--part-size 100000]
+    python tools/backup/export_collections.py --resume backups/export_20240115_120000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.ndjson_io import NDJSONWriter, COMPRESSIONS, EXTENSIONS
+
+BACKUPS_DIR = PROJECT_ROOT / 'backups'
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 'firestore-ndjson-v1'
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_PART_SIZE = 100000
+DEFAULT_WORKERS = 4
+
+class Manifest:
+    """manifest.json do export, regravado atomicamente a cada parte concluída"""
+
+    def __init__(self, path, data):
+        self.path = Path(path)
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, out_dir, collections, compression, part_size):
+        return cls(Path(out_dir) / MANIFEST_NAME, {
+            'format': FORMAT_VERSION,
+            'createdAt': datetime.now(timezone.utc).isoformat(),
+            'completedAt': None,
+            'compression': compression,
+            'partSize': part_size,
+            'collections': {
+                name: {'documents': 0, 'completed': False, 'parts': []}
+                for name in collections
+            }
+        })
+
+    @classmethod
+    def load(cls, out_dir):
+        path = Path(out_dir) / MANIFEST_NAME
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(path, json.load(f))
+
+    def collection(self, name):
+        return self.data['collections'][name]
+
+    def add_part(self, name, part):
+        with self._lock:
+            entry = self.collection(name)
+            entry['parts'].append(part)
+            entry['documents'] += part['documents']
+            self._save()
+
+    def complete(self, name):
+        with self._lock:
+            self.collection(name)['completed'] = True
+            if all(c['completed'] for c in self.data['collections'].values()):
+                self.data['completedAt'] = datetime.now(timezone.utc).isoformat()
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+def iter_collection_pages(db, collection, start_after=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Itera os documentos de uma collection em páginas ordenadas por ID
+
+    Yields:
+        DocumentSnapshot
+    """
+    last_id = start_after
+    while True:
+        query = db.collection(collection).order_by('__name__').limit(page_size)
+        if last_id is not None:
+            query = query.start_after({'__name__': last_id})
+
+        count = 0
+        for doc in query.stream():
+            count += 1
+            last_id = doc.id
+            yield doc
+
+        if count < page_size:
+            return
+
+def export_collection(db, manifest, out_dir, collection, page_size=DEFAULT_PAGE_SIZE,
+                      part_size=DEFAULT_PART_SIZE):
+    """
+    Exporta uma collection em partes, retomando após a última parte registrada
+
+    Returns:
+        dict: {'collection', 'documents', 'parts', 'elapsedMs'}
+    """
+    started = time.perf_counter()
+    entry = manifest.collection(collection)
+    compression = manifest.data['compression']
+    collection_dir = Path(out_dir) / collection
+    collection_dir.mkdir(parents=True, exist_ok=True)
+
+    if entry['completed']:
+        return {'collection': collection, 'documents': entry['documents'], 'parts': len(entry['parts']), 'elapsedMs': 0}
+
+    # Partes fora do manifest são de uma execução interrompida: descartar
+    known = {part['file'] for part in entry['parts']}
+    for stale in collection_dir.glob('part-*'):
+        if f"{collection}/{stale.name}" not in known:
+            stale.unlink()
+
+    start_after = entry['parts'][-1]['lastId'] if entry['parts'] else None
+    writer = None
+    first_id = None
+
+    def close_part(last_id):
+        writer.close()
+        manifest.add_part(collection, {
+            'file': f"{collection}/{Path(writer.path).name}",
+            'documents': writer.documents,
+            'bytes': writer.bytes,
+            'sha256': writer.sha256,
+            'firstId': first_id,
+            'lastId': last_id
+        })
+
+    last_id = None
+    for doc in iter_collection_pages(db, collection, start_after, page_size):
+        if writer is None:
+            index = len(entry['parts'])
+            writer = NDJSONWriter(collection_dir / f"part-{index:05d}{EXTENSIONS[compression]}", compression)
+            first_id = doc.id
+
+        writer.write(doc.id, doc.to_dict())
+        last_id = doc.id
+
+        if writer.documents >= part_size:
+            close_part(last_id)
+            writer = None
+
+    if writer is not None:
+        close_part(last_id)
+
+    manifest.complete(collection)
+    return {
+        'collection': collection,
+        'documents': entry['documents'],
+        'parts': len(entry['parts']),
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def list_collections(db):
+    """Nomes das collections de primeiro nível"""
+    return sorted(c.id for c in db.collections())
+
+def export_collections(collections=None, out_dir=None, compression='gzip', workers=DEFAULT_WORKERS,
+                       page_size=DEFAULT_PAGE_SIZE, part_size=DEFAULT_PART_SIZE, resume=False, quiet=False):
+    """
+    Exporta collections em paralelo para um diretório de backup
+
+    Args:
+        collections (list): Collections a exportar (default: todas)
+        out_dir (str|Path): Diretório do backup (default: backups/export_<timestamp>)
+        compression (str): gzip | zstd | none
+        workers (int): Collections exportadas em paralelo
+        resume (bool): Continua o export de out_dir a partir do manifest
+
+    Returns:
+        dict: {'outDir', 'manifest', 'documents', 'collections': [...], 'elapsedMs'}
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+
+    if resume:
+        manifest = Manifest.load(out_dir)
+        part_size = manifest.data.get('partSize', part_size)
+    else:
+        collections = collections or list_collections(db)
+        out_dir = Path(out_dir or BACKUPS_DIR / f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        manifest = Manifest.create(out_dir, collections, compression, part_size)
+        manifest.save()
+
+    names = list(manifest.data['collections'])
+    if not quiet:
+        print(f"💾 Exportando {len(names)} collections → {out_dir}", file=sys.stderr)
+
+    def run(name):
+        summary = export_collection(db, manifest, out_dir, name, page_size, part_size)
+        if not quiet:
+            print(f"  ✓ {name}: {summary['documents']} docs em {summary['parts']} partes", file=sys.stderr)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        summaries = list(pool.map(run, names))
+
+    return {
+        'outDir': str(out_dir),
+        'manifest': str(manifest.path),
+        'documents': sum(s['documents'] for s in summaries),
+        'collections': summaries,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Backup de collections do Firestore em NDJSON comprimido')
+    parser.add_argument('--collections', help='Lista separada por vírgula (default: todas)')
+    parser.add_argument('--out', help='Diretório do backup')
+    parser.add_argument('--resume', metavar='DIR', help='Continua um export interrompido')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='gzip')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--part-size', type=int, default=DEFAULT_PART_SIZE)
+    args = parser.parse_args()
+
+    collections = [c.strip() for c in args.collections.split(',') if c.strip()] if args.collections else None
+
+    result = export_collections(
+        collections=collections,
+        out_dir=args.resume or args.out,
+        compression=args.compression,
+        workers=args.workers,
+        page_size=args.page_size,
+        part_size=args.part_size,
+        resume=bool(args.resume)
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
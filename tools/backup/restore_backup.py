@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Restaura backups no Firestore com batches commitados em paralelo
+
+Aceita os dois formatos de backup:
+- diretório de export (manifest.json + partes NDJSON, ver export_collections.py)
+- JSON legado de clean_product_data ({'mappings': [...], 'recipes': [...]});
+  o 'id' embutido sai dos dados e os campos de data conhecidos
+  (LEGACY_TIMESTAMP_FIELDS), gravados como string, voltam a ser datetime
+
+Os documentos são lidos em streaming, agrupados em batches de 500 e
+commitados por vários workers via WriteScheduler (taxa controlada + retry).
+O progresso fica em um checkpoint ao lado do backup: rodar de novo
+continua após o último batch confirmado.
+
+Uso:
+    python tools/backup/restore_backup.py <backup_dir | backup.json>
+        [--collections recipes,product_mappings] [--ids id1,id2 | --ids @ids.txt]
+        [--dry-run] [--workers 8] [--no-resume]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.ndjson_io import iter_documents, file_sha256
+from tools.common.write_scheduler import WriteScheduler, MAX_BATCH_OPS, format_write_stats
+
+MANIFEST_NAME = 'manifest.json'
+CHECKPOINT_NAME = 'restore_checkpoint.json'
+
+DEFAULT_WORKERS = 8
+DIFF_READS_PER_CALL = 300
+DIFF_SAMPLE_SIZE = 20
+
+# Chaves do JSON legado → collections
+LEGACY_COLLECTIONS = {
+    'mappings': 'product_mappings',
+    'recipes': 'recipes',
+}
+
+# Campos de data do backend/tools que o JSON legado gravou com default=str
+LEGACY_TIMESTAMP_FIELDS = {
+    'created_at', 'updated_at', 'deleted_at', 'archived_at', 'cost_updated_at',
+    'createdAt', 'updatedAt', 'lastUpdated',
+}
+
+# ==================== FONTES ====================
+
+def load_sources(path, db=None, verify=True):
+    """
+    Lista as fontes de um backup
+
+    Returns:
+        list: [{'key', 'collection', 'documents', 'iter': callable}]
+    """
+    path = Path(path)
+
+    if path.is_dir():
+        with open(path / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        sources = []
+        for collection, entry in manifest['collections'].items():
+            if not entry.get('completed'):
+                print(f"⚠ Export de '{collection}' incompleto no manifest", file=sys.stderr)
+            for part in entry['parts']:
+                part_path = path / part['file']
+                if verify and file_sha256(part_path) != part['sha256']:
+                    raise ValueError(f"Checksum não confere: {part['file']}")
+                sources.append({
+                    'key': part['file'],
+                    'collection': collection,
+                    'documents': part['documents'],
+                    'iter': lambda p=part_path: iter_documents(p, db)
+                })
+        return sources
+
+    # Formato legado: JSON único (datas foram gravadas como string, ver legacy_document)
+    with open(path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    sources = []
+    for key, collection in LEGACY_COLLECTIONS.items():
+        docs = legacy.get(key) or []
+        sources.append({
+            'key': f"legacy:{collection}",
+            'collection': collection,
+            'documents': len(docs),
+            'iter': lambda docs=docs: (legacy_document(d) for d in docs if d.get('id'))
+        })
+    return sources
+
+def legacy_document(doc):
+    """
+    Documento do JSON legado no formato do Firestore
+
+    Returns:
+        tuple: (doc_id, data) sem o 'id' embutido e com as datas como datetime
+    """
+    data = dict(doc)
+    doc_id = str(data.pop('id'))
+    for field in LEGACY_TIMESTAMP_FIELDS & set(data):
+        value = data[field]
+        if isinstance(value, str):
+            try:
+                data[field] = datetime.fromisoformat(value)
+            except ValueError:
+                pass  # não é data no formato str(datetime): mantém como veio
+    return doc_id, data
+
+def filtered(documents, ids):
+    if ids is None:
+        return documents
+    return ((doc_id, data) for doc_id, data in documents if doc_id in ids)
+
+def iter_batches(documents, size=MAX_BATCH_OPS):
+    batch = []
+    for item in documents:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ==================== CHECKPOINT ====================
+
+class RestoreCheckpoint:
+    """
+    Progresso do restore por fonte
+
+    Batches terminam fora de ordem (workers paralelos); só o prefixo
+    contíguo de batches confirmados é persistido, então retomar nunca
+    pula um batch que não foi gravado.
+    """
+
+    def __init__(self, path, filters):
+        self.path = Path(path)
+        self.filters = filters
+        self.sources = {}
+        self._done = {}
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('filters') == filters:
+                self.sources = saved.get('sources', {})
+            else:
+                print("ℹ️  Checkpoint com filtros diferentes: restore recomeça do início", file=sys.stderr)
+
+    def batches_done(self, key):
+        return self.sources.get(key, {}).get('batchesDone', 0)
+
+    def is_completed(self, key):
+        return self.sources.get(key, {}).get('completed', False)
+
+    def mark_batch(self, key, index):
+        with self._lock:
+            done = self._done.setdefault(key, set())
+            done.add(index)
+            state = self.sources.setdefault(key, {'batchesDone': 0, 'completed': False})
+            advanced = False
+            while state['batchesDone'] in done:
+                done.discard(state['batchesDone'])
+                state['batchesDone'] += 1
+                advanced = True
+            if advanced:
+                self._save()
+
+    def mark_completed(self, key):
+        with self._lock:
+            self.sources.setdefault(key, {'batchesDone': 0})['completed'] = True
+            self._save()
+
+    def _save(self):
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'filters': self.filters, 'sources': self.sources}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+def checkpoint_path(backup_path):
+    backup_path = Path(backup_path)
+    if backup_path.is_dir():
+        return backup_path / CHECKPOINT_NAME
+    return backup_path.with_name(backup_path.name + '.' + CHECKPOINT_NAME)
+
+# ==================== DRY-RUN ====================
+
+def diff_batch(db, collection, batch):
+    """
+    Compara um lote do backup com o estado atual
+
+    Returns:
+        dict: {'new', 'changed', 'unchanged', 'samples': [...]}
+    """
+    collection_ref = db.collection(collection)
+    current = {
+        doc.id: doc.to_dict() for doc in db.get_all([collection_ref.document(doc_id) for doc_id, _ in batch])
+        if doc.exists
+    }
+
+    result = {'new': 0, 'changed': 0, 'unchanged': 0, 'samples': []}
+    for doc_id, data in batch:
+        if doc_id not in current:
+            result['new'] += 1
+            result['samples'].append({'id': doc_id, 'change': 'new'})
+            continue
+        existing = current[doc_id]
+        fields = sorted(k for k in set(data) | set(existing) if data.get(k) != existing.get(k))
+        if fields:
+            result['changed'] += 1
+            result['samples'].append({'id': doc_id, 'change': 'changed', 'fields': fields})
+        else:
+            result['unchanged'] += 1
+    return result
+
+# ==================== RESTORE ====================
+
+def commit_batch(db, writer, collection, batch):
+    collection_ref = db.collection(collection)
+    write_batch = db.batch()
+    for doc_id, data in batch:
+        write_batch.set(collection_ref.document(doc_id), data)
+    writer.commit(write_batch, len(batch))
+
+def restore_backup(backup_path, collections=None, ids=None, dry_run=False,
+                   workers=DEFAULT_WORKERS, resume=True, verify=True):
+    """
+    Restaura (ou compara, em dry-run) um backup
+
+    Args:
+        backup_path (str|Path): Diretório de export ou JSON legado
+        collections (list): Restringe a estas collections
+        ids (set): Restringe a estes IDs de documento
+        dry_run (bool): Só compara com o Firestore, sem escrever
+        workers (int): Batches em paralelo
+        resume (bool): Usa o checkpoint de uma execução anterior
+
+    Returns:
+        dict: Resumo por collection + contadores do WriteScheduler
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+    writer = WriteScheduler(db)
+
+    sources = [
+        s for s in load_sources(backup_path, db, verify)
+        if not collections or s['collection'] in collections
+    ]
+    filters = {'collections': sorted(collections or []), 'ids': sorted(ids) if ids is not None else None}
+    checkpoint = RestoreCheckpoint(checkpoint_path(backup_path), filters)
+    if not resume or dry_run:
+        checkpoint.sources = {}
+
+    summary = {}
+    samples = []
+    summary_lock = threading.Lock()
+
+    def stats_for(collection):
+        return summary.setdefault(collection, {
+            'documents': 0, 'written': 0, 'resumedSkipped': 0,
+            'new': 0, 'changed': 0, 'unchanged': 0
+        })
+
+    def run_batch(source, index, batch):
+        if dry_run:
+            diff = diff_batch(db, source['collection'], batch)
+            with summary_lock:
+                stats = stats_for(source['collection'])
+                for key in ('new', 'changed', 'unchanged'):
+                    stats[key] += diff[key]
+                samples.extend(
+                    {'collection': source['collection'], **s} for s in diff['samples'][:DIFF_SAMPLE_SIZE - len(samples)]
+                )
+            return
+        commit_batch(db, writer, source['collection'], batch)
+        checkpoint.mark_batch(source['key'], index)
+        with summary_lock:
+            stats_for(source['collection'])['written'] += len(batch)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for source in sources:
+            stats_for(source['collection'])
+            if checkpoint.is_completed(source['key']):
+                summary[source['collection']]['resumedSkipped'] += source['documents']
+                continue
+
+            skip = checkpoint.batches_done(source['key'])
+            batch_size = DIFF_READS_PER_CALL if dry_run else MAX_BATCH_OPS
+            for index, batch in enumerate(iter_batches(filtered(source['iter'](), ids), batch_size)):
+                summary[source['collection']]['documents'] += len(batch)
+                if index < skip:
+                    summary[source['collection']]['resumedSkipped'] += len(batch)
+                    continue
+
+                # Backpressure: no máximo 2× workers batches em memória
+                while len(in_flight) >= 2 * workers:
+                    in_flight.popleft().result()
+                in_flight.append(pool.submit(run_batch, source, index, batch))
+
+            # Fonte só é marcada completa depois que todos os seus batches terminaram
+            while in_flight:
+                in_flight.popleft().result()
+            if not dry_run:
+                checkpoint.mark_completed(source['key'])
+
+    if not dry_run:
+        checkpoint.clear()
+
+    result = {
+        'backup': str(backup_path),
+        'dryRun': dry_run,
+        'collections': summary,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+    }
+    if dry_run:
+        result['samples'] = samples
+    else:
+        result['writeScheduler'] = writer.stats
+    return result
+
+def parse_ids(value):
+    """'a,b,c' ou '@arquivo.txt' (um ID por linha)"""
+    if not value:
+        return None
+    if value.startswith('@'):
+        with open(value[1:], 'r', encoding='utf-8') as f:
+            return {line.strip() for line in f if line.strip()}
+    return {v.strip() for v in value.split(',') if v.strip()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Restaura backup no Firestore (batches paralelos)')
+    parser.add_argument('backup', help='Diretório de export (manifest.json) ou JSON legado')
+    parser.add_argument('--collections', help='Lista separada por vírgula')
+    parser.add_argument('--ids', help="IDs separados por vírgula ou @arquivo.txt")
+    parser.add_argument('--dry-run', action='store_true', help='Só mostra o diff contra o Firestore')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--no-resume', action='store_true', help='Ignora checkpoint anterior')
+    parser.add_argument('--no-verify', action='store_true', help='Não confere sha256 das partes')
+    args = parser.parse_args()
+
+    collections = [c.strip() for c in args.collections.split(',') if c.strip()] if args.collections else None
+
+    print(f"♻️  {'Comparando' if args.dry_run else 'Restaurando'} {args.backup}...", file=sys.stderr)
+    result = restore_backup(
+        args.backup,
+        collections=collections,
+        ids=parse_ids(args.ids),
+        dry_run=args.dry_run,
+        workers=args.workers,
+        resume=not args.no_resume,
+        verify=not args.no_verify
+    )
+
+    for name, stats in result['collections'].items():
+        if args.dry_run:
+            print(f"  {name}: {stats['new']} novos, {stats['changed']} alterados, {stats['unchanged']} iguais", file=sys.stderr)
+        else:
+            print(f"  ✓ {name}: {stats['written']} gravados ({stats['resumedSkipped']} já restaurados)", file=sys.stderr)
+    if not args.dry_run:
+        print(f"  💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: custo de setup do cliente Firestore (sem cache × com cache)
+
+Reproduz o comportamento antigo de get_firestore_client (ler credenciais
+do disco e criar um firestore.Client a cada chamada) e compara com o
+cliente compartilhado do firebase_helper.
+
+Uso:
+    python tools/benchmarks/firestore_client_setup.py [--calls 20] [--roundtrip]
+
+--roundtrip faz um get() real em cada cliente, incluindo o handshake
+TLS/gRPC que um cliente novo paga na primeira chamada.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+import firebase_helper
+from firebase_helper import get_firestore_client, get_client_stats
+from google.cloud import firestore
+from google.oauth2 import service_account
+
+def build_uncached_client():
+    """Comportamento anterior: credenciais + cliente novos a cada chamada"""
+    creds = service_account.Credentials.from_service_account_file(
+        str(firebase_helper.CREDENTIALS_PATH)
+    )
+    return firestore.Client(
+        project=os.getenv('FIREBASE_PROJECT_ID', 'restges-montuvia'),
+        credentials=creds,
+        database=firebase_helper.DATABASE_ID
+    )
+
+def touch(db):
+    """Uma leitura mínima para forçar a abertura do canal"""
+    db.collection('_benchmark').document('ping').get()
+
+def measure(factory, calls, roundtrip):
+    started = time.perf_counter()
+    for _ in range(calls):
+        db = factory()
+        if roundtrip:
+            touch(db)
+    return (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de setup do cliente Firestore')
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--roundtrip', action='store_true')
+    args = parser.parse_args()
+
+    uncached_ms = measure(build_uncached_client, args.calls, args.roundtrip)
+    cached_ms = measure(get_firestore_client, args.calls, args.roundtrip)
+
+    result = {
+        'calls': args.calls,
+        'roundtrip': args.roundtrip,
+        'uncachedTotalMs': round(uncached_ms, 2),
+        'cachedTotalMs': round(cached_ms, 2),
+        'savedMs': round(uncached_ms - cached_ms, 2),
+        'savedPerCallMs': round((uncached_ms - cached_ms) / args.calls, 2),
+        'clientStats': get_client_stats()
+    }
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
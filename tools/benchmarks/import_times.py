@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark de import-time dos tools (python -X importtime)
+
+Para cada comando do tools/cli.py, carrega o módulo do tool (sem executar
+o main) em um processo novo com -X importtime e soma o tempo cumulativo
+dos imports de primeiro nível. Cada execução é anexada ao histórico em
+JSONL (.tmp/import_times.jsonl, ou IMPORT_TIMES_HISTORY) para acompanhar
+regressões ao longo do tempo.
+
+Uso:
+    python tools/benchmarks/import_times.py [--commands parse validate ...] [--max-ms 500]
+
+--max-ms faz o script sair com código 1 se algum tool passar do limite.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'tools'))
+from cli import COMMANDS, TOOLS_DIR
+
+HISTORY_PATH = Path(os.getenv('IMPORT_TIMES_HISTORY', PROJECT_ROOT / '.tmp' / 'import_times.jsonl'))
+
+# Carrega o script como módulo (não-__main__): mede só o custo de import
+LOADER = (
+    "import sys, importlib.util; "
+    "path = sys.argv[1]; "
+    "sys.path.insert(0, str(__import__('pathlib').Path(path).parent)); "
+    "spec = importlib.util.spec_from_file_location('_tool', path); "
+    "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+)
+
+def parse_importtime(stderr):
+    """
+    Lê a saída do -X importtime
+
+    Returns:
+        tuple: (total_us de imports de primeiro nível, [(módulo, cumulative_us)])
+    """
+    total_us = 0
+    top_level = []
+
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        # Formato: "import time: <self> | <cumulative> | <2 espaços por nível><módulo>"
+        name = name[1:]
+        if not name.startswith(' '):
+            total_us += int(cumulative.strip())
+            top_level.append((name.strip(), int(cumulative.strip())))
+
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return total_us, top_level
+
+def measure_command(command):
+    """Mede o import-time de um comando em um processo novo"""
+    script = TOOLS_DIR / COMMANDS[command][0]
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', LOADER, str(script)],
+        capture_output=True,
+        text=True,
+        cwd=str(PROJECT_ROOT)
+    )
+
+    total_us, top_level = parse_importtime(proc.stderr)
+    entry = {
+        'command': command,
+        'ok': proc.returncode == 0,
+        'totalMs': round(total_us / 1000, 2),
+        'heaviest': [
+            {'module': name, 'ms': round(us / 1000, 2)}
+            for name, us in top_level[:5]
+        ]
+    }
+    if proc.returncode != 0:
+        entry['error'] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'erro desconhecido'
+    return entry
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=str(PROJECT_ROOT)
+        ).stdout.strip()
+    except OSError:
+        return ''
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de import-time dos tools')
+    parser.add_argument('--commands', nargs='*', default=list(COMMANDS))
+    parser.add_argument('--max-ms', type=float, default=None)
+    parser.add_argument('--no-history', action='store_true', help='Não grava no histórico')
+    args = parser.parse_args()
+
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'results': [measure_command(command) for command in args.commands]
+    }
+
+    if not args.no_history:
+        HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(HISTORY_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    for entry in record['results']:
+        status = '✓' if entry['ok'] else '✗'
+        print(f"  {status} {entry['command']:<28} {entry['totalMs']:>9.2f} ms", file=sys.stderr)
+
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+
+    if args.max_ms is not None:
+        slow = [e for e in record['results'] if e['totalMs'] > args.max_ms]
+        if slow:
+            print(f"\n❌ {len(slow)} tools acima de {args.max_ms} ms", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do pipeline de vendas: parse → validate → update_stock
+
+Gera um catálogo sintético (ingredientes, receitas, mapeamentos) e um
+arquivo de vendas no formato do Zig, carrega tudo no backend em memória
+(ou no Firestore Emulator) e roda as três etapas em processo, medindo o
+tempo de cada uma. Não toca no database montuvia1.
+
+Uso:
+    python tools/benchmarks/offline_pipeline.py [--sales 1000] [--latency-ms 20]
+        [--ingredients 236] [--recipes 100] [--concurrency 8] [--backend memory|emulator]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'tools' / 'vendas'))
+
+BARS = ['Principal', 'Terraço']
+
+def build_catalog(n_ingredients, n_recipes, seed=42):
+    """
+    Catálogo sintético com o mesmo formato dos documentos reais
+
+    Returns:
+        tuple: (ingredients, recipes, mappings) como {id: data}
+    """
+    rng = random.Random(seed)
+    ingredients = {
+        f"ing_{i:04d}": {
+            'id': f"ing_{i:04d}",
+            'name': f"Insumo {i}",
+            'unit': rng.choice(['kg', 'l', 'un', 'g', 'ml']),
+            'currentStock': round(rng.uniform(0, 200), 2),
+            'minStock': round(rng.uniform(1, 20), 2),
+            'maxStock': round(rng.uniform(30, 120), 2),
+        }
+        for i in range(n_ingredients)
+    }
+    ingredient_ids = list(ingredients)
+
+    recipes = {}
+    mappings = {}
+    for r in range(n_recipes):
+        recipe_id = f"rec_{r:04d}"
+        lines = rng.sample(ingredient_ids, k=rng.randint(3, 8))
+        recipes[recipe_id] = {
+            'id': recipe_id,
+            'name': f"Receita {r}",
+            'portions': 1,
+            'ingredients': [
+                {
+                    'ingredientId': ing_id,
+                    'name': ingredients[ing_id]['name'],
+                    'quantity': round(rng.uniform(0.01, 0.5), 3),
+                    'unit': ingredients[ing_id]['unit'],
+                }
+                for ing_id in lines
+            ],
+        }
+        sku = f"SKU{r:04d}"
+        mappings[f"map_{r:04d}"] = {
+            'sku': sku,
+            'product_name_zig': f"PRODUTO {r}",
+            'recipe_id': recipe_id,
+            'recipe_name': recipes[recipe_id]['name'],
+            'confidence': 1.0,
+            'productType': 'dish',
+        }
+
+    return ingredients, recipes, mappings
+
+def write_sales_file(path, n_sales, n_recipes, seed=42):
+    """Gera CSV de vendas com as colunas do relatório do Zig"""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    rows = []
+    for i in range(n_sales):
+        r = rng.randrange(n_recipes)
+        quantity = rng.randint(1, 4)
+        unit_price = round(rng.uniform(15, 90), 2)
+        rows.append({
+            'id': str(100000 + i),
+            'SKU': f"SKU{r:04d}",
+            'Nome do Produto': f"PRODUTO {r}",
+            'Categoria': 'Pratos',
+            'Valor Unitário': unit_price,
+            'Quantidade': quantity,
+            'Valor total': round(unit_price * quantity, 2),
+            'Vendedor': 'Bench',
+            'Cliente': f"Mesa {rng.randint(1, 30)}",
+            'Data': (start + timedelta(minutes=7 * i)).strftime('%d/%m/%Y %H:%M:%S'),
+            'Bar': rng.choice(BARS),
+        })
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+def seed_backend(db, ingredients, recipes, mappings):
+    """Popula o backend (MemoryStore.seed ou batches no emulator)"""
+    collections = {'ingredients': ingredients, 'recipes': recipes, 'product_mappings': mappings}
+    if hasattr(db, 'seed'):
+        for name, docs in collections.items():
+            db.seed(name, docs)
+        return
+
+    for name, docs in collections.items():
+        items = list(docs.items())
+        for i in range(0, len(items), 500):
+            batch = db.batch()
+            for doc_id, data in items[i:i + 500]:
+                batch.set(db.collection(name).document(doc_id), data)
+            batch.commit()
+
+def timed(label, timings, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[label] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do pipeline de vendas')
+    parser.add_argument('--sales', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=236)
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latência simulada por round trip (memory)')
+    parser.add_argument('--backend', choices=['memory', 'emulator'], default='memory')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--write-rate', type=float, default=0,
+                        help='Ops/s iniciais do WriteScheduler (0 = sem limite)')
+    args = parser.parse_args()
+
+    os.environ['STORAGE_BACKEND'] = args.backend
+    os.environ['MEMORY_STORE_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['WRITE_RATE_START'] = str(args.write_rate)
+
+    from firebase_helper import get_firestore_client
+    from tools.common.instrumentation import get_op_stats
+    from parse_sales_file import parse_sales_file
+    from validate_sales_data import validate_sales_data
+    from update_stock_from_sales import update_stock_from_sales
+
+    db = get_firestore_client()
+    ingredients, recipes, mappings = build_catalog(args.ingredients, args.recipes)
+    seed_backend(db, ingredients, recipes, mappings)
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sales_path = Path(tmp) / 'vendas.csv'
+        write_sales_file(sales_path, args.sales, args.recipes)
+
+        # Progresso das etapas vai para stderr; stdout fica só com o JSON final
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            parsed = timed('parse', timings, parse_sales_file, str(sales_path))
+            validated = timed('validate', timings, validate_sales_data, parsed)
+            stock = timed(
+                'update_stock', timings, update_stock_from_sales, validated, 'bench_offline',
+                concurrency=args.concurrency
+            )
+        finally:
+            sys.stdout = stdout
+
+    result = {
+        'backend': args.backend,
+        'latencyMs': args.latency_ms,
+        'concurrency': args.concurrency,
+        'sales': args.sales,
+        'ingredients': args.ingredients,
+        'recipes': args.recipes,
+        'stagesMs': timings,
+        'totalMs': round(sum(timings.values()), 2),
+        'salesCreated': stock['salesCreated'],
+        'ingredientsUpdated': stock['ingredientsUpdated'],
+        'stockMovementsCreated': stock['stockMovementsCreated'],
+        'writeScheduler': stock.get('writeScheduler', {}),
+    }
+    result['firestoreOps'] = get_op_stats()
+    if hasattr(db, 'stats'):
+        result['storageOps'] = dict(db.stats)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latência ponta a ponta do update de estoque (sequencial × concorrente)
+
+Roda update_stock_from_sales com concorrência 1 (uma RPC por vez) e com
+--concurrency N sobre o mesmo JSON validado e compara o tempo total. Cada rodada ESCREVE no banco (decrementa estoque
+e cria vendas), por isso exige o Firestore Emulator
+(FIRESTORE_EMULATOR_HOST) a menos que --allow-production seja passado.
+
+Uso:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 \\
+    python tools/benchmarks/stock_update_latency.py <validated.json> [--rounds 3] [--concurrency 8]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'vendas'))
+from update_stock_from_sales import update_stock_from_sales, DEFAULT_CONCURRENCY
+
+def run_once(validated_data, upload_id, concurrency):
+    started = time.perf_counter()
+    update_stock_from_sales(validated_data, upload_id, concurrency=concurrency)
+    return (time.perf_counter() - started) * 1000
+
+def summarize(samples):
+    return {
+        'medianMs': round(statistics.median(samples), 2),
+        'minMs': round(min(samples), 2),
+        'maxMs': round(max(samples), 2),
+        'samplesMs': [round(s, 2) for s in samples]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência do update de estoque: sequencial × concorrente')
+    parser.add_argument('validated_file')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--allow-production', action='store_true')
+    args = parser.parse_args()
+
+    if not os.getenv('FIRESTORE_EMULATOR_HOST') and not args.allow_production:
+        print("❌ Este benchmark escreve no banco. Defina FIRESTORE_EMULATOR_HOST "
+              "ou passe --allow-production.", file=sys.stderr)
+        sys.exit(1)
+
+    with open(args.validated_file, 'r', encoding='utf-8') as f:
+        validated_data = json.load(f)
+
+    sequential_samples, concurrent_samples = [], []
+    for i in range(args.rounds):
+        # Alterna a ordem para não favorecer um dos modos com cache quente
+        order = [(1, sequential_samples), (args.concurrency, concurrent_samples)]
+        if i % 2:
+            order.reverse()
+        for concurrency, samples in order:
+            upload_id = f"bench_c{concurrency}_{i}"
+            samples.append(run_once(validated_data, upload_id, concurrency))
+
+    result = {
+        'sales': len(validated_data.get('validSales', [])),
+        'rounds': args.rounds,
+        'concurrency': args.concurrency,
+        'sequential': summarize(sequential_samples),
+        'concurrent': summarize(concurrent_samples),
+    }
+    result['speedup'] = round(result['sequential']['medianMs'] / result['concurrent']['medianMs'], 2) if result['concurrent']['medianMs'] else None
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Consumo teórico × real entre contagens de inventário
+
+Para cada ingrediente, entre duas contagens consecutivas (inventory_counts):
+    real     = contado antes + recebido − contado depois
+    teórico  = Σ vendas × ficha técnica no intervalo (histórico Parquet)
+    variação = real − teórico   (positivo: sumiu mais do que as vendas explicam)
+
+Recebimentos (receivings completed, received_qty do checklist) entram
+pela data de conclusão. Tudo é calculado em DataFrames: vendas explodidas
+pela matriz de receitas viram eventos (ingrediente, instante, quantidade),
+somas acumuladas por ingrediente e merge_asof nas pontas de cada
+intervalo — sem leitura de documento por venda.
+
+Sinaliza quem passar dos dois limites (--min-qty e --threshold, em % do
+teórico). Com --alerts grava um alerta 'consumption_variance' por
+ingrediente sinalizado (mesmo formato dos alertas do backend), com ID fixo
+por ingrediente e contagem de fechamento: rodar de novo não duplica nem
+reabre alertas já tratados.
+
+Datas do Firestore (UTC) são convertidas para o fuso do Zig
+(LOCAL_TIMEZONE, padrão America/Sao_Paulo) antes de cruzar com as vendas.
+
+Uso:
+    python tools/calculations/consumption_variance.py [--all-intervals]
+        [--since 2024-01-01] [--threshold 15] [--min-qty 0.5] [--alerts]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client, server_timestamp
+from tools.common.write_scheduler import get_write_scheduler
+from tools.vendas.sales_history import read_sales
+
+LOCAL_TIMEZONE = ZoneInfo(os.getenv('LOCAL_TIMEZONE', 'America/Sao_Paulo'))
+DEFAULT_THRESHOLD_PCT = 15.0
+DEFAULT_MIN_QTY = 0.5
+
+# ==================== DADOS ====================
+
+def to_local(value):
+    """Timestamp do Firestore (ou string ISO) → datetime local sem fuso, como no histórico"""
+    if value is None or value == '':
+        return pd.NaT
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(LOCAL_TIMEZONE).tz_localize(None)
+    return ts
+
+def load_counts(db):
+    """
+    Itens das contagens concluídas
+
+    Returns:
+        DataFrame: count_id, count_date, ingredient_id, ingredient_name, counted_qty, unit
+    """
+    rows = []
+    for doc in db.collection('inventory_counts').where('status', '==', 'completed').stream():
+        data = doc.to_dict()
+        count_date = to_local(data.get('count_date') or data.get('created_at'))
+        for item in data.get('items', []):
+            rows.append({
+                'count_id': doc.id,
+                'count_date': count_date,
+                'ingredient_id': item.get('ingredient_id'),
+                'ingredient_name': item.get('ingredient_name', ''),
+                'counted_qty': float(item.get('counted_qty') or 0),
+                'unit': item.get('unit', '')
+            })
+    counts = pd.DataFrame(rows, columns=['count_id', 'count_date', 'ingredient_id', 'ingredient_name',
+                                         'counted_qty', 'unit'])
+    return counts.dropna(subset=['count_date', 'ingredient_id'])
+
+def load_receivings(db):
+    """
+    Quantidades recebidas por ingrediente
+
+    Returns:
+        DataFrame: ingredient_id, at, quantity
+    """
+    rows = []
+    for doc in db.collection('receivings').where('status', '==', 'completed').stream():
+        data = doc.to_dict()
+        received_at = to_local(data.get('completed_at') or data.get('receiving_date'))
+        for item in data.get('checklist', []):
+            if item.get('is_received') and item.get('received_qty'):
+                rows.append({
+                    'ingredient_id': item.get('ingredient_id'),
+                    'at': received_at,
+                    'quantity': float(item['received_qty'])
+                })
+    return pd.DataFrame(rows, columns=['ingredient_id', 'at', 'quantity']).dropna(subset=['at'])
+
+def load_recipe_lines(db):
+    """
+    Consumo de cada ingrediente por unidade vendida de cada SKU
+
+    Returns:
+        DataFrame: sku, ingredient_id, per_unit
+    """
+    recipes = {doc.id: doc.to_dict() for doc in db.collection('recipes').stream()}
+    rows = []
+    mapped_skus = set()
+    for doc in db.collection('product_mappings').stream():
+        mapping = doc.to_dict()
+        recipe = recipes.get(mapping.get('recipe_id'))
+        sku = str(mapping.get('sku') or '')
+        # Mais de um mapeamento para o mesmo SKU: vale o primeiro
+        if not sku or not recipe or sku in mapped_skus:
+            continue
+        mapped_skus.add(sku)
+        portions = recipe.get('portions') or 1
+        for ingredient in recipe.get('ingredients', []):
+            if ingredient.get('ingredientId'):
+                rows.append({
+                    'sku': sku,
+                    'ingredient_id': ingredient['ingredientId'],
+                    'per_unit': (ingredient.get('quantity') or 0) / portions
+                })
+    lines = pd.DataFrame(rows, columns=['sku', 'ingredient_id', 'per_unit'])
+    # Ingrediente repetido na ficha soma, como em update_stock_from_sales
+    return lines.groupby(['sku', 'ingredient_id'], as_index=False)['per_unit'].sum()
+
+def theoretical_events(start, end, recipe_lines):
+    """
+    Vendas do período explodidas pela ficha técnica
+
+    Returns:
+        DataFrame: ingredient_id, at, quantity
+    """
+    sales = read_sales(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                       columns=['sku', 'quantity', 'saleDate'])
+    if sales.empty:
+        return pd.DataFrame(columns=['ingredient_id', 'at', 'quantity'])
+    events = sales.merge(recipe_lines, on='sku', how='inner')
+    return pd.DataFrame({
+        'ingredient_id': events['ingredient_id'],
+        'at': events['saleDate'],
+        'quantity': events['quantity'] * events['per_unit']
+    })
+
+# ==================== CÁLCULO ====================
+
+def build_intervals(counts, all_intervals=False, since=None):
+    """Pares (contagem anterior, contagem seguinte) por ingrediente"""
+    counts = counts.sort_values(['ingredient_id', 'count_date'])
+    grouped = counts.groupby('ingredient_id')
+    intervals = counts.assign(
+        start=grouped['count_date'].shift(1),
+        opening_qty=grouped['counted_qty'].shift(1),
+        opening_count_id=grouped['count_id'].shift(1)
+    ).rename(columns={'count_date': 'end', 'counted_qty': 'closing_qty', 'count_id': 'closing_count_id'})
+    intervals = intervals.dropna(subset=['start'])
+    if since:
+        intervals = intervals[intervals['end'] >= pd.Timestamp(since)]
+    if not all_intervals:
+        intervals = intervals.groupby('ingredient_id').tail(1)
+    return intervals.reset_index(drop=True)
+
+def sum_between(intervals, events, column):
+    """
+    Σ events.quantity em (start, end] por ingrediente, vetorizado
+
+    Soma acumulada por ingrediente + merge_asof nas duas pontas do intervalo.
+    """
+    if events.empty:
+        return intervals.assign(**{column: 0.0})
+
+    events = events.sort_values(['ingredient_id', 'at'])
+    events = events.assign(cumulative=events.groupby('ingredient_id')['quantity'].cumsum())
+    events = events[['ingredient_id', 'at', 'cumulative']].sort_values('at')
+
+    def cumulative_at(key):
+        probe = intervals[['ingredient_id', key]].reset_index().sort_values(key)
+        merged = pd.merge_asof(probe, events, left_on=key, right_on='at', by='ingredient_id', direction='backward')
+        return merged.set_index('index')['cumulative'].reindex(intervals.index).fillna(0.0)
+
+    return intervals.assign(**{column: cumulative_at('end') - cumulative_at('start')})
+
+def compute_variance(counts, receivings, recipe_lines, all_intervals=False, since=None,
+                     threshold_pct=DEFAULT_THRESHOLD_PCT, min_qty=DEFAULT_MIN_QTY):
+    """
+    Variação real × teórica por intervalo
+
+    Returns:
+        DataFrame: um intervalo por linha, com 'flagged'
+    """
+    intervals = build_intervals(counts, all_intervals, since)
+    if intervals.empty:
+        return intervals
+
+    start, end = intervals['start'].min(), intervals['end'].max()
+    intervals = sum_between(intervals, receivings, 'received')
+    intervals = sum_between(intervals, theoretical_events(start, end, recipe_lines), 'theoretical')
+
+    intervals['actual'] = intervals['opening_qty'] + intervals['received'] - intervals['closing_qty']
+    intervals['variance'] = intervals['actual'] - intervals['theoretical']
+    theoretical = intervals['theoretical'].where(intervals['theoretical'] > 0)
+    intervals['variance_pct'] = (intervals['variance'] / theoretical * 100).round(1)
+    intervals['flagged'] = (
+        (intervals['variance'].abs() >= min_qty)
+        & ((intervals['variance_pct'].abs() >= threshold_pct) | theoretical.isna())
+    )
+    return intervals
+
+# ==================== EXECUÇÃO ====================
+
+def interval_record(row, unit_cost):
+    return {
+        'ingredientId': row.ingredient_id,
+        'name': row.ingredient_name,
+        'unit': row.unit,
+        'start': row.start.isoformat(),
+        'end': row.end.isoformat(),
+        'openingCountId': row.opening_count_id,
+        'closingCountId': row.closing_count_id,
+        'openingQty': round(row.opening_qty, 3),
+        'closingQty': round(row.closing_qty, 3),
+        'received': round(row.received, 3),
+        'theoretical': round(row.theoretical, 3),
+        'actual': round(row.actual, 3),
+        'variance': round(row.variance, 3),
+        'variancePct': None if pd.isna(row.variance_pct) else float(row.variance_pct),
+        'varianceValue': round(row.variance * unit_cost, 2) if unit_cost else None,
+        'flagged': bool(row.flagged)
+    }
+
+def unit_costs(db):
+    """Custo por unidade de estoque (preço da embalagem / grossQuantity)"""
+    costs = {}
+    for doc in db.collection('ingredients').stream():
+        data = doc.to_dict()
+        price = float(data.get('price') or 0)
+        pack = float(data.get('grossQuantity') or 0)
+        costs[doc.id] = price / pack if pack > 0 else price
+    return costs
+
+def alert_id(record):
+    """ID fixo do alerta: um por ingrediente e intervalo (contagem de fechamento)"""
+    return f"consumption_variance_{record['ingredientId']}_{record['closingCountId']}"
+
+def write_alerts(db, flagged):
+    """Grava só os alertas que ainda não existem (status de alertas já tratados é mantido)"""
+    writer = get_write_scheduler()
+    alerts = db.collection('alerts')
+    refs = [alerts.document(alert_id(record)) for record in flagged]
+    existing = {doc.id for doc in db.get_all(refs) if doc.exists}
+    for record, ref in zip(flagged, refs):
+        if ref.id in existing:
+            continue
+        direction = 'acima' if record['variance'] > 0 else 'abaixo'
+        writer.set(ref, {
+            'type': 'consumption_variance',
+            'priority': 'high' if abs(record['variancePct'] or 100) >= 50 else 'medium',
+            'title': f"Consumo {direction} do teórico: {record['name']}",
+            'message': (
+                f"Entre {record['start'][:10]} e {record['end'][:10]} o consumo real de {record['name']} foi "
+                f"{record['actual']:g} {record['unit']} contra {record['theoretical']:g} {record['unit']} "
+                f"pelas vendas (variação {record['variance']:+g})."
+            ),
+            'relatedId': record['closingCountId'],
+            'status': 'pending',
+            'createdAt': server_timestamp()
+        })
+    writer.flush()
+    return writer.stats
+
+def run_variance(since=None, all_intervals=False, threshold_pct=DEFAULT_THRESHOLD_PCT,
+                 min_qty=DEFAULT_MIN_QTY, alerts=False):
+    started = time.perf_counter()
+    db = get_firestore_client()
+
+    counts = load_counts(db)
+    receivings = load_receivings(db)
+    recipe_lines = load_recipe_lines(db)
+    costs = unit_costs(db)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    compute_started = time.perf_counter()
+    variance = compute_variance(counts, receivings, recipe_lines, all_intervals, since, threshold_pct, min_qty)
+    compute_ms = (time.perf_counter() - compute_started) * 1000
+
+    records = [
+        interval_record(row, costs.get(row.ingredient_id))
+        for row in variance.itertuples(index=False)
+    ]
+    records.sort(key=lambda r: abs(r['varianceValue'] or r['variance']), reverse=True)
+    flagged = [r for r in records if r['flagged']]
+
+    result = {
+        'counts': int(counts['count_id'].nunique()) if not counts.empty else 0,
+        'intervals': len(records),
+        'flagged': len(flagged),
+        'thresholdPct': threshold_pct,
+        'minQty': min_qty,
+        'totalVarianceValue': round(sum(r['varianceValue'] or 0 for r in flagged), 2),
+        'loadMs': round(load_ms, 1),
+        'computeMs': round(compute_ms, 1),
+        'variances': records
+    }
+    if alerts and flagged:
+        result['writeScheduler'] = write_alerts(db, flagged)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Consumo teórico × real entre contagens de inventário')
+    parser.add_argument('--since', help='Só intervalos que terminam a partir desta data (YYYY-MM-DD)')
+    parser.add_argument('--all-intervals', action='store_true',
+                        help='Todos os intervalos entre contagens (padrão: só o último de cada ingrediente)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD_PCT,
+                        help='Variação mínima em %% do teórico para sinalizar')
+    parser.add_argument('--min-qty', type=float, default=DEFAULT_MIN_QTY,
+                        help='Variação mínima absoluta (unidade do ingrediente) para sinalizar')
+    parser.add_argument('--alerts', action='store_true', help='Grava alertas para os sinalizados')
+    args = parser.parse_args()
+
+    print("⚖️  Comparando consumo teórico e real...", file=sys.stderr)
+    result = run_variance(args.since, args.all_intervals, args.threshold, args.min_qty, args.alerts)
+    print(f"✓ {result['intervals']} intervalos, {result['flagged']} sinalizados "
+          f"(cálculo em {result['computeMs']:.0f}ms)", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Previsão de consumo diário por ingrediente → estoque mínimo/máximo sugerido
+
+1. Vendas diárias por SKU (histórico Parquet, tools/vendas/sales_history.py)
+2. Consumo diário por ingrediente = vendas × matriz de receitas
+   (SKU → receita via product_mappings; quantidade / porções por ingrediente)
+3. Suavização exponencial com sazonalidade semanal aditiva, ajustada para
+   todos os ingredientes de uma vez (numpy, uma coluna por ingrediente;
+   alpha escolhido por ingrediente pelo menor erro one-step)
+4. Sugestão por ingrediente:
+       mínimo = consumo previsto no lead time + z·σ·√lead time
+       máximo = mínimo + consumo previsto no período de revisão
+   lead time = deliveryTime/delivery_time do fornecedor principal (ou --lead-time)
+
+Grava em batch, em cada ingrediente: suggested_min_stock,
+suggested_max_stock, avg_daily_consumption (lido pelo backend para a
+data de recompra) e 'forecast' com os parâmetros. Com --apply também
+sobrescreve min_stock/max_stock (e minStock/maxStock dos tools).
+
+Uso:
+    python tools/calculations/demand_forecast.py [--start 2024-01] [--end 2024-03]
+        [--lead-time 3] [--review-days 7] [--service-level 0.95] [--dry-run] [--apply]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from statistics import NormalDist
+from datetime import datetime, timezone
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.vendas.sales_history import read_sales
+from tools.common.schema import ingredient_supplier, supplier_lead_time
+
+SEASON = 7
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+GAMMA = 0.1
+DEFAULT_LEAD_TIME = 3
+DEFAULT_REVIEW_DAYS = 7
+DEFAULT_SERVICE_LEVEL = 0.95
+MIN_HISTORY_DAYS = 14
+
+# ==================== DADOS ====================
+
+def daily_sales_matrix(sales):
+    """
+    Vendas diárias por SKU
+
+    Args:
+        sales (DataFrame): colunas sku, quantity, saleDate
+
+    Returns:
+        tuple: (dias: DatetimeIndex, skus: list, matriz dias × skus)
+    """
+    import pandas as pd
+
+    sales = sales.assign(day=sales['saleDate'].dt.normalize())
+    table = sales.pivot_table(index='day', columns='sku', values='quantity', aggfunc='sum', fill_value=0)
+    # Dias sem venda nenhuma também contam (consumo zero)
+    days = pd.date_range(table.index.min(), table.index.max(), freq='D')
+    table = table.reindex(days, fill_value=0)
+    return days, list(table.columns), table.to_numpy(dtype=float)
+
+def recipe_matrix(skus, sku_to_recipe, recipes):
+    """
+    Consumo de cada ingrediente por unidade vendida de cada SKU
+
+    Returns:
+        tuple: (ingredient_ids: list, matriz skus × ingredientes)
+    """
+    ingredient_index = {}
+    entries = []
+    for row, sku in enumerate(skus):
+        recipe = recipes.get(sku_to_recipe.get(sku))
+        if not recipe:
+            continue
+        portions = recipe.get('portions') or 1
+        for ingredient in recipe.get('ingredients', []):
+            ing_id = ingredient.get('ingredientId')
+            if not ing_id:
+                continue
+            col = ingredient_index.setdefault(ing_id, len(ingredient_index))
+            entries.append((row, col, (ingredient.get('quantity') or 0) / portions))
+
+    matrix = np.zeros((len(skus), len(ingredient_index)))
+    for row, col, value in entries:
+        matrix[row, col] += value
+    return list(ingredient_index), matrix
+
+def load_catalog(db):
+    """sku → recipe_id, receitas, ingredientes e prazos de entrega dos fornecedores"""
+    sku_to_recipe = {}
+    for doc in db.collection('product_mappings').stream():
+        data = doc.to_dict()
+        if data.get('sku') and data.get('recipe_id'):
+            sku_to_recipe[str(data['sku'])] = data['recipe_id']
+
+    recipes = {doc.id: doc.to_dict() for doc in db.collection('recipes').stream()}
+    ingredients = {doc.id: doc.to_dict() for doc in db.collection('ingredients').stream()}
+    suppliers = {doc.id: doc.to_dict() for doc in db.collection('suppliers').stream()}
+    return sku_to_recipe, recipes, ingredients, suppliers
+
+# ==================== MODELO ====================
+
+def fit_seasonal_smoothing(consumption, alphas=ALPHAS, gamma=GAMMA, season=SEASON):
+    """
+    Suavização exponencial com sazonalidade aditiva, vetorizada
+
+    Roda todos os alphas × todos os ingredientes em uma passada pelos dias:
+        previsão_t = nível_{t-1} + sazonal_{t-season}
+        nível_t    = α·(y_t − sazonal_{t-season}) + (1−α)·nível_{t-1}
+        sazonal_t  = γ·(y_t − nível_t) + (1−γ)·sazonal_{t-season}
+
+    Args:
+        consumption (ndarray): dias × ingredientes
+
+    Returns:
+        dict: level (I), seasonal (season × I, alinhado ao dia seguinte ao
+              último), alpha (I), sigma (I, desvio do erro one-step)
+    """
+    days, n_ingredients = consumption.shape
+    n_alphas = len(alphas)
+    alpha = alphas[:, None]
+
+    # Inicialização pela primeira semana
+    warmup = consumption[:season]
+    level = np.broadcast_to(warmup.mean(axis=0), (n_alphas, n_ingredients)).copy()
+    seasonal = np.broadcast_to(warmup - warmup.mean(axis=0), (n_alphas, season, n_ingredients)).copy()
+
+    sse = np.zeros((n_alphas, n_ingredients))
+    for t in range(season, days):
+        y = consumption[t]
+        slot = t % season
+        error = y - (level + seasonal[:, slot])
+        sse += error ** 2
+        new_level = alpha * (y - seasonal[:, slot]) + (1 - alpha) * level
+        seasonal[:, slot] = gamma * (y - new_level) + (1 - gamma) * seasonal[:, slot]
+        level = new_level
+
+    best = sse.argmin(axis=0)
+    cols = np.arange(n_ingredients)
+    steps = max(days - season, 1)
+
+    # Reordena a sazonalidade para começar no dia seguinte ao último observado
+    order = [(days + k) % season for k in range(season)]
+    return {
+        'level': level[best, cols],
+        'seasonal': seasonal[best, :, cols].T[order],
+        'alpha': alphas[best],
+        'sigma': np.sqrt(sse[best, cols] / steps)
+    }
+
+def forecast(model, horizon):
+    """Consumo previsto para os próximos 'horizon' dias (horizon × ingredientes, ≥ 0)"""
+    season = model['seasonal'].shape[0]
+    steps = np.arange(horizon) % season
+    return np.clip(model['level'][None, :] + model['seasonal'][steps], 0, None)
+
+def suggest_levels(model, lead_times, review_days, service_level):
+    """
+    Mínimo/máximo sugeridos por ingrediente
+
+    Args:
+        lead_times (ndarray): dias de entrega por ingrediente
+
+    Returns:
+        dict: min, max, avg_daily (arrays por ingrediente)
+    """
+    horizon = int(lead_times.max()) + review_days
+    daily = forecast(model, max(horizon, SEASON))
+    cumulative = np.cumsum(daily, axis=0)
+    cols = np.arange(daily.shape[1])
+    lead_idx = np.maximum(lead_times.astype(int), 1) - 1
+
+    lead_demand = cumulative[lead_idx, cols]
+    review_demand = cumulative[lead_idx + review_days, cols] - lead_demand
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * model['sigma'] * np.sqrt(np.maximum(lead_times, 1))
+
+    minimum = lead_demand + safety
+    return {
+        'min': minimum,
+        'max': minimum + review_demand,
+        'avg_daily': daily[:SEASON].mean(axis=0)
+    }
+
+# ==================== EXECUÇÃO ====================
+
+def ingredient_lead_time(ingredient, suppliers, default):
+    """Prazo do fornecedor principal (o mesmo que o reorder_engine usa para projetar o estoque)"""
+    supplier_id = ingredient_supplier(ingredient)
+    return supplier_lead_time(suppliers[supplier_id], default) if supplier_id in suppliers else default
+
+def run_forecast(start=None, end=None, lead_time=DEFAULT_LEAD_TIME, review_days=DEFAULT_REVIEW_DAYS,
+                 service_level=DEFAULT_SERVICE_LEVEL, dry_run=False, apply=False):
+    """
+    Ajusta o modelo e grava as sugestões
+
+    Returns:
+        dict: Resumo (dias, ingredientes, tempos) + sugestões
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+
+    sales = read_sales(start, end, columns=['sku', 'quantity', 'saleDate'])
+    if sales.empty:
+        return {'error': 'Histórico de vendas vazio no período. Rode: python tools/cli.py sales-history ingest <export>'}
+
+    sku_to_recipe, recipes, ingredients, suppliers = load_catalog(db)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    fit_started = time.perf_counter()
+    days, skus, sales_matrix = daily_sales_matrix(sales)
+    ingredient_ids, per_unit = recipe_matrix(skus, sku_to_recipe, recipes)
+    if len(days) < MIN_HISTORY_DAYS:
+        return {'error': f'Histórico curto demais: {len(days)} dias (mínimo {MIN_HISTORY_DAYS})'}
+    if not ingredient_ids:
+        return {'error': 'Nenhum SKU do histórico tem receita com ingredientes'}
+
+    consumption = sales_matrix @ per_unit
+    model = fit_seasonal_smoothing(consumption)
+    lead_times = np.array([
+        ingredient_lead_time(ingredients.get(ing_id, {}), suppliers, lead_time) for ing_id in ingredient_ids
+    ])
+    levels = suggest_levels(model, lead_times, review_days, service_level)
+    fit_ms = (time.perf_counter() - fit_started) * 1000
+
+    fitted_at = datetime.now(timezone.utc)
+    suggestions = []
+    writer = get_write_scheduler()
+    ingredients_ref = db.collection('ingredients')
+
+    for col, ing_id in enumerate(ingredient_ids):
+        if ing_id not in ingredients:
+            continue
+        suggestion = {
+            'ingredientId': ing_id,
+            'name': ingredients[ing_id].get('name', ''),
+            'avgDailyConsumption': round(float(levels['avg_daily'][col]), 3),
+            'suggestedMinStock': round(float(levels['min'][col]), 2),
+            'suggestedMaxStock': round(float(levels['max'][col]), 2),
+            'leadTimeDays': float(lead_times[col]),
+            'alpha': float(model['alpha'][col])
+        }
+        suggestions.append(suggestion)
+        if dry_run:
+            continue
+
+        update = {
+            'suggested_min_stock': suggestion['suggestedMinStock'],
+            'suggested_max_stock': suggestion['suggestedMaxStock'],
+            'avg_daily_consumption': suggestion['avgDailyConsumption'],
+            'forecast': {
+                'model': 'seasonal_exponential_smoothing',
+                'alpha': suggestion['alpha'],
+                'gamma': GAMMA,
+                'sigma': round(float(model['sigma'][col]), 3),
+                'leadTimeDays': suggestion['leadTimeDays'],
+                'reviewDays': review_days,
+                'serviceLevel': service_level,
+                'historyDays': len(days),
+                'historyEnd': days[-1].strftime('%Y-%m-%d'),
+                'fittedAt': fitted_at
+            }
+        }
+        if apply:
+            update.update({
+                'min_stock': suggestion['suggestedMinStock'], 'max_stock': suggestion['suggestedMaxStock'],
+                'minStock': suggestion['suggestedMinStock'], 'maxStock': suggestion['suggestedMaxStock']
+            })
+        writer.update(ingredients_ref.document(ing_id), update)
+
+    if not dry_run:
+        writer.flush()
+
+    return {
+        'historyDays': len(days),
+        'historyStart': days[0].strftime('%Y-%m-%d'),
+        'historyEnd': days[-1].strftime('%Y-%m-%d'),
+        'skus': len(skus),
+        'ingredients': len(suggestions),
+        'dryRun': dry_run,
+        'applied': apply and not dry_run,
+        'loadMs': round(load_ms, 1),
+        'fitMs': round(fit_ms, 1),
+        'writeScheduler': None if dry_run else writer.stats,
+        'suggestions': sorted(suggestions, key=lambda s: s['avgDailyConsumption'], reverse=True)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Previsão de consumo por ingrediente → mínimo/máximo sugerido')
+    parser.add_argument('--start', help='Início do histórico (YYYY-MM ou YYYY-MM-DD)')
+    parser.add_argument('--end', help='Fim do histórico (inclusivo)')
+    parser.add_argument('--lead-time', type=float, default=DEFAULT_LEAD_TIME,
+                        help='Dias de entrega quando o fornecedor não tem delivery_time')
+    parser.add_argument('--review-days', type=int, default=DEFAULT_REVIEW_DAYS, help='Dias entre pedidos')
+    parser.add_argument('--service-level', type=float, default=DEFAULT_SERVICE_LEVEL)
+    parser.add_argument('--dry-run', action='store_true', help='Só calcula, sem gravar')
+    parser.add_argument('--apply', action='store_true', help='Também sobrescreve min_stock/max_stock')
+    args = parser.parse_args()
+
+    print("📈 Ajustando previsão de consumo por ingrediente...", file=sys.stderr)
+    result = run_forecast(args.start, args.end, args.lead_time, args.review_days,
+                          args.service_level, args.dry_run, args.apply)
+
+    if 'error' in result:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(1)
+
+    print(f"✓ {result['ingredients']} ingredientes, {result['historyDays']} dias de histórico "
+          f"(ajuste em {result['fitMs']:.0f}ms)", file=sys.stderr)
+    if result['writeScheduler']:
+        print(f"💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Custo das fichas técnicas (totalCost / costPerPortion) a partir dos ingredientes
+
+    custo unitário  = price / quantidade líquida
+                      (net_qty/netQuantity, senão bruta × rendimento)
+    custo da receita = Σ quantidade × custo unitário + mão de obra + equipamento
+
+Mesma conta do backend (cadastros.ts). Grava os dois formatos de campo
+(total_cost/cost_per_portion/ingredients_cost do backend e
+totalCost/costPerPortion das migrações), só nas receitas cujo custo mudou.
+
+Índice reverso ingrediente → receitas em .tmp/recipe_cost_index.json
+(RECIPE_COST_INDEX), com as linhas de cada receita e o último custo
+unitário de cada ingrediente. Execução incremental (padrão):
+    1. relê os ingredientes e compara o custo unitário com o índice
+    2. receitas alteradas desde a última execução (updated_at, ou
+       updatedAt/createdAt das fichas gravadas em camelCase) entram no índice
+    3. recalcula só as receitas que usam ingredientes alterados; as que
+       foram excluídas do Firestore saem do índice
+--full reconstrói o índice lendo todas as receitas e recalcula tudo; o
+cálculo é um bincount sobre as linhas (receita, ingrediente, quantidade).
+
+Uso:
+    python tools/calculations/recipe_costs.py [--full] [--ingredients id1,id2] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+from collections import defaultdict
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.common.instrumentation import op_stage, get_op_stats
+
+INDEX_PATH = Path(os.getenv('RECIPE_COST_INDEX', PROJECT_ROOT / '.tmp' / 'recipe_cost_index.json'))
+INDEX_VERSION = 1
+COST_DECIMALS = 4
+READS_PER_CALL = 100
+
+# Campos de alteração das fichas: backend (snake_case) e cadastro antigo (camelCase)
+RECIPE_CHANGE_FIELDS = ('updated_at', 'updatedAt', 'createdAt')
+
+def _number(data, *keys):
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+    return 0.0
+
+def unit_cost(ingredient):
+    """Custo por unidade líquida (price / net_qty, como o backend)"""
+    price = _number(ingredient, 'price')
+    net = _number(ingredient, 'net_qty', 'netQuantity')
+    if net <= 0:
+        gross = _number(ingredient, 'gross_qty', 'grossQuantity')
+        yield_factor = _number(ingredient, 'yield_factor', 'yieldFactor') or 1.0
+        net = gross * yield_factor
+    return round(price / net, 6) if net > 0 else 0.0
+
+def recipe_entry(data):
+    """Linhas da receita como guardadas no índice"""
+    lines = []
+    for item in data.get('ingredients', []):
+        ing_id = item.get('ingredientId') or item.get('id')
+        if ing_id:
+            lines.append([ing_id, _number(item, 'quantity')])
+    return {
+        'lines': lines,
+        'portions': _number(data, 'portions') or 1.0,
+        'extraCost': _number(data, 'labor_cost', 'laborCost') + _number(data, 'equipment_cost', 'equipmentCost'),
+        'totalCost': _number(data, 'total_cost', 'totalCost')
+    }
+
+class CostIndex:
+    """
+    Índice persistido entre execuções
+
+    recipes: {recipe_id: {'lines': [[ingredient_id, quantidade]], 'portions',
+              'extraCost', 'totalCost'}}; unitCosts: {ingredient_id: custo}.
+    O índice reverso (by_ingredient) é derivado das linhas ao carregar.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.data = {'version': INDEX_VERSION, 'builtAt': None, 'lastRun': None, 'recipes': {}, 'unitCosts': {}}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('version') == INDEX_VERSION:
+                    self.data = saved
+            except (OSError, ValueError):
+                pass  # índice corrompido: reconstrói
+        self.by_ingredient = defaultdict(set)
+        for recipe_id, entry in self.data['recipes'].items():
+            self._link(recipe_id, entry)
+
+    @property
+    def built(self):
+        return self.data['builtAt'] is not None
+
+    def _link(self, recipe_id, entry):
+        for ing_id, _ in entry['lines']:
+            self.by_ingredient[ing_id].add(recipe_id)
+
+    def _unlink(self, recipe_id):
+        for ing_id, _ in self.data['recipes'].get(recipe_id, {}).get('lines', []):
+            self.by_ingredient[ing_id].discard(recipe_id)
+
+    def put_recipe(self, recipe_id, data):
+        self._unlink(recipe_id)
+        entry = recipe_entry(data)
+        self.data['recipes'][recipe_id] = entry
+        self._link(recipe_id, entry)
+
+    def drop_recipe(self, recipe_id):
+        self._unlink(recipe_id)
+        self.data['recipes'].pop(recipe_id, None)
+
+    def recipes_using(self, ingredient_ids):
+        affected = set()
+        for ing_id in ingredient_ids:
+            affected |= self.by_ingredient.get(ing_id, set())
+        return affected
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        tmp.replace(self.path)
+
+def compute_costs(recipe_ids, recipes, unit_costs):
+    """
+    Custo total por receita, vetorizado
+
+    Args:
+        recipe_ids (list): Receitas a calcular
+        recipes (dict): Entradas do índice
+        unit_costs (dict): {ingredient_id: custo unitário}
+
+    Returns:
+        tuple: (total_cost, ingredients_cost) arrays alinhados a recipe_ids
+    """
+    rows, costs, quantities = [], [], []
+    for row, recipe_id in enumerate(recipe_ids):
+        for ing_id, quantity in recipes[recipe_id]['lines']:
+            rows.append(row)
+            costs.append(unit_costs.get(ing_id, 0.0))
+            quantities.append(quantity)
+
+    ingredients_cost = np.bincount(
+        np.array(rows, dtype=np.int64), weights=np.array(quantities) * np.array(costs), minlength=len(recipe_ids)
+    ) if rows else np.zeros(len(recipe_ids))
+    extra = np.array([recipes[r]['extraCost'] for r in recipe_ids])
+    return ingredients_cost + extra, ingredients_cost
+
+def missing_recipes(db, recipe_ids):
+    """
+    Receitas do índice que não existem mais no Firestore
+
+    Um update em documento excluído derruba o batch inteiro (NotFound),
+    então as receitas afetadas são conferidas antes de gravar.
+
+    Returns:
+        set: IDs excluídos
+    """
+    recipes_ref = db.collection('recipes')
+    missing = set()
+    for start in range(0, len(recipe_ids), READS_PER_CALL):
+        refs = [recipes_ref.document(r) for r in recipe_ids[start:start + READS_PER_CALL]]
+        missing |= {doc.id for doc in db.get_all(refs) if not doc.exists}
+    return missing
+
+def run_costs(full=False, ingredient_ids=None, dry_run=False, index_path=INDEX_PATH):
+    """
+    Recalcula custos (incremental, ou tudo com full)
+
+    Returns:
+        dict: Resumo da execução
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+    index = CostIndex(index_path)
+    full = full or not index.built
+    removed = set()
+    run_at = datetime.now(timezone.utc)
+
+    with op_stage('load_ingredients'):
+        unit_costs = {doc.id: unit_cost(doc.to_dict()) for doc in db.collection('ingredients').stream()}
+
+    refreshed = set()
+    with op_stage('load_recipes'):
+        if full:
+            index.data['recipes'] = {}
+            index.by_ingredient.clear()
+            for doc in db.collection('recipes').stream():
+                index.put_recipe(doc.id, doc.to_dict())
+            index.data['builtAt'] = run_at.isoformat()
+        else:
+            # Fichas editadas no app desde a última execução
+            last_run = datetime.fromisoformat(index.data['lastRun'])
+            for field in RECIPE_CHANGE_FIELDS:
+                for doc in db.collection('recipes').where(field, '>', last_run).stream():
+                    if doc.id not in refreshed:
+                        index.put_recipe(doc.id, doc.to_dict())
+                        refreshed.add(doc.id)
+
+    previous_costs = index.data['unitCosts']
+    changed_ingredients = {
+        ing_id for ing_id in set(unit_costs) | set(previous_costs)
+        if unit_costs.get(ing_id) != previous_costs.get(ing_id)
+    }
+    changed_ingredients |= set(ingredient_ids or [])
+
+    if full:
+        affected = sorted(index.data['recipes'])
+    else:
+        affected = sorted((index.recipes_using(changed_ingredients) | refreshed) & set(index.data['recipes']))
+        with op_stage('load_recipes'):
+            removed = missing_recipes(db, [r for r in affected if r not in refreshed])
+        for recipe_id in removed:
+            index.drop_recipe(recipe_id)
+        affected = [r for r in affected if r not in removed]
+    load_ms = (time.perf_counter() - started) * 1000
+
+    compute_started = time.perf_counter()
+    totals, ingredient_totals = compute_costs(affected, index.data['recipes'], unit_costs)
+    compute_ms = (time.perf_counter() - compute_started) * 1000
+
+    writer = get_write_scheduler()
+    recipes_ref = db.collection('recipes')
+    updated = []
+    with op_stage('write_costs'):
+        for recipe_id, total, ingredients_cost in zip(affected, totals, ingredient_totals):
+            entry = index.data['recipes'][recipe_id]
+            total = round(float(total), COST_DECIMALS)
+            if total == round(entry['totalCost'], COST_DECIMALS) and not full:
+                continue
+            per_portion = round(total / entry['portions'], COST_DECIMALS)
+            updated.append({'recipeId': recipe_id, 'previousTotalCost': entry['totalCost'],
+                            'totalCost': total, 'costPerPortion': per_portion})
+            if dry_run:
+                continue
+            writer.update(recipes_ref.document(recipe_id), {
+                'ingredients_cost': round(float(ingredients_cost), COST_DECIMALS),
+                'total_cost': total,
+                'cost_per_portion': per_portion,
+                'totalCost': total,
+                'costPerPortion': per_portion,
+                'cost_updated_at': run_at
+            })
+            entry['totalCost'] = total
+        if not dry_run:
+            writer.flush()
+
+    if not dry_run:
+        index.data['unitCosts'] = unit_costs
+        index.data['lastRun'] = run_at.isoformat()
+        index.save()
+
+    return {
+        'mode': 'full' if full else 'incremental',
+        'ingredients': len(unit_costs),
+        'changedIngredients': len(changed_ingredients),
+        'refreshedRecipes': len(refreshed),
+        'removedRecipes': len(removed),
+        'recipesIndexed': len(index.data['recipes']),
+        'recipesRecomputed': len(affected),
+        'recipesUpdated': len(updated),
+        'dryRun': dry_run,
+        'loadMs': round(load_ms, 1),
+        'computeMs': round(compute_ms, 1),
+        'writeScheduler': None if dry_run else writer.stats,
+        'updates': updated
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcula o custo das fichas técnicas')
+    parser.add_argument('--full', action='store_true', help='Reconstrói o índice e recalcula todas as receitas')
+    parser.add_argument('--ingredients', help='IDs de ingredientes para tratar como alterados (separados por vírgula)')
+    parser.add_argument('--dry-run', action='store_true', help='Só calcula, sem gravar nem atualizar o índice')
+    args = parser.parse_args()
+
+    ingredient_ids = [i.strip() for i in args.ingredients.split(',') if i.strip()] if args.ingredients else None
+
+    print("💰 Recalculando custo das fichas técnicas...", file=sys.stderr)
+    result = run_costs(args.full, ingredient_ids, args.dry_run)
+    result['firestoreOps'] = get_op_stats()
+
+    print(f"✓ [{result['mode']}] {result['recipesRecomputed']} receitas recalculadas, "
+          f"{result['recipesUpdated']} com custo novo (cálculo em {result['computeMs']:.0f}ms)", file=sys.stderr)
+    if result['writeScheduler']:
+        print(f"💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
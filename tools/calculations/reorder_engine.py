@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Sugestão de compras → rascunhos de pedido (draft_orders) por fornecedor
+
+Para todos os ingredientes de uma vez (numpy):
+    consumo até a entrega = avg_daily_consumption × deliveryTime do fornecedor
+    em pedido             = pedidos já enviados e ainda não recebidos
+    estoque projetado     = estoque atual + em pedido − consumo até a entrega
+    repor se projetado ≤ mínimo, até o máximo:
+        quantidade = máximo − projetado, arredondada para cima em
+        múltiplos da embalagem (grossQuantity)
+
+'Em pedido' soma os recebimentos abertos (receivings awaiting_delivery/
+in_progress, ordered_qty do checklist) e os pedidos 'pending' sem
+recebimento: finalizar um rascunho e subir vendas em seguida não gera o
+mesmo pedido de novo.
+
+avg_daily_consumption vem de tools/calculations/demand_forecast.py; sem
+previsão, repõe só quem já está no mínimo. Mínimo/máximo: min_stock/
+max_stock (ou minStock/maxStock), senão os sugeridos pela previsão.
+
+Grava um rascunho por fornecedor em um único batch, com ID fixo
+'auto_<supplier_id>' no formato do EstoqueService (snake_case, status
+'draft'): rodar de novo substitui o rascunho anterior, e rascunhos já
+editados no app (last_modified ≠ generated_at) são preservados. Roda ao fim de
+cada upload de vendas (REORDER_ENGINE=0 desliga), com created_by = uploadedBy do
+upload; o EstoqueService lista os rascunhos source='reorder_engine' para todos
+os usuários.
+
+Uso:
+    python tools/calculations/reorder_engine.py [--user <uid>] [--default-lead-time 2]
+        [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+from collections import defaultdict
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.common.instrumentation import get_op_stats
+from tools.estoque.snapshot_stock import read_stock_level
+from tools.common.schema import first_field, ingredient_supplier, supplier_lead_time
+
+DRAFT_PREFIX = 'auto_'
+SOURCE = 'reorder_engine'
+DEFAULT_LEAD_TIME = 2  # Mesmo padrão do import de fornecedores
+DEFAULT_USER = os.getenv('REORDER_DRAFT_USER', SOURCE)
+
+# Estoque só entra ao completar o recebimento (OperacoesService.completeReceiving)
+OPEN_RECEIVING_STATUSES = ['awaiting_delivery', 'in_progress']
+OPEN_PURCHASE_STATUSES = ['pending']
+
+def load_on_order(db):
+    """
+    Quantidade já pedida e ainda não recebida por ingrediente
+
+    Returns:
+        dict: {ingredient_id: quantidade}
+    """
+    on_order = defaultdict(float)
+    covered = set()
+
+    for doc in db.collection('receivings').where('status', 'in', OPEN_RECEIVING_STATUSES).stream():
+        receiving = doc.to_dict()
+        covered.add(receiving.get('purchase_id'))
+        for item in receiving.get('checklist') or []:
+            quantity = float(first_field(item, 'ordered_qty', 'quantity'))
+            if item.get('ingredient_id') and quantity > 0:
+                on_order[item['ingredient_id']] += quantity
+
+    # Pedido sem recebimento criado (ou ainda não vinculado): conta pelos itens do pedido
+    for doc in db.collection('purchases').where('status', 'in', OPEN_PURCHASE_STATUSES).stream():
+        purchase = doc.to_dict()
+        if doc.id in covered or purchase.get('receiving_id'):
+            continue
+        for item in purchase.get('items') or []:
+            quantity = float(first_field(item, 'quantity'))
+            if item.get('ingredient_id') and quantity > 0:
+                on_order[item['ingredient_id']] += quantity
+
+    return dict(on_order)
+
+def compute_reorders(ingredients, suppliers, default_lead_time=DEFAULT_LEAD_TIME, on_order=None):
+    """
+    Quantidades a pedir por ingrediente
+
+    Args:
+        ingredients (dict): {id: data}
+        suppliers (dict): {id: data}
+        on_order (dict): {id: quantidade já pedida e não recebida} (load_on_order)
+
+    Returns:
+        list: [{'ingredientId', 'supplierId', 'quantity', ...}] só dos que precisam repor
+    """
+    ids = [ing_id for ing_id, data in ingredients.items() if ingredient_supplier(data) in suppliers]
+    if not ids:
+        return []
+    rows = [ingredients[ing_id] for ing_id in ids]
+    supplier_of = [ingredient_supplier(data) for data in rows]
+
+    on_order = on_order or {}
+    stock = np.array([read_stock_level(data) for data in rows])
+    pending = np.array([float(on_order.get(ing_id, 0.0)) for ing_id in ids])
+    daily = np.array([float(first_field(data, 'avg_daily_consumption')) for data in rows])
+    minimum = np.array([float(first_field(data, 'min_stock', 'minStock', 'suggested_min_stock')) for data in rows])
+    maximum = np.array([float(first_field(data, 'max_stock', 'maxStock', 'suggested_max_stock')) for data in rows])
+    pack = np.array([float(first_field(data, 'grossQuantity', 'gross_quantity')) for data in rows])
+    price = np.array([float(first_field(data, 'price', 'unit_price')) for data in rows])
+    lead = np.array([supplier_lead_time(suppliers[s], default_lead_time) for s in supplier_of])
+
+    projected = stock + pending - daily * lead
+    target = np.maximum(maximum, minimum)
+    quantity = np.where((projected <= minimum) & (target > 0), target - projected, 0.0)
+    # Embalagem: arredonda para cima em múltiplos de grossQuantity
+    has_pack = pack > 0
+    packs = np.where(has_pack, np.ceil(quantity / np.where(has_pack, pack, 1)), 0)
+    quantity = np.where(has_pack, packs * pack, quantity)
+    # 'price' é o preço da embalagem (CADASTRO DE INSUMOS); o rascunho usa preço por unidade
+    unit_price = np.where(has_pack, price / np.where(has_pack, pack, 1), price)
+
+    reorders = []
+    for i in np.flatnonzero(quantity > 0):
+        reorders.append({
+            'ingredientId': ids[i],
+            'name': rows[i].get('name', ''),
+            'unit': rows[i].get('unit', ''),
+            'supplierId': supplier_of[i],
+            'currentStock': round(float(stock[i]), 3),
+            'onOrder': round(float(pending[i]), 3),
+            'projectedStock': round(float(projected[i]), 3),
+            'minStock': float(minimum[i]),
+            'maxStock': float(maximum[i]),
+            'leadTimeDays': float(lead[i]),
+            'packs': int(packs[i]) if has_pack[i] else None,
+            'quantity': round(float(quantity[i]), 3),
+            'unitPrice': round(float(unit_price[i]), 4) if price[i] > 0 else None
+        })
+    return reorders
+
+def draft_item(reorder):
+    """Item no formato do EstoqueService.cleanDraftItem"""
+    item = {
+        'ingredient_id': reorder['ingredientId'],
+        'ingredient_name': reorder['name'],
+        'quantity': reorder['quantity'],
+        'unit': reorder['unit']
+    }
+    if reorder['unitPrice'] is not None:
+        item['unit_price'] = reorder['unitPrice']
+    on_order = f" + {reorder['onOrder']:g} em pedido" if reorder.get('onOrder') else ''
+    item['notes'] = (
+        f"Estoque {reorder['currentStock']:g}{on_order} → {reorder['projectedStock']:g} em "
+        f"{reorder['leadTimeDays']:g} dias (mín {reorder['minStock']:g}, máx {reorder['maxStock']:g})"
+    )
+    return item
+
+def is_user_edited(draft):
+    """Rascunho automático alterado no app (updateDraft/addItemToDraft mudam last_modified)"""
+    return draft.get('last_modified') != draft.get('generated_at')
+
+def build_draft_orders(user=DEFAULT_USER, default_lead_time=DEFAULT_LEAD_TIME, dry_run=False):
+    """
+    Calcula as reposições e grava um rascunho por fornecedor
+
+    Returns:
+        dict: Resumo + rascunhos gerados
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+
+    ingredients = {doc.id: doc.to_dict() for doc in db.collection('ingredients').stream()}
+    suppliers = {doc.id: doc.to_dict() for doc in db.collection('suppliers').stream()}
+    on_order = load_on_order(db)
+    existing = {
+        doc.id: doc.to_dict()
+        for doc in db.collection('draft_orders').where('source', '==', SOURCE).stream()
+    }
+    load_ms = (time.perf_counter() - started) * 1000
+
+    compute_started = time.perf_counter()
+    reorders = compute_reorders(ingredients, suppliers, default_lead_time, on_order)
+    by_supplier = defaultdict(list)
+    for reorder in reorders:
+        by_supplier[reorder['supplierId']].append(reorder)
+    compute_ms = (time.perf_counter() - compute_started) * 1000
+
+    generated_at = datetime.now(timezone.utc)
+    drafts = []
+    preserved = []
+    writer = get_write_scheduler()
+    drafts_ref = db.collection('draft_orders')
+
+    for supplier_id, items in sorted(by_supplier.items()):
+        draft_id = f"{DRAFT_PREFIX}{supplier_id}"
+        if draft_id in existing and is_user_edited(existing[draft_id]):
+            preserved.append(draft_id)
+            continue
+
+        draft_items = [draft_item(r) for r in sorted(items, key=lambda r: r['name'])]
+        draft = {
+            'supplier_id': supplier_id,
+            'supplier_name': suppliers[supplier_id].get('name', ''),
+            'created_by': user,
+            'created_at': existing.get(draft_id, {}).get('created_at', generated_at),
+            'last_modified': generated_at,
+            'generated_at': generated_at,
+            'source': SOURCE,
+            'status': 'draft',
+            'items': draft_items,
+            'total_value': round(sum(i['quantity'] * i.get('unit_price', 0) for i in draft_items), 2)
+        }
+        drafts.append({'id': draft_id, 'supplierName': draft['supplier_name'],
+                       'items': len(draft_items), 'totalValue': draft['total_value']})
+        if not dry_run:
+            writer.set(drafts_ref.document(draft_id), draft)
+
+    # Fornecedores que não precisam mais de reposição: remove o rascunho automático
+    stale = [
+        draft_id for draft_id, draft in existing.items()
+        if draft_id[len(DRAFT_PREFIX):] not in by_supplier and draft.get('status') == 'draft'
+        and not is_user_edited(draft)
+    ]
+    if not dry_run:
+        for draft_id in stale:
+            writer.delete(drafts_ref.document(draft_id))
+        writer.flush()
+
+    return {
+        'ingredients': len(ingredients),
+        'reorderItems': len(reorders),
+        'drafts': drafts,
+        'preserved': preserved,
+        'removed': stale,
+        'dryRun': dry_run,
+        'loadMs': round(load_ms, 1),
+        'computeMs': round(compute_ms, 1),
+        'writeScheduler': None if dry_run else writer.stats,
+        'reorders': reorders
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera rascunhos de pedido por fornecedor')
+    parser.add_argument('--user', default=DEFAULT_USER, help='created_by dos rascunhos (REORDER_DRAFT_USER)')
+    parser.add_argument('--default-lead-time', type=float, default=DEFAULT_LEAD_TIME,
+                        help='Dias de entrega para fornecedor sem deliveryTime')
+    parser.add_argument('--dry-run', action='store_true', help='Só calcula, sem gravar')
+    args = parser.parse_args()
+
+    print("🛒 Calculando reposição de estoque...", file=sys.stderr)
+    result = build_draft_orders(args.user, args.default_lead_time, args.dry_run)
+    result['firestoreOps'] = get_op_stats()
+
+    print(f"✓ {result['reorderItems']} itens em {len(result['drafts'])} rascunhos "
+          f"(cálculo em {result['computeMs']:.0f}ms)", file=sys.stderr)
+    if result['preserved']:
+        print(f"⚠ {len(result['preserved'])} rascunhos editados no app preservados", file=sys.stderr)
+    if result['writeScheduler']:
+        print(f"💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Ponto de entrada único para os tools Python
+
+Cada subcomando executa o script correspondente como __main__, então só
+os imports daquele tool são carregados (pandas, firebase_admin,
+fuzzywuzzy, ... ficam fora de 'validate', '--help', etc).
+
+Uso:
+    python tools/cli.py <comando> [args do tool]
+    python tools/cli.py --help
+
+Exemplos:
+    python tools/cli.py parse vendas.xlsx
+    python tools/cli.py update-stock validated.json upload_123
+    python tools/cli.py migrate-initial-data
+"""
+
+import sys
+import runpy
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).parent
+
+# comando → (script relativo a tools/, descrição)
+COMMANDS = {
+    # Vendas
+    'parse': ('vendas/parse_sales_file.py', 'Parse do Excel/CSV do Zig → JSON'),
+    'validate': ('vendas/validate_sales_data.py', 'Valida vendas e enriquece com mapeamentos'),
+    'update-stock': ('vendas/update_stock_from_sales.py', 'Decrementa estoque e grava vendas'),
+    'process-upload': ('vendas/process_sales_upload.py', 'Pipeline completo de upload de vendas'),
+    'simulate-stock': ('vendas/simulate_stock_update.py', 'Simulação offline (what-if) de estoque'),
+    'sales-history': ('vendas/sales_history.py', 'Histórico de vendas em Parquet (ingest, query por período/bar)'),
+    # Estoque
+    'snapshot-stock': ('estoque/snapshot_stock.py', 'Snapshots de estoque e consultas point-in-time'),
+    'valuation': ('estoque/inventory_valuation.py', 'Valor do estoque por custo médio e FIFO (incremental, fechamento por período)'),
+    'forecast-demand': ('calculations/demand_forecast.py', 'Previsão de consumo por ingrediente → mínimo/máximo sugerido'),
+    'reorder': ('calculations/reorder_engine.py', 'Rascunhos de pedido por fornecedor (reposição até o máximo)'),
+    'consumption-variance': ('calculations/consumption_variance.py', 'Consumo teórico × real entre contagens de inventário'),
+    'recipe-costs': ('calculations/recipe_costs.py', 'Custo das fichas técnicas (incremental por ingrediente alterado)'),
+    # Análise
+    'analyze': ('analysis/analyze_product_mappings.py', 'Relatório de mapeamentos Zig × Ficha Técnica'),
+    'menu-engineering': ('analysis/menu_engineering.py', 'Engenharia de cardápio (popularidade × margem) por bar e período'),
+    'find-duplicates': ('analysis/find_near_duplicates.py', 'Quase-duplicatas de receitas/ingredientes → merge_duplicates'),
+    'clean': ('analysis/clean_product_data.py', 'Limpeza e padronização de dados (interativo)'),
+    'replica': ('replica/local_replica.py', 'Réplica local SQLite do Firestore (sync incremental + SQL)'),
+    # Migrações
+    'migrate-initial-data': ('migrations/import_montuvia_initial_data.py', 'Importa dados iniciais do Excel Montuvia'),
+    'migrate-technical-sheets': ('migrations/import_technical_sheets.py', 'Importa insumos das fichas técnicas P01–P100 para as receitas'),
+    'migrate-missing-mappings': ('migrations/create_missing_product_mappings.py', 'Cadastra produtos Zig sem mapeamento'),
+    'migrate-incomplete-mappings': ('migrations/complete_incomplete_mappings.py', 'Completa mapeamentos sem recipe_id'),
+    'migrate-fix-mapping-names': ('migrations/fix_mappings_with_correct_names.py', 'Corrige mapeamentos com nomes oficiais'),
+    # Backup
+    'backup': ('backup/export_collections.py', 'Exporta collections em NDJSON comprimido (resumível)'),
+    'restore': ('backup/restore_backup.py', 'Restaura backup (batches paralelos, --dry-run para diff)'),
+    # Infra
+    'test-connection': ('test_firebase_connection.py', 'Testa credenciais e conexão com o Firebase'),
+}
+
+def print_help():
+    print(__doc__.strip())
+    print("\nComandos:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (script, description) in COMMANDS.items():
+        print(f"  {name:<{width}}  {description}")
+
+def run_command(command, args):
+    """
+    Executa o tool de um comando como se fosse 'python <script> <args>'
+
+    Returns:
+        int: Exit code do tool
+    """
+    script = TOOLS_DIR / COMMANDS[command][0]
+
+    # Mesmo ambiente de 'python script.py': argv e diretório do script no path
+    sys.argv = [str(script), *args]
+    sys.path.insert(0, str(script.parent))
+
+    try:
+        runpy.run_path(str(script), run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print_help()
+        return 0
+
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"❌ Comando desconhecido: {command}\n", file=sys.stderr)
+        print_help()
+        return 2
+
+    return run_command(command, args)
+
+if __name__ == '__main__':
+    sys.exit(main())
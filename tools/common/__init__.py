@@ -0,0 +1,3 @@
+"""
+Infraestrutura compartilhada pelos tools Python (storage, escrita em lote, métricas)
+"""
@@ -0,0 +1,354 @@
+"""
+Contabilidade de operações do Firestore por etapa
+
+O cliente compartilhado (firebase_helper.get_firestore_client) é embrulhado
+em um proxy que conta leituras, escritas, deletes, queries e round trips,
+com a latência acumulada, na etapa ativa:
+
+    with op_stage('load_mappings'):
+        for doc in db.collection('product_mappings').stream(): ...
+
+    get_op_stats() → {'total': {...}, 'stages': {'load_mappings': {...}}}
+
+Leituras seguem a cobrança do Firestore: um documento lido = 1 leitura e
+toda query custa ao menos 1 leitura, mesmo sem resultados. Escritas que
+falham não são cobradas: contam só em 'errors' (e na latência/round trips).
+Desligar com FIRESTORE_INSTRUMENTATION=0.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_STAGE = 'default'
+
+_current_stage = contextvars.ContextVar('firestore_op_stage', default=DEFAULT_STAGE)
+_lock = threading.Lock()
+_stages = {}
+
+def instrumentation_enabled():
+    return os.getenv('FIRESTORE_INSTRUMENTATION', '1') != '0'
+
+def _empty_counters():
+    return {'reads': 0, 'writes': 0, 'deletes': 0, 'queries': 0, 'errors': 0, 'roundTrips': 0, 'latencyMs': 0.0}
+
+@contextmanager
+def op_stage(name):
+    """Atribui as operações do bloco à etapa 'name' (aninhadas viram 'pai.filho')"""
+    parent = _current_stage.get()
+    full_name = name if parent == DEFAULT_STAGE else f"{parent}.{name}"
+    token = _current_stage.set(full_name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+def record(reads=0, writes=0, deletes=0, queries=0, errors=0, round_trips=1, latency_ms=0.0):
+    """Soma um RPC nos contadores da etapa ativa"""
+    stage = _current_stage.get()
+    with _lock:
+        counters = _stages.setdefault(stage, _empty_counters())
+        counters['reads'] += reads
+        counters['writes'] += writes
+        counters['deletes'] += deletes
+        counters['queries'] += queries
+        counters['errors'] += errors
+        counters['roundTrips'] += round_trips
+        counters['latencyMs'] += latency_ms
+
+def get_op_stats():
+    """
+    Contadores por etapa e totais do processo
+
+    Returns:
+        dict: {'total': {...}, 'stages': {stage: {...}}}
+    """
+    with _lock:
+        stages = {name: dict(c, latencyMs=round(c['latencyMs'], 1)) for name, c in _stages.items()}
+    total = _empty_counters()
+    for counters in stages.values():
+        for key in total:
+            total[key] += counters[key]
+    total['latencyMs'] = round(total['latencyMs'], 1)
+    return {'total': total, 'stages': stages}
+
+def reset_op_stats():
+    with _lock:
+        _stages.clear()
+
+def merge_op_stats(target, stats, prefix=None):
+    """
+    Acumula o get_op_stats() de outro processo (ex: etapa do pipeline)
+
+    Args:
+        target (dict): Resultado acumulado ({'total', 'stages'})
+        stats (dict): get_op_stats() de um tool
+        prefix (str): Prefixo das etapas (ex: 'validate')
+    """
+    target.setdefault('total', _empty_counters())
+    target.setdefault('stages', {})
+    for name, counters in (stats or {}).get('stages', {}).items():
+        key = name if not prefix else (prefix if name == DEFAULT_STAGE else f"{prefix}.{name}")
+        stage = target['stages'].setdefault(key, _empty_counters())
+        for field in stage:
+            stage[field] += counters.get(field, 0)
+            target['total'][field] += counters.get(field, 0)
+    target['total']['latencyMs'] = round(target['total']['latencyMs'], 1)
+    return target
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+def _unwrap(obj):
+    return getattr(obj, '_inner', obj)
+
+# ==================== PROXIES SÍNCRONOS ====================
+
+class _Proxy:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+class InstrumentedSnapshot(_Proxy):
+    @property
+    def reference(self):
+        return InstrumentedDocument(self._inner.reference)
+
+class InstrumentedDocument(_Proxy):
+    def get(self, *args, **kwargs):
+        started = time.perf_counter()
+        snapshot = self._inner.get(*args, **kwargs)
+        record(reads=1, latency_ms=_elapsed_ms(started))
+        return InstrumentedSnapshot(snapshot)
+
+    def _write(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = getattr(self._inner, method)(*args, **kwargs)
+        except Exception:
+            record(errors=1, latency_ms=_elapsed_ms(started))
+            raise
+        if method == 'delete':
+            record(deletes=1, latency_ms=_elapsed_ms(started))
+        else:
+            record(writes=1, latency_ms=_elapsed_ms(started))
+        return result
+
+    def set(self, *args, **kwargs):
+        return self._write('set', *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._write('create', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write('update', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write('delete', *args, **kwargs)
+
+    def collection(self, name):
+        return InstrumentedCollection(self._inner.collection(name))
+
+class InstrumentedQuery(_Proxy):
+    def _wrap(self, inner):
+        return InstrumentedQuery(inner)
+
+    def where(self, *args, **kwargs):
+        return self._wrap(self._inner.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return self._wrap(self._inner.order_by(*args, **kwargs))
+
+    def limit(self, *args, **kwargs):
+        return self._wrap(self._inner.limit(*args, **kwargs))
+
+    def offset(self, *args, **kwargs):
+        return self._wrap(self._inner.offset(*args, **kwargs))
+
+    def select(self, *args, **kwargs):
+        return self._wrap(self._inner.select(*args, **kwargs))
+
+    def start_at(self, cursor):
+        return self._wrap(self._inner.start_at(_unwrap(cursor)))
+
+    def start_after(self, cursor):
+        return self._wrap(self._inner.start_after(_unwrap(cursor)))
+
+    def end_at(self, cursor):
+        return self._wrap(self._inner.end_at(_unwrap(cursor)))
+
+    def end_before(self, cursor):
+        return self._wrap(self._inner.end_before(_unwrap(cursor)))
+
+    def stream(self, *args, **kwargs):
+        # Latência conta até o último documento (streaming paga a leitura aos poucos)
+        started = time.perf_counter()
+        count = 0
+        try:
+            for snapshot in self._inner.stream(*args, **kwargs):
+                count += 1
+                yield InstrumentedSnapshot(snapshot)
+        finally:
+            record(reads=max(count, 1), queries=1, latency_ms=_elapsed_ms(started))
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+class InstrumentedCollection(InstrumentedQuery):
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._inner.document(*args, **kwargs))
+
+    def add(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = self._inner.add(*args, **kwargs)
+        record(writes=1, latency_ms=_elapsed_ms(started))
+        return result
+
+    def list_documents(self, *args, **kwargs):
+        started = time.perf_counter()
+        refs = list(self._inner.list_documents(*args, **kwargs))
+        record(reads=max(len(refs), 1), queries=1, latency_ms=_elapsed_ms(started))
+        return [InstrumentedDocument(ref) for ref in refs]
+
+class InstrumentedBatch(_Proxy):
+    def __init__(self, inner):
+        super().__init__(inner)
+        self._writes = 0
+        self._deletes = 0
+
+    def set(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._inner.set(_unwrap(reference), *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._inner.create(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._inner.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._deletes += 1
+        return self._inner.delete(_unwrap(reference), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = self._inner.commit(*args, **kwargs)
+        except Exception:
+            # Commit que falhou é um round trip (e será repetido), mas não grava nada
+            record(errors=1, latency_ms=_elapsed_ms(started))
+            raise
+        record(writes=self._writes, deletes=self._deletes, latency_ms=_elapsed_ms(started))
+        return result
+
+class InstrumentedClient(_Proxy):
+    """Proxy de firestore.Client (ou MemoryStore) que contabiliza operações"""
+
+    def collection(self, name):
+        return InstrumentedCollection(self._inner.collection(name))
+
+    def document(self, path):
+        return InstrumentedDocument(self._inner.document(path))
+
+    def batch(self):
+        return InstrumentedBatch(self._inner.batch())
+
+    def get_all(self, references, *args, **kwargs):
+        started = time.perf_counter()
+        references = [_unwrap(ref) for ref in references]
+        snapshots = [InstrumentedSnapshot(s) for s in self._inner.get_all(references, *args, **kwargs)]
+        record(reads=len(references), latency_ms=_elapsed_ms(started))
+        return iter(snapshots)
+
+    def collections(self, *args, **kwargs):
+        return [InstrumentedCollection(c) for c in self._inner.collections(*args, **kwargs)]
+
+# ==================== PROXIES ASSÍNCRONOS ====================
+
+class AsyncInstrumentedDocument(_Proxy):
+    async def get(self, *args, **kwargs):
+        started = time.perf_counter()
+        snapshot = await self._inner.get(*args, **kwargs)
+        record(reads=1, latency_ms=_elapsed_ms(started))
+        return InstrumentedSnapshot(snapshot)
+
+    async def _write(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await getattr(self._inner, method)(*args, **kwargs)
+        except Exception:
+            record(errors=1, latency_ms=_elapsed_ms(started))
+            raise
+        if method == 'delete':
+            record(deletes=1, latency_ms=_elapsed_ms(started))
+        else:
+            record(writes=1, latency_ms=_elapsed_ms(started))
+        return result
+
+    async def set(self, *args, **kwargs):
+        return await self._write('set', *args, **kwargs)
+
+    async def create(self, *args, **kwargs):
+        return await self._write('create', *args, **kwargs)
+
+    async def update(self, *args, **kwargs):
+        return await self._write('update', *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._write('delete', *args, **kwargs)
+
+class AsyncInstrumentedQuery(InstrumentedQuery):
+    def _wrap(self, inner):
+        return AsyncInstrumentedQuery(inner)
+
+    async def stream(self, *args, **kwargs):
+        started = time.perf_counter()
+        count = 0
+        try:
+            async for snapshot in self._inner.stream(*args, **kwargs):
+                count += 1
+                yield InstrumentedSnapshot(snapshot)
+        finally:
+            record(reads=max(count, 1), queries=1, latency_ms=_elapsed_ms(started))
+
+    async def get(self, *args, **kwargs):
+        return [snapshot async for snapshot in self.stream(*args, **kwargs)]
+
+class AsyncInstrumentedCollection(AsyncInstrumentedQuery):
+    def document(self, *args, **kwargs):
+        return AsyncInstrumentedDocument(self._inner.document(*args, **kwargs))
+
+class AsyncInstrumentedBatch(InstrumentedBatch):
+    async def commit(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await self._inner.commit(*args, **kwargs)
+        except Exception:
+            record(errors=1, latency_ms=_elapsed_ms(started))
+            raise
+        record(writes=self._writes, deletes=self._deletes, latency_ms=_elapsed_ms(started))
+        return result
+
+class AsyncInstrumentedClient(_Proxy):
+    """Proxy de firestore.AsyncClient (ou AsyncMemoryStore) que contabiliza operações"""
+
+    def collection(self, name):
+        return AsyncInstrumentedCollection(self._inner.collection(name))
+
+    def batch(self):
+        return AsyncInstrumentedBatch(self._inner.batch())
+
+    async def get_all(self, references, *args, **kwargs):
+        started = time.perf_counter()
+        references = [_unwrap(ref) for ref in references]
+        try:
+            async for snapshot in self._inner.get_all(references, *args, **kwargs):
+                yield InstrumentedSnapshot(snapshot)
+        finally:
+            record(reads=len(references), latency_ms=_elapsed_ms(started))
@@ -0,0 +1,665 @@
+"""
+Backend de storage em memória compatível com a API do Firestore usada nos tools
+
+Implementa o subconjunto que os scripts usam de fato:
+- collection(...).stream() / .get() / .where(...) / .order_by(...) / .limit(...) / .start_after(...)
+- document(...).get() / .set(merge=...) / .update() / .delete()
+- batch() (set/create/update/delete + commit atômico, limite de 500 ops)
+- get_all(refs)
+- SERVER_TIMESTAMP, Increment e DELETE_FIELD (do google.cloud.firestore ou locais)
+
+Serve para benchmark e testes de carga offline (sem o database montuvia1).
+Latência simulada por round trip é configurável (latency_ms).
+
+Selecionado via STORAGE_BACKEND=memory (ver firebase_helper.get_firestore_client).
+Com MEMORY_STORE_PATH, o estado é carregado/salvo em JSON para que tools
+rodando em subprocessos (process_sales_upload) compartilhem os dados.
+"""
+
+import copy
+import json
+import time
+import random
+import string
+import asyncio
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+
+MAX_BATCH_WRITES = 500
+
+class _Sentinel:
+    def __init__(self, description):
+        self.description = description
+
+    def __repr__(self):
+        return f"Sentinel: {self.description}"
+
+SERVER_TIMESTAMP = _Sentinel('Value used to set a document field to the server timestamp.')
+DELETE_FIELD = _Sentinel('Value used to delete a field in a document.')
+
+class Increment:
+    """Equivalente local de firestore.Increment"""
+    def __init__(self, value):
+        self.value = value
+
+def _is_server_timestamp(value):
+    return value is SERVER_TIMESTAMP or (
+        type(value).__name__ == 'Sentinel' and 'server timestamp' in getattr(value, 'description', '')
+    )
+
+def _is_delete_field(value):
+    return value is DELETE_FIELD or (
+        type(value).__name__ == 'Sentinel' and 'delete a field' in getattr(value, 'description', '')
+    )
+
+def _is_increment(value):
+    return isinstance(value, Increment) or (
+        type(value).__name__ == 'Increment' and hasattr(value, 'value')
+    )
+
+def _auto_id():
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=20))
+
+def _get_path(data, field_path):
+    current = data
+    for part in field_path.split('.'):
+        if not isinstance(current, dict) or part not in current:
+            return None, False
+        current = current[part]
+    return current, True
+
+def _set_path(data, field_path, value):
+    parts = field_path.split('.')
+    current = data
+    for part in parts[:-1]:
+        if not isinstance(current.get(part), dict):
+            current[part] = {}
+        current = current[part]
+    current[parts[-1]] = value
+
+def _delete_path(data, field_path):
+    parts = field_path.split('.')
+    current = data
+    for part in parts[:-1]:
+        current = current.get(part)
+        if not isinstance(current, dict):
+            return
+    current.pop(parts[-1], None)
+
+def _resolve_transforms(data, existing, now):
+    """Aplica SERVER_TIMESTAMP / Increment / DELETE_FIELD sobre uma cópia dos dados"""
+    resolved = {}
+    deletes = []
+    for key, value in data.items():
+        if _is_server_timestamp(value):
+            resolved[key] = now
+        elif _is_delete_field(value):
+            deletes.append(key)
+        elif _is_increment(value):
+            current, found = _get_path(existing, key) if existing else (None, False)
+            base = current if found and isinstance(current, (int, float)) else 0
+            resolved[key] = base + value.value
+        elif isinstance(value, dict):
+            nested_existing = existing.get(key) if isinstance(existing, dict) else None
+            nested, nested_deletes = _resolve_transforms(value, nested_existing or {}, now)
+            resolved[key] = nested
+            deletes.extend(f"{key}.{d}" for d in nested_deletes)
+        else:
+            resolved[key] = copy.deepcopy(value)
+    return resolved, deletes
+
+def _compare(op, left, right):
+    try:
+        if op == '==':
+            return left == right
+        if op == '!=':
+            return left != right and left is not None
+        if op == '<':
+            return left is not None and left < right
+        if op == '<=':
+            return left is not None and left <= right
+        if op == '>':
+            return left is not None and left > right
+        if op == '>=':
+            return left is not None and left >= right
+        if op == 'in':
+            return left in right
+        if op == 'not-in':
+            return left is not None and left not in right
+        if op == 'array_contains':
+            return isinstance(left, list) and right in left
+        if op == 'array_contains_any':
+            return isinstance(left, list) and any(v in left for v in right)
+    except TypeError:
+        return False
+    raise ValueError(f"Operador não suportado: {op}")
+
+def _sort_key(value):
+    # Ordem de tipos similar à do Firestore: null < números < strings < datas < outros
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, datetime):
+        return (4, value.timestamp())
+    return (5, str(value))
+
+class MemoryWriteResult:
+    """Equivalente local de WriteResult: valores finais dos transforms (increment, timestamp)"""
+    def __init__(self, update_time, transform_results=None):
+        self.update_time = update_time
+        self.transform_results = transform_results or []
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        if self._data is None:
+            return None
+        value, _ = _get_path(self._data, field_path)
+        return copy.deepcopy(value)
+
+class MemoryDocumentReference:
+    def __init__(self, store, collection_path, doc_id):
+        self._store = store
+        self._collection_path = collection_path
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection_path}/{self.id}"
+
+    @property
+    def parent(self):
+        return MemoryCollectionReference(self._store, self._collection_path)
+
+    def collection(self, name):
+        return MemoryCollectionReference(self._store, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, **kwargs):
+        self._store._round_trip('read')
+        self._store._count('read')
+        return self._store._snapshot(self)
+
+    def set(self, data, merge=False, **kwargs):
+        self._store._round_trip('write')
+        self._store._apply([('set', self, data, merge)])
+
+    def create(self, data, **kwargs):
+        self._store._round_trip('write')
+        self._store._apply([('create', self, data, False)])
+
+    def update(self, data, **kwargs):
+        self._store._round_trip('write')
+        self._store._apply([('update', self, data, False)])
+
+    def delete(self, **kwargs):
+        self._store._round_trip('delete')
+        self._store._apply([('delete', self, None, False)])
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+class MemoryQuery:
+    def __init__(self, store, collection_path, filters=None, orders=None, limit=None, start_after=None, offset=0):
+        self._store = store
+        self._collection_path = collection_path
+        self._filters = filters or []
+        self._orders = orders or []
+        self._limit = limit
+        self._start_after = start_after
+        self._offset = offset
+
+    def _copy(self, **changes):
+        params = dict(
+            filters=list(self._filters), orders=list(self._orders), limit=self._limit,
+            start_after=self._start_after, offset=self._offset
+        )
+        params.update(changes)
+        return MemoryQuery(self._store, self._collection_path, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            # google.cloud.firestore.FieldFilter
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + [(field_path, str(direction).upper())])
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, count):
+        return self._copy(offset=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start_after=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self  # Projeção não reduz custo em memória
+
+    def _matches(self, data):
+        # Como no Firestore, documentos sem o campo nunca passam no filtro
+        for field_path, op, value in self._filters:
+            current, found = _get_path(data, field_path)
+            if not found or not _compare(op, current, value):
+                return False
+        return True
+
+    def _run(self):
+        docs = self._store._list(self._collection_path)
+        results = [(doc_id, data) for doc_id, data in docs if self._matches(data)]
+
+        orders = self._orders or [('__name__', 'ASCENDING')]
+        for field_path, direction in reversed(orders):
+            if field_path == '__name__':
+                results.sort(key=lambda item: item[0], reverse=direction == 'DESCENDING')
+            else:
+                results = [r for r in results if _get_path(r[1], field_path)[1]]
+                results.sort(
+                    key=lambda item: _sort_key(_get_path(item[1], field_path)[0]),
+                    reverse=direction == 'DESCENDING'
+                )
+
+        if self._start_after is not None:
+            cursor_id = getattr(self._start_after, 'id', None)
+            if cursor_id is None and isinstance(self._start_after, dict):
+                cursor_id = self._start_after.get('__name__', self._start_after.get('id'))
+            ids = [doc_id for doc_id, _ in results]
+            if cursor_id in ids:
+                results = results[ids.index(cursor_id) + 1:]
+
+        if self._offset:
+            results = results[self._offset:]
+        if self._limit is not None:
+            results = results[:self._limit]
+
+        return [
+            self._store._snapshot(MemoryDocumentReference(self._store, self._collection_path, doc_id))
+            for doc_id, _ in results
+        ]
+
+    def stream(self, **kwargs):
+        self._store._round_trip('query')
+        snapshots = self._run()
+        self._store._count('read', max(len(snapshots), 1))
+        return iter(snapshots)
+
+    def get(self, **kwargs):
+        return list(self.stream())
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, store, collection_path):
+        super().__init__(store, collection_path)
+
+    @property
+    def id(self):
+        return self._collection_path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._store, self._collection_path, document_id or _auto_id())
+
+    def add(self, document_data, document_id=None, **kwargs):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self, **kwargs):
+        return [
+            MemoryDocumentReference(self._store, self._collection_path, doc_id)
+            for doc_id, _ in self._store._list(self._collection_path)
+        ]
+
+class MemoryWriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def _add(self, write):
+        if len(self._writes) >= MAX_BATCH_WRITES:
+            raise ValueError(f"Batch excede o limite de {MAX_BATCH_WRITES} escritas")
+        self._writes.append(write)
+
+    def set(self, reference, document_data, merge=False):
+        self._add(('set', reference, document_data, merge))
+
+    def create(self, reference, document_data):
+        self._add(('create', reference, document_data, False))
+
+    def update(self, reference, field_updates, **kwargs):
+        self._add(('update', reference, field_updates, False))
+
+    def delete(self, reference, **kwargs):
+        self._add(('delete', reference, None, False))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self, **kwargs):
+        self._store._round_trip('commit')
+        writes, self._writes = self._writes, []
+        return self._store._apply(writes)
+
+class MemoryStore:
+    """
+    Banco em memória com a mesma superfície de firestore.Client usada nos tools
+
+    Args:
+        latency_ms (float): Latência simulada por round trip (RPC)
+        jitter_ms (float): Variação aleatória adicional (0..jitter_ms)
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._collections = {}  # collection path → {doc_id: (data, create_time, update_time)}
+        self._lock = threading.RLock()
+        self._dirty = set()  # (collection, doc_id) escritos neste processo
+        self.stats = {'roundTrips': 0, 'reads': 0, 'writes': 0, 'deletes': 0, 'queries': 0, 'commits': 0}
+
+    # ---- API pública (espelha firestore.Client) ----
+
+    def collection(self, name):
+        return MemoryCollectionReference(self, name)
+
+    def document(self, path):
+        collection_path, doc_id = path.rsplit('/', 1)
+        return MemoryDocumentReference(self, collection_path, doc_id)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def get_all(self, references, field_paths=None, **kwargs):
+        self._round_trip('read')
+        references = list(references)
+        self._count('read', len(references))
+        for ref in references:
+            yield self._snapshot(ref)
+
+    def collections(self):
+        return [MemoryCollectionReference(self, name) for name in self._collections if '/' not in name]
+
+    # ---- Seeding / persistência ----
+
+    def seed(self, collection, documents, id_field='id'):
+        """Carrega documentos sem custo de latência ({id: data} ou lista com id_field)"""
+        items = documents.items() if isinstance(documents, dict) else ((d[id_field], d) for d in documents)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            docs = self._collections.setdefault(collection, {})
+            for doc_id, data in items:
+                docs[str(doc_id)] = (copy.deepcopy(data), now, now)
+                self._dirty.add((collection, str(doc_id)))
+
+    def dump(self, path, only_changes=False):
+        """
+        Salva o estado em JSON (datas como {'__datetime__': iso})
+
+        Com only_changes=True, relê o arquivo e aplica só os documentos
+        escritos por este processo: vários processos (ex: etapas do
+        pipeline em subprocess) compartilham o mesmo arquivo sem um
+        sobrescrever as escritas do outro.
+        """
+        def encode(value):
+            if isinstance(value, datetime):
+                return {'__datetime__': value.isoformat()}
+            raise TypeError(f"Tipo não serializável: {type(value)}")
+
+        with self._lock:
+            if only_changes and Path(path).exists():
+                state = self._read_state(path)
+                for collection, doc_id in self._dirty:
+                    entry = self._collections.get(collection, {}).get(doc_id)
+                    docs = state.setdefault(collection, {})
+                    if entry is None:
+                        docs.pop(doc_id, None)
+                    else:
+                        docs[doc_id] = entry[0]
+            else:
+                state = {
+                    collection: {doc_id: data for doc_id, (data, _, _) in docs.items()}
+                    for collection, docs in self._collections.items()
+                }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=encode)
+
+    def load(self, path):
+        """Carrega estado salvo por dump()"""
+        for collection, docs in self._read_state(path).items():
+            self.seed(collection, docs)
+
+    @staticmethod
+    def _read_state(path):
+        def decode(obj):
+            if '__datetime__' in obj and len(obj) == 1:
+                return datetime.fromisoformat(obj['__datetime__'])
+            return obj
+
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f, object_hook=decode)
+
+    # ---- Internos ----
+
+    def _count(self, kind, amount=1):
+        key = {'read': 'reads', 'write': 'writes', 'delete': 'deletes', 'query': 'queries', 'commit': 'commits'}[kind]
+        with self._lock:
+            self.stats[key] += amount
+
+    def _round_trip(self, kind):
+        with self._lock:
+            self.stats['roundTrips'] += 1
+            if kind == 'query':
+                self.stats['queries'] += 1
+            elif kind == 'commit':
+                self.stats['commits'] += 1
+        delay = self.latency_ms + (random.random() * self.jitter_ms if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _list(self, collection_path):
+        with self._lock:
+            docs = self._collections.get(collection_path, {})
+            return [(doc_id, data) for doc_id, (data, _, _) in docs.items()]
+
+    def _snapshot(self, ref):
+        with self._lock:
+            entry = self._collections.get(ref._collection_path, {}).get(ref.id)
+        if entry is None:
+            return MemoryDocumentSnapshot(ref, None)
+        data, create_time, update_time = entry
+        return MemoryDocumentSnapshot(ref, data, create_time, update_time)
+
+    def _apply(self, writes):
+        """
+        Aplica escritas atomicamente (valida tudo antes de gravar)
+
+        Returns:
+            list: Um MemoryWriteResult por escrita, com o valor final de cada transform
+        """
+        now = datetime.now(timezone.utc)
+        results = []
+        with self._lock:
+            staged = {}
+
+            def current(ref):
+                key = (ref._collection_path, ref.id)
+                if key in staged:
+                    return staged[key]
+                return self._collections.get(ref._collection_path, {}).get(ref.id)
+
+            for op, ref, data, merge in writes:
+                key = (ref._collection_path, ref.id)
+                existing = current(ref)
+
+                if op == 'delete':
+                    staged[key] = None
+                    self.stats['deletes'] += 1
+                    results.append(MemoryWriteResult(now))
+                    continue
+
+                if op == 'create' and existing is not None:
+                    raise ValueError(f"Documento já existe: {ref.path}")
+                if op == 'update' and existing is None:
+                    raise ValueError(f"Documento não encontrado: {ref.path}")
+
+                base = copy.deepcopy(existing[0]) if existing is not None and (merge or op == 'update') else {}
+                if op == 'update':
+                    resolved, deletes = _resolve_transforms(data, base, now)
+                    for field_path, value in resolved.items():
+                        _set_path(base, field_path, value)
+                elif merge:
+                    resolved, deletes = _resolve_transforms(data, base, now)
+                    _deep_merge(base, resolved)
+                else:
+                    base, deletes = _resolve_transforms(data, {}, now)
+                for field_path in deletes:
+                    _delete_path(base, field_path)
+                results.append(MemoryWriteResult(now, [
+                    _get_path(base, field_path)[0] for field_path, value in data.items()
+                    if _is_increment(value) or _is_server_timestamp(value)
+                ]))
+
+                create_time = existing[1] if existing is not None else now
+                staged[key] = (base, create_time, now)
+                self.stats['writes'] += 1
+
+            for (collection_path, doc_id), entry in staged.items():
+                self._dirty.add((collection_path, doc_id))
+                docs = self._collections.setdefault(collection_path, {})
+                if entry is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = entry
+        return results
+
+def _deep_merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = value
+
+# ==================== FACHADA ASSÍNCRONA ====================
+
+class AsyncMemoryDocumentReference:
+    def __init__(self, sync_ref):
+        self._ref = sync_ref
+        self.id = sync_ref.id
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    async def get(self, **kwargs):
+        return await _in_thread(self._ref.get)
+
+    async def set(self, data, merge=False, **kwargs):
+        return await _in_thread(self._ref.set, data, merge)
+
+    async def update(self, data, **kwargs):
+        return await _in_thread(self._ref.update, data)
+
+    async def delete(self, **kwargs):
+        return await _in_thread(self._ref.delete)
+
+class AsyncMemoryQuery:
+    def __init__(self, sync_query):
+        self._query = sync_query
+
+    def where(self, *args, **kwargs):
+        return AsyncMemoryQuery(self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return AsyncMemoryQuery(self._query.order_by(*args, **kwargs))
+
+    def limit(self, count):
+        return AsyncMemoryQuery(self._query.limit(count))
+
+    def start_after(self, cursor):
+        return AsyncMemoryQuery(self._query.start_after(cursor))
+
+    async def stream(self, **kwargs):
+        snapshots = await _in_thread(lambda: list(self._query.stream()))
+        for snapshot in snapshots:
+            yield snapshot
+
+    async def get(self, **kwargs):
+        return await _in_thread(self._query.get)
+
+class AsyncMemoryCollectionReference(AsyncMemoryQuery):
+    def document(self, document_id=None):
+        return AsyncMemoryDocumentReference(self._query.document(document_id))
+
+def _unwrap(reference):
+    # Snapshots carregam a referência síncrona (doc.reference), como no AsyncClient
+    return getattr(reference, '_ref', reference)
+
+class AsyncMemoryWriteBatch:
+    def __init__(self, sync_batch):
+        self._batch = sync_batch
+
+    def set(self, reference, data, merge=False):
+        self._batch.set(_unwrap(reference), data, merge)
+
+    def create(self, reference, data):
+        self._batch.create(_unwrap(reference), data)
+
+    def update(self, reference, data, **kwargs):
+        self._batch.update(_unwrap(reference), data)
+
+    def delete(self, reference, **kwargs):
+        self._batch.delete(_unwrap(reference))
+
+    async def commit(self, **kwargs):
+        return await _in_thread(self._batch.commit)
+
+class AsyncMemoryStore:
+    """Fachada assíncrona (espelha firestore.AsyncClient) sobre um MemoryStore"""
+
+    def __init__(self, store):
+        self._store = store
+
+    @property
+    def stats(self):
+        return self._store.stats
+
+    def collection(self, name):
+        return AsyncMemoryCollectionReference(self._store.collection(name))
+
+    def batch(self):
+        return AsyncMemoryWriteBatch(self._store.batch())
+
+    async def get_all(self, references, **kwargs):
+        sync_refs = [_unwrap(ref) for ref in references]
+        snapshots = await _in_thread(lambda: list(self._store.get_all(sync_refs)))
+        for snapshot in snapshots:
+            yield snapshot
+
+async def _in_thread(func, *args):
+    # A latência simulada usa time.sleep; em thread, RPCs concorrentes se sobrepõem
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
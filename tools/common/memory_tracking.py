@@ -0,0 +1,229 @@
+"""
+Memória por etapa dos tools
+
+    with memory_stage('parse'):
+        result = parse_sales_file(path)
+    result['memory'] = get_memory_summary()
+
+Sempre registra o RSS do processo no fim da etapa (rssMb) e o pico de RSS
+até ali (maxRssMb), que custam uma leitura de /proc. Com --memory-trace
+(ou MONTUVIA_MEMORY_TRACKING=trace) liga o tracemalloc: memória alocada no
+fim (currentMb), pico durante a etapa (peakMb) e os maiores pontos de
+alocação ainda vivos — deixa a etapa ~4x mais lenta, por isso é opcional.
+
+Orçamento opcional (--memory-budget=MB ou MONTUVIA_MEMORY_BUDGET_MB),
+comparado com o RSS, que é o que o limite do container mede: um watchdog
+acompanha o processo e, ao estourar, interrompe a etapa com
+MemoryBudgetExceeded — o tool devolve {'error': ...} em vez de ser morto
+pelo OOM. Desligar tudo com MONTUVIA_MEMORY_TRACKING=0.
+"""
+
+import os
+import sys
+import time
+import _thread
+import threading
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+BUDGET_FLAG = '--memory-budget='
+TRACE_FLAG = '--memory-trace'
+TOP_ALLOCATIONS = 10
+WATCHDOG_INTERVAL = 0.05
+
+_stages = {}
+_budget_hit = threading.Event()
+_budget_rss = {}
+
+class MemoryBudgetExceeded(MemoryError):
+    """Etapa passou do orçamento de memória configurado"""
+
+    def __init__(self, stage, rss_mb, budget_mb):
+        self.stage = stage
+        self.rss_mb = rss_mb
+        self.budget_mb = budget_mb
+        super().__init__(
+            f"Etapa '{stage}' excedeu o orçamento de memória: RSS {rss_mb:.1f} MB > {budget_mb:.0f} MB "
+            f"(MONTUVIA_MEMORY_BUDGET_MB). Divida o arquivo de vendas em uploads menores."
+        )
+
+def tracking_mode():
+    """'0' (desligado), 'rss' (padrão) ou 'trace' (tracemalloc)"""
+    return os.getenv('MONTUVIA_MEMORY_TRACKING', 'rss')
+
+def memory_budget_mb():
+    value = os.getenv('MONTUVIA_MEMORY_BUDGET_MB')
+    return float(value) if value else None
+
+def consume_memory_flags(argv):
+    """
+    Remove --memory-budget=MB e --memory-trace de argv e exporta as opções
+    no ambiente (subprocessos herdam)
+
+    Returns:
+        list: argv sem os flags
+    """
+    remaining = []
+    for arg in argv:
+        if arg.startswith(BUDGET_FLAG):
+            os.environ['MONTUVIA_MEMORY_BUDGET_MB'] = arg[len(BUDGET_FLAG):]
+        elif arg == TRACE_FLAG:
+            os.environ['MONTUVIA_MEMORY_TRACKING'] = 'trace'
+        else:
+            remaining.append(arg)
+    return remaining
+
+def _mb(size):
+    return round(size / (1024 * 1024), 2)
+
+def _max_rss_mb():
+    # VmHWM zera no exec; ru_maxrss herda o pico do processo pai (orquestrador)
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return _mb(int(line.split()[1]) * 1024)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss: KB no Linux, bytes no macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return _mb(rss if sys.platform == 'darwin' else rss * 1024)
+
+def _rss_mb():
+    """RSS atual (Linux); sem /proc usa o pico, que também serve para o orçamento"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return _mb(pages * os.sysconf('SC_PAGE_SIZE'))
+    except (OSError, ValueError, AttributeError):
+        return _max_rss_mb()
+
+def _short_path(filename):
+    try:
+        return str(Path(filename).resolve().relative_to(PROJECT_ROOT))
+    except ValueError:
+        return filename
+
+def top_allocations(snapshot, limit=TOP_ALLOCATIONS):
+    """
+    Maiores pontos de alocação (arquivo:linha) de um snapshot
+
+    Returns:
+        list: [{'location', 'sizeMb', 'blocks'}]
+    """
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    return [
+        {
+            'location': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            'sizeMb': _mb(stat.size),
+            'blocks': stat.count
+        }
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+def _watchdog(budget_mb, stop):
+    while not stop.wait(WATCHDOG_INTERVAL):
+        rss = _rss_mb() or 0
+        if rss > budget_mb:
+            _budget_rss['mb'] = rss
+            _budget_hit.set()
+            _thread.interrupt_main()
+            return
+
+@contextmanager
+def memory_stage(name):
+    """
+    Mede a memória do bloco como a etapa 'name'
+
+    Raises:
+        MemoryBudgetExceeded: RSS passou do orçamento durante a etapa
+    """
+    mode = tracking_mode()
+    if mode == '0':
+        yield
+        return
+
+    trace = mode == 'trace'
+    started_here = trace and not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    if trace:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+
+    budget = memory_budget_mb()
+    stop = threading.Event()
+    watchdog = None
+    if budget:
+        _budget_hit.clear()
+        watchdog = threading.Thread(target=_watchdog, args=(budget, stop), daemon=True)
+        watchdog.start()
+
+    error = None
+    try:
+        yield
+    except KeyboardInterrupt:
+        if not _budget_hit.is_set():
+            raise
+        error = _budget_rss.get('mb')
+    finally:
+        stop.set()
+        if watchdog:
+            watchdog.join()
+
+        stage = {
+            'rssMb': _rss_mb(),
+            'maxRssMb': _max_rss_mb(),
+            'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+        }
+        if trace:
+            current, peak = tracemalloc.get_traced_memory()
+            stage['currentMb'] = _mb(current)
+            stage['peakMb'] = _mb(peak)
+            stage['topAllocations'] = top_allocations(tracemalloc.take_snapshot())
+        if started_here:
+            tracemalloc.stop()
+        _stages[name] = stage
+
+    # Interrupção pode chegar logo após o fim da etapa: checa o RSS também
+    if error or (budget and (stage['rssMb'] or 0) > budget):
+        stage['budgetExceeded'] = True
+        raise MemoryBudgetExceeded(name, error or stage['rssMb'], budget)
+
+def get_memory_summary():
+    """
+    Memória das etapas medidas neste processo
+
+    Returns:
+        dict|None: {'budgetMb', 'stages': {etapa: {...}}} ou None se nada foi medido
+    """
+    if not _stages:
+        return None
+    return {'budgetMb': memory_budget_mb(), 'stages': dict(_stages)}
+
+def merge_memory_summary(target, summary):
+    """Acumula o get_memory_summary() de outro processo (ex: etapa do pipeline)"""
+    if not summary:
+        return target
+    target['budgetMb'] = summary.get('budgetMb')
+    target.setdefault('stages', {}).update(summary.get('stages', {}))
+    return target
+
+def memory_error_result(error):
+    """Resultado JSON de um tool abortado por orçamento de memória"""
+    return {
+        'error': str(error),
+        'errorType': 'memory_budget_exceeded',
+        'memory': get_memory_summary()
+    }
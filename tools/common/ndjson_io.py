@@ -0,0 +1,164 @@
+"""
+Leitura/escrita de documentos Firestore em NDJSON comprimido
+
+Cada linha é {"id": <doc id>, "data": {...}}. Tipos que o JSON não
+representa viram objetos marcados, os mesmos do MemoryStore:
+    datetime          → {"__datetime__": iso}
+    bytes             → {"__bytes__": base64}
+    GeoPoint          → {"__geopoint__": [lat, lng]}
+    DocumentReference → {"__ref__": "collection/doc"}
+
+Compressão: gzip (padrão, stdlib) ou zstd (requer 'zstandard').
+"""
+
+import io
+import json
+import gzip
+import base64
+import hashlib
+from datetime import datetime
+
+COMPRESSIONS = ('gzip', 'zstd', 'none')
+EXTENSIONS = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst', 'none': '.ndjson'}
+
+def encode_value(value):
+    """default= do json.dumps para tipos do Firestore"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return {'__geopoint__': [value.latitude, value.longitude]}
+    if type(value).__name__.endswith('DocumentReference') and hasattr(value, 'path'):
+        return {'__ref__': value.path}
+    raise TypeError(f"Tipo não serializável: {type(value)}")
+
+def make_decoder(db=None):
+    """
+    object_hook do json.loads que reconstrói os tipos marcados
+
+    Args:
+        db: Client usado para recriar DocumentReference (sem db, fica o path)
+    """
+    def decode(obj):
+        if len(obj) != 1:
+            return obj
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__bytes__' in obj:
+            return base64.b64decode(obj['__bytes__'])
+        if '__geopoint__' in obj:
+            from google.cloud.firestore import GeoPoint
+            return GeoPoint(*obj['__geopoint__'])
+        if '__ref__' in obj:
+            return db.document(obj['__ref__']) if db is not None else obj['__ref__']
+        return obj
+    return decode
+
+def dumps_document(doc_id, data):
+    return json.dumps({'id': doc_id, 'data': data}, ensure_ascii=False, default=encode_value)
+
+def detect_compression(path):
+    name = str(path)
+    if name.endswith('.gz'):
+        return 'gzip'
+    if name.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+    return zstandard
+
+class _HashingWriter(io.RawIOBase):
+    """Repassa bytes para o arquivo calculando sha256 e tamanho do comprimido"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self._raw.write(data)
+
+    def flush(self):
+        self._raw.flush()
+
+class NDJSONWriter:
+    """
+    Escreve documentos em streaming (memória constante)
+
+    Ao fechar, expõe 'documents', 'bytes' e 'sha256' do arquivo gerado.
+    """
+
+    def __init__(self, path, compression='gzip'):
+        self.path = path
+        self.compression = compression
+        self.documents = 0
+        self._raw = open(path, 'wb')
+        self._hasher = _HashingWriter(self._raw)
+
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._hasher, mode='wb', mtime=0)
+        elif compression == 'zstd':
+            self._stream = _zstandard().ZstdCompressor(level=3).stream_writer(self._hasher, closefd=False)
+        else:
+            self._stream = self._hasher
+
+    def write(self, doc_id, data):
+        self._stream.write(dumps_document(doc_id, data).encode('utf-8') + b'\n')
+        self.documents += 1
+
+    def close(self):
+        if self._stream is not self._hasher:
+            self._stream.close()
+        self._raw.close()
+        self.bytes = self._hasher.bytes
+        self.sha256 = self._hasher.sha256.hexdigest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def open_ndjson(path):
+    """Abre um arquivo NDJSON (comprimido ou não) para leitura de texto"""
+    compression = detect_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(_zstandard().ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+def iter_documents(path, db=None):
+    """
+    Itera (doc_id, data) de um arquivo NDJSON, linha a linha
+
+    Yields:
+        tuple: (str, dict)
+    """
+    decode = make_decoder(db)
+    with open_ndjson(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line, object_hook=decode)
+                yield record['id'], record['data']
+
+def file_sha256(path, chunk_size=1 << 20):
+    """sha256 de um arquivo (para conferir contra o manifest)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,134 @@
+"""
+Profiling (cProfile) por etapa dos tools
+
+Ligado com --profile na linha de comando ou MONTUVIA_PROFILE=1 no
+ambiente (o worker do backend liga pelo ambiente; subprocessos herdam):
+
+    with profile_stage('parse'):
+        result = parse_sales_file(path)
+    result['profile'] = get_profile_summary()
+
+Cada etapa grava '<etapa>.prof' em MONTUVIA_PROFILE_DIR (o orquestrador
+aponta para '<upload_id>.profile/' ao lado do arquivo do upload) e o
+resumo traz as N funções com mais tempo próprio (MONTUVIA_PROFILE_TOP).
+Os .prof abrem com 'python -m pstats' ou snakeviz.
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+PROFILE_FLAG = '--profile'
+DEFAULT_TOP = 15
+
+_summaries = {}
+_active = False
+
+def profiling_enabled():
+    return os.getenv('MONTUVIA_PROFILE', '0') not in ('', '0', 'false')
+
+def consume_profile_flag(argv):
+    """
+    Remove --profile de argv e liga o profiling (também nos subprocessos)
+
+    Returns:
+        list: argv sem o flag
+    """
+    if PROFILE_FLAG in argv:
+        os.environ['MONTUVIA_PROFILE'] = '1'
+    return [arg for arg in argv if arg != PROFILE_FLAG]
+
+def profile_dir():
+    """Diretório dos .prof (criado sob demanda)"""
+    path = os.getenv('MONTUVIA_PROFILE_DIR')
+    if not path:
+        path = PROJECT_ROOT / '.tmp' / 'profiles' / datetime.now().strftime('%Y%m%d_%H%M%S')
+        os.environ['MONTUVIA_PROFILE_DIR'] = str(path)
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _short_path(filename):
+    try:
+        return str(Path(filename).resolve().relative_to(PROJECT_ROOT))
+    except ValueError:
+        return filename
+
+def top_functions(stats, limit=None):
+    """
+    Funções com mais tempo próprio (tottime)
+
+    Returns:
+        list: [{'function', 'location', 'calls', 'tottimeMs', 'cumtimeMs'}]
+    """
+    limit = limit or int(os.getenv('MONTUVIA_PROFILE_TOP', DEFAULT_TOP))
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': name,
+            'location': f"{_short_path(filename)}:{line}",
+            'calls': calls,
+            'tottimeMs': round(tottime * 1000, 2),
+            'cumtimeMs': round(cumtime * 1000, 2)
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+@contextmanager
+def profile_stage(name):
+    """
+    Perfila o bloco como a etapa 'name' (no-op se o profiling está desligado)
+
+    cProfile não aninha: uma etapa dentro de outra já perfilada entra no
+    perfil da etapa de fora.
+    """
+    global _active
+    if not profiling_enabled() or _active:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    _active = True
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        path = profile_dir() / f"{name}.prof"
+        profiler.dump_stats(path)
+        _summaries[name] = {
+            'file': str(path),
+            'elapsedMs': round(elapsed_ms, 1),
+            'top': top_functions(pstats.Stats(profiler))
+        }
+        print(f"🔬 Profile '{name}' salvo em {path}", file=sys.stderr)
+
+def get_profile_summary():
+    """
+    Resumo das etapas perfiladas neste processo
+
+    Returns:
+        dict|None: {'dir', 'stages': {etapa: {'file', 'elapsedMs', 'top'}}} ou None se desligado
+    """
+    if not _summaries:
+        return None
+    return {'dir': os.getenv('MONTUVIA_PROFILE_DIR'), 'stages': dict(_summaries)}
+
+def merge_profile_summary(target, summary):
+    """Acumula o get_profile_summary() de outro processo (ex: etapa do pipeline)"""
+    if not summary:
+        return target
+    target.setdefault('dir', summary.get('dir'))
+    target.setdefault('stages', {}).update(summary.get('stages', {}))
+    return target
@@ -0,0 +1,25 @@
+"""
+Leitura de campos nos dois schemas do Firestore
+
+Os tools Python e as migrações gravam camelCase (supplierId, deliveryTime,
+minStock); o backend grava snake_case (supplier_id/supplier_ids,
+delivery_time, min_stock). Quem lê ingredientes e fornecedores usa estes
+helpers para que previsão e reposição enxerguem os mesmos valores.
+"""
+
+def first_field(data, *keys, default=0.0):
+    """Primeiro campo preenchido entre os nomes dados"""
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            return value
+    return default
+
+def ingredient_supplier(data):
+    """Fornecedor principal do ingrediente (supplierId, supplier_id ou o primeiro de supplier_ids)"""
+    supplier_ids = data.get('supplier_ids') or []
+    return first_field(data, 'supplierId', 'supplier_id', default=None) or (supplier_ids[0] if supplier_ids else None)
+
+def supplier_lead_time(data, default):
+    """Prazo de entrega do fornecedor em dias (deliveryTime ou delivery_time)"""
+    return float(first_field(data, 'deliveryTime', 'delivery_time', default=default) or default)
@@ -0,0 +1,280 @@
+"""
+Agendador de escritas em lote para o Firestore
+
+Limita a taxa de escrita com um token bucket que segue a regra 500/50/5
+do Firestore: começa em 500 ops/s e aumenta 50% a cada 5 minutos de
+tráfego contínuo. Commits que falham com RESOURCE_EXHAUSTED/ABORTED
+(ou erros transitórios de rede) são repetidos com backoff exponencial,
+batch por batch, e a taxa cai pela metade quando o servidor pede para
+desacelerar.
+
+Uso:
+    writer = WriteScheduler(db)
+    writer.set(db.collection('ingredients').document(ing_id), data)
+    ...
+    writer.flush()
+    print(writer.stats)
+
+    # ou, para batches montados pelo chamador:
+    writer.commit(batch, ops=len(chunk))
+"""
+
+import os
+import time
+import random
+import threading
+
+# Limite do Firestore por batch/commit
+MAX_BATCH_OPS = 500
+
+# Regra 500/50/5: 500 ops/s iniciais, +50% a cada 5 minutos (0 = sem limite)
+RAMP_START_OPS = float(os.getenv('WRITE_RATE_START', 500))
+RAMP_FACTOR = 1.5
+RAMP_INTERVAL_S = 300
+MAX_RATE_OPS = float(os.getenv('WRITE_RATE_MAX', 0)) or None
+
+MAX_RETRIES = int(os.getenv('WRITE_MAX_RETRIES', 6))
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 60.0
+
+# Erros do google.api_core que valem retry (comparados pelo nome para não
+# importar google.* só para isso)
+THROTTLE_ERRORS = {'ResourceExhausted', 'TooManyRequests'}
+RETRYABLE_ERRORS = THROTTLE_ERRORS | {
+    'Aborted', 'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError'
+}
+
+def is_retryable(error):
+    """True para RESOURCE_EXHAUSTED, ABORTED e falhas transitórias"""
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+def is_throttle(error):
+    """True quando o servidor pediu para reduzir a taxa de escrita"""
+    return type(error).__name__ in THROTTLE_ERRORS
+
+class WriteScheduler:
+    """
+    Token bucket + retry por batch, compartilhável entre etapas de um tool
+
+    Args:
+        db: Firestore client (ou MemoryStore)
+        start_rate (float): Ops/s iniciais (regra 500/50/5; 0 = sem limite)
+        max_rate (float): Teto opcional de ops/s
+        max_retries (int): Tentativas extras por batch
+        batch_size (int): Ops por batch nas escritas bufferizadas
+    """
+
+    def __init__(self, db, start_rate=RAMP_START_OPS, max_rate=MAX_RATE_OPS,
+                 max_retries=MAX_RETRIES, batch_size=MAX_BATCH_OPS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.db = db
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.batch_size = min(batch_size, MAX_BATCH_OPS)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self._base_rate = float(start_rate)
+        self._ramp_started = None
+        self._tokens = float(start_rate)
+        self._last_refill = None
+
+        self._batch = None
+        self._pending = 0
+
+        self.stats = {
+            'opsCommitted': 0,
+            'batchesCommitted': 0,
+            'throttledOps': 0,
+            'throttledMs': 0.0,
+            'retriedOps': 0,
+            'retries': 0,
+            'failedOps': 0,
+            'rateLimit': round(self._base_rate, 1)
+        }
+
+    # ==================== TOKEN BUCKET ====================
+
+    def current_rate(self):
+        """Taxa permitida agora (ops/s), aplicando o ramp-up de 50% a cada 5 min"""
+        if self._ramp_started is None:
+            return self._base_rate
+        steps = int((self._clock() - self._ramp_started) // RAMP_INTERVAL_S)
+        rate = self._base_rate * (RAMP_FACTOR ** steps)
+        return min(rate, self.max_rate) if self.max_rate else rate
+
+    def _reserve(self, ops):
+        """
+        Reserva tokens para 'ops' escritas
+
+        Returns:
+            float: Segundos que o chamador precisa esperar antes de escrever
+        """
+        if self._base_rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            if self._ramp_started is None:
+                self._ramp_started = now
+                self._last_refill = now
+
+            rate = self.current_rate()
+            self.stats['rateLimit'] = round(rate, 1)
+            self._tokens = min(rate, self._tokens + (now - self._last_refill) * rate)
+            self._last_refill = now
+
+            # Saldo pode ficar negativo: a próxima reserva espera pela dívida
+            self._tokens -= ops
+            if self._tokens >= 0:
+                return 0.0
+
+            wait = -self._tokens / rate
+            self.stats['throttledOps'] += ops
+            self.stats['throttledMs'] = round(self.stats['throttledMs'] + wait * 1000, 1)
+            return wait
+
+    def acquire(self, ops):
+        """Bloqueia até haver capacidade para 'ops' escritas"""
+        wait = self._reserve(ops)
+        if wait > 0:
+            self._sleep(wait)
+
+    def _slow_down(self):
+        """Servidor sinalizou sobrecarga: corta a taxa pela metade e reinicia o ramp"""
+        with self._lock:
+            self._base_rate = max(self.current_rate() / 2, 1.0)
+            self._ramp_started = self._clock()
+            self._tokens = min(self._tokens, 0.0)
+            self.stats['rateLimit'] = round(self._base_rate, 1)
+
+    def _backoff_delay(self, attempt):
+        delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _on_retry(self, error, ops, attempt):
+        """Contabiliza falha e decide se há nova tentativa (retorna o delay)"""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            self.stats['failedOps'] += ops
+            return None
+        if is_throttle(error) and self._base_rate > 0:
+            self._slow_down()
+        self.stats['retries'] += 1
+        self.stats['retriedOps'] += ops
+        return self._backoff_delay(attempt)
+
+    def _on_success(self, ops):
+        self.stats['opsCommitted'] += ops
+        self.stats['batchesCommitted'] += 1
+
+    # ==================== COMMITS ====================
+
+    def commit(self, batch, ops):
+        """
+        Commita um batch respeitando a taxa, com retry exponencial
+
+        O mesmo objeto batch é reenviado: as referências (inclusive IDs
+        gerados com .document()) não mudam entre tentativas.
+
+        Raises:
+            Exception: Erro não-retryable ou após esgotar as tentativas
+        """
+        attempt = 0
+        while True:
+            self.acquire(ops)
+            try:
+                result = batch.commit()
+            except Exception as e:
+                delay = self._on_retry(e, ops, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                self._sleep(delay)
+                continue
+            self._on_success(ops)
+            return result
+
+    async def commit_async(self, batch, ops):
+        """Versão assíncrona de commit (para firestore.AsyncClient)"""
+        import asyncio
+
+        attempt = 0
+        while True:
+            wait = self._reserve(ops)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                result = await batch.commit()
+            except Exception as e:
+                delay = self._on_retry(e, ops, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(ops)
+            return result
+
+    # ==================== ESCRITAS BUFFERIZADAS ====================
+
+    def _buffer(self):
+        if self._batch is None:
+            self._batch = self.db.batch()
+        return self._batch
+
+    def _added(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def set(self, reference, data, merge=False):
+        self._buffer().set(reference, data, merge=merge)
+        self._added()
+
+    def update(self, reference, data):
+        self._buffer().update(reference, data)
+        self._added()
+
+    def delete(self, reference):
+        self._buffer().delete(reference)
+        self._added()
+
+    def flush(self):
+        """Commita as escritas pendentes (no-op se não houver)"""
+        if not self._pending:
+            return
+        batch, ops = self._batch, self._pending
+        self._batch, self._pending = None, 0
+        self.commit(batch, ops)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+_shared = None
+
+def get_write_scheduler():
+    """
+    WriteScheduler do processo, sobre o client compartilhado
+
+    Tools que escrevem em várias funções usam a mesma instância, então o
+    token bucket e os contadores valem para o processo inteiro.
+    """
+    global _shared
+    if _shared is None:
+        from firebase_helper import get_firestore_client
+        _shared = WriteScheduler(get_firestore_client())
+    return _shared
+
+def format_write_stats(stats):
+    """Resumo de uma linha dos contadores do WriteScheduler"""
+    return (
+        f"{stats['opsCommitted']} escritas em {stats['batchesCommitted']} batches | "
+        f"{stats['throttledOps']} limitadas ({stats['throttledMs'] / 1000:.1f}s) | "
+        f"{stats['retriedOps']} repetidas | {stats['failedOps']} falharam"
+    )
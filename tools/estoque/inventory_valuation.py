@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Valorização do estoque por custo médio ponderado e por camadas FIFO
+
+O relatório do backend (RelatoriosService.getEstoqueValor) multiplica o
+estoque pelo último preço cadastrado (price / grossQuantity). Aqui o
+valor sai do histórico: 'stock_movements' é reproduzido em ordem e cada
+ingrediente mantém
+    - custo médio: entrada recalcula (qtd × médio + entrada × custo) / total,
+      saída baixa pelo médio vigente
+    - camadas FIFO: cada recebimento vira um lote (qtd, custo); saídas
+      consomem os lotes mais antigos primeiro
+
+Custo de entrada: unit_price do item no checklist do recebimento
+(movimentos 'receiving', reference_id = recebimento). Ajustes positivos
+entram pelo custo médio vigente; sem custo conhecido, pelo preço do
+cadastro (price / grossQuantity, mesma conta do backend).
+
+O estado fica em .tmp/inventory_valuation.json (INVENTORY_VALUATION_STATE)
+com o instante do último movimento processado: cada execução lê só os
+movimentos novos. Na primeira, o saldo anterior ao histórico vira um lote
+de abertura (estoque atual − Σ movimentos) ao preço do cadastro. Ao virar
+o período (mensal por padrão, no fuso LOCAL_TIMEZONE) o fechamento de
+cada ingrediente (quantidade, custo médio, valor médio/FIFO e CMV do
+período) é gravado no estado — 'report' lê dali, sem replay.
+
+Com --write-costs grava average_cost nos ingredientes alterados, usado
+pelo relatório de valor de estoque do backend no lugar do último preço.
+
+Uso:
+    python tools/estoque/inventory_valuation.py run [--rebuild] [--cadence monthly] [--write-costs] [--dry-run]
+    python tools/estoque/inventory_valuation.py report [--period 2024-01]
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from collections import defaultdict
+from datetime import datetime, timezone
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.estoque.snapshot_stock import period_key, read_stock_level, CADENCES
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.common.instrumentation import op_stage, get_op_stats
+
+STATE_PATH = Path(os.getenv('INVENTORY_VALUATION_STATE', PROJECT_ROOT / '.tmp' / 'inventory_valuation.json'))
+STATE_VERSION = 1
+LOCAL_TIMEZONE = ZoneInfo(os.getenv('LOCAL_TIMEZONE', 'America/Sao_Paulo'))
+DEFAULT_CADENCE = 'monthly'
+COST_DECIMALS = 6
+EPSILON = 1e-9
+
+def _number(data, *keys):
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ''):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+    return 0.0
+
+def catalog_unit_cost(ingredient):
+    """Preço do cadastro por unidade de estoque (price / grossQuantity, como o backend)"""
+    gross = _number(ingredient, 'grossQuantity', 'gross_quantity', 'gross_qty') or 1.0
+    return _number(ingredient, 'price') / gross
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _period(moment, cadence):
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(LOCAL_TIMEZONE)
+    return period_key(moment, cadence)
+
+# ==================== ESTADO ====================
+
+class ValuationState:
+    """
+    Estado persistido entre execuções
+
+    items: {ingredient_id: {'qty', 'avgCost', 'lastCost', 'deficit', 'lots': [[qtd, custo, instante, ref]],
+            'cogsAvg', 'cogsFifo'}} (CMV do período aberto);
+    closings: {período: {'closedAt', 'items': {ingredient_id: {...}}}};
+    catalog: nome/categoria/unidade de cada ingrediente para os relatórios.
+    """
+
+    def __init__(self, path=STATE_PATH, cadence=DEFAULT_CADENCE):
+        self.path = Path(path)
+        self.data = self._empty(cadence)
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('version') == STATE_VERSION:
+                    self.data = saved
+            except (OSError, ValueError):
+                pass  # estado corrompido: reconstrói
+
+    @staticmethod
+    def _empty(cadence):
+        return {
+            'version': STATE_VERSION,
+            'cadence': cadence,
+            'builtAt': None,
+            'lastMovementAt': None,
+            'boundaryIds': [],
+            'currentPeriod': None,
+            'movementsProcessed': 0,
+            'items': {},
+            'closings': {},
+            'catalog': {}
+        }
+
+    def reset(self, cadence):
+        self.data = self._empty(cadence)
+
+    @property
+    def built(self):
+        return self.data['builtAt'] is not None
+
+    @property
+    def cadence(self):
+        return self.data['cadence']
+
+    def item(self, ing_id):
+        items = self.data['items']
+        if ing_id not in items:
+            items[ing_id] = {'qty': 0.0, 'avgCost': 0.0, 'lastCost': 0.0, 'deficit': 0.0, 'lots': [],
+                             'cogsAvg': 0.0, 'cogsFifo': 0.0}
+        return items[ing_id]
+
+    def receive(self, ing_id, qty, cost, at, ref):
+        """Entrada: recalcula o médio e abre um lote FIFO (cobrindo antes o saldo negativo)"""
+        item = self.item(ing_id)
+        on_hand = item['qty']
+        if on_hand <= EPSILON:
+            item['avgCost'] = cost
+        else:
+            item['avgCost'] = (on_hand * item['avgCost'] + qty * cost) / (on_hand + qty)
+        item['qty'] = on_hand + qty
+        item['lastCost'] = cost
+
+        covered = min(item['deficit'], qty)
+        item['deficit'] -= covered
+        if qty - covered > EPSILON:
+            item['lots'].append([qty - covered, cost, _iso(at), ref])
+
+    def issue(self, ing_id, qty):
+        """Saída: CMV pelo médio e pelos lotes mais antigos"""
+        item = self.item(ing_id)
+        item['cogsAvg'] += qty * item['avgCost']
+        item['qty'] -= qty
+
+        remaining = qty
+        lots = item['lots']
+        while remaining > EPSILON and lots:
+            lot = lots[0]
+            taken = min(lot[0], remaining)
+            item['cogsFifo'] += taken * lot[1]
+            lot[0] -= taken
+            remaining -= taken
+            if lot[0] <= EPSILON:
+                lots.pop(0)
+        if remaining > EPSILON:
+            # Estoque negativo: baixa pelo último custo e fica pendente para a próxima entrada
+            item['cogsFifo'] += remaining * (item['lastCost'] or item['avgCost'])
+            item['deficit'] += remaining
+
+    def summary(self, ing_id):
+        item = self.data['items'][ing_id]
+        qty = item['qty']
+        return {
+            'qty': round(qty, 6),
+            'avgCost': round(item['avgCost'], COST_DECIMALS),
+            'avgValue': round(max(qty, 0.0) * item['avgCost'], 2),
+            'fifoValue': round(sum(lot[0] * lot[1] for lot in item['lots']), 2),
+            'cogsAvg': round(item['cogsAvg'], 2),
+            'cogsFifo': round(item['cogsFifo'], 2)
+        }
+
+    def advance_to(self, period, closed_at):
+        """Fecha o período aberto se 'period' já é posterior a ele"""
+        current = self.data['currentPeriod']
+        if current is not None and period > current:
+            self.data['closings'][current] = {
+                'closedAt': _iso(closed_at),
+                'items': {ing_id: self.summary(ing_id) for ing_id in self.data['items']}
+            }
+            for item in self.data['items'].values():
+                item['cogsAvg'] = item['cogsFifo'] = 0.0
+        if current is None or period > current:
+            self.data['currentPeriod'] = period
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        tmp.replace(self.path)
+
+# ==================== MOVIMENTOS ====================
+
+def load_movements(db, since=None, boundary_ids=()):
+    """
+    Movimentos a partir do último processado, em ordem cronológica
+
+    O corte usa >= no instante do último movimento e descarta os IDs já
+    aplicados naquele instante (vários movimentos podem ter o mesmo timestamp).
+    """
+    query = db.collection('stock_movements')
+    if since is not None:
+        query = query.where('created_at', '>=', since)
+    skip = set(boundary_ids)
+
+    movements = []
+    for doc in query.order_by('created_at').stream():
+        data = doc.to_dict()
+        if doc.id in skip or not data.get('ingredient_id') or not isinstance(data.get('created_at'), datetime):
+            continue
+        movements.append((data['created_at'], doc.id, data))
+    movements.sort(key=lambda m: (m[0], m[1]))
+    return movements
+
+def load_receiving_costs(db, receiving_ids):
+    """
+    Custo unitário de cada item recebido
+
+    Returns:
+        dict: {(receiving_id, ingredient_id): unit_price}
+    """
+    costs = {}
+    if not receiving_ids:
+        return costs
+    refs = [db.collection('receivings').document(receiving_id) for receiving_id in sorted(receiving_ids)]
+    for doc in db.get_all(refs):
+        if not doc.exists:
+            continue
+        for item in doc.to_dict().get('checklist', []):
+            price = _number(item, 'unit_price')
+            if item.get('ingredient_id') and price > 0:
+                costs[(doc.id, item['ingredient_id'])] = price
+    return costs
+
+def load_ingredients(db):
+    """{ingredient_id: dados} de todos os ingredientes"""
+    return {doc.id: doc.to_dict() for doc in db.collection('ingredients').stream()}
+
+def apply_opening(state, ingredients, movements, at):
+    """Saldo anterior ao histórico (estoque atual − Σ movimentos) como lote de abertura"""
+    moved = defaultdict(float)
+    for _, _, data in movements:
+        moved[data['ingredient_id']] += _number(data, 'quantity')
+
+    openings = 0
+    for ing_id, data in ingredients.items():
+        opening = read_stock_level(data) - moved.get(ing_id, 0.0)
+        if opening > EPSILON:
+            state.receive(ing_id, opening, catalog_unit_cost(data), at, 'opening')
+            openings += 1
+    return openings
+
+def apply_movement(state, data, at, receiving_costs, ingredients):
+    ing_id = data['ingredient_id']
+    qty = _number(data, 'quantity')
+    if qty < 0:
+        state.issue(ing_id, -qty)
+        return
+    if qty == 0:
+        return
+
+    cost = None
+    if data.get('movement_type') == 'receiving':
+        cost = receiving_costs.get((data.get('reference_id'), ing_id))
+    if cost is None:
+        item = state.item(ing_id)
+        cost = item['avgCost'] or item['lastCost'] or catalog_unit_cost(ingredients.get(ing_id, {}))
+    state.receive(ing_id, qty, cost, at, data.get('reference_id') or data.get('movement_type', ''))
+
+# ==================== EXECUÇÃO ====================
+
+def run_valuation(rebuild=False, cadence=None, write_costs=False, dry_run=False, state_path=STATE_PATH):
+    """
+    Processa os movimentos novos e atualiza o estado
+
+    Returns:
+        dict: Resumo da execução
+    """
+    db = get_firestore_client()
+    state = ValuationState(state_path, cadence or DEFAULT_CADENCE)
+    if rebuild or not state.built or (cadence and cadence != state.cadence):
+        state.reset(cadence or state.cadence)
+    first_run = not state.built
+    now = datetime.now(timezone.utc)
+
+    with op_stage('load_ingredients'):
+        ingredients = load_ingredients(db)
+    previous_avg = {ing_id: item['avgCost'] for ing_id, item in state.data['items'].items()}
+
+    with op_stage('load_movements'):
+        since = datetime.fromisoformat(state.data['lastMovementAt']) if state.data['lastMovementAt'] else None
+        movements = load_movements(db, since, state.data['boundaryIds'])
+        receiving_ids = {
+            data['reference_id'] for _, _, data in movements
+            if data.get('movement_type') == 'receiving' and data.get('reference_id')
+        }
+        receiving_costs = load_receiving_costs(db, receiving_ids)
+
+    openings = 0
+    if first_run:
+        start = movements[0][0] if movements else now
+        state.advance_to(_period(start, state.cadence), start)
+        openings = apply_opening(state, ingredients, movements, start)
+        state.data['builtAt'] = now.isoformat()
+
+    for at, _, data in movements:
+        state.advance_to(_period(at, state.cadence), at)
+        apply_movement(state, data, at, receiving_costs, ingredients)
+    # Sem movimentos pendentes: períodos já encerrados no relógio também fecham
+    state.advance_to(_period(now, state.cadence), now)
+
+    if movements:
+        last_at = movements[-1][0]
+        boundary = [doc_id for at, doc_id, _ in movements if at == last_at]
+        if since is not None and last_at == since:
+            boundary += state.data['boundaryIds']
+        state.data['lastMovementAt'] = last_at.isoformat()
+        state.data['boundaryIds'] = sorted(set(boundary))
+    state.data['movementsProcessed'] += len(movements)
+    state.data['catalog'] = {
+        ing_id: {'name': data.get('name', ''), 'category': data.get('category') or 'outros',
+                 'unit': data.get('unit', '')}
+        for ing_id, data in ingredients.items()
+    }
+
+    drift = [
+        ing_id for ing_id, item in state.data['items'].items()
+        if ing_id in ingredients and abs(item['qty'] - read_stock_level(ingredients[ing_id])) > 1e-6
+    ]
+
+    changed_costs = {
+        ing_id: round(item['avgCost'], COST_DECIMALS) for ing_id, item in state.data['items'].items()
+        if ing_id in ingredients and round(item['avgCost'], COST_DECIMALS) != round(previous_avg.get(ing_id, -1), COST_DECIMALS)
+    }
+
+    writer = None
+    if write_costs and not dry_run:
+        writer = get_write_scheduler()
+        ingredients_ref = db.collection('ingredients')
+        with op_stage('write_costs'):
+            for ing_id, avg_cost in changed_costs.items():
+                writer.update(ingredients_ref.document(ing_id), {'average_cost': avg_cost, 'average_cost_updated_at': now})
+            writer.flush()
+
+    if not dry_run:
+        state.save()
+
+    return {
+        'mode': 'rebuild' if first_run else 'incremental',
+        'cadence': state.cadence,
+        'movementsApplied': len(movements),
+        'receivingsPriced': len(receiving_ids),
+        'openingLots': openings,
+        'currentPeriod': state.data['currentPeriod'],
+        'closedPeriods': len(state.data['closings']),
+        'changedAverageCosts': len(changed_costs),
+        'stockDrift': len(drift),
+        'dryRun': dry_run,
+        'writeScheduler': writer.stats if writer else None
+    }
+
+# ==================== RELATÓRIO ====================
+
+def valuation_report(state, period=None):
+    """
+    Valor do estoque no fim de um período, lido do estado (sem replay)
+
+    Período sem fechamento próprio (nenhum movimento nele) herda o fechamento
+    anterior, com CMV zero; o período aberto usa o saldo atual.
+    """
+    current = state.data['currentPeriod']
+    period = period or current
+    if period is None:
+        raise ValueError("Estado vazio: rode 'inventory_valuation.py run' primeiro")
+
+    if period == current:
+        items = {ing_id: state.summary(ing_id) for ing_id in state.data['items']}
+        closed, source = False, current
+    elif current is not None and period > current:
+        raise ValueError(f"Período {period} ainda não começou (período aberto: {current})")
+    else:
+        previous = [key for key in state.data['closings'] if key <= period]
+        if not previous:
+            raise ValueError(f"Sem fechamento até {period} (histórico começa em "
+                             f"{min(state.data['closings'], default=current)})")
+        source = max(previous)
+        items = dict(state.data['closings'][source]['items'])
+        if source != period:
+            items = {ing_id: dict(values, cogsAvg=0.0, cogsFifo=0.0) for ing_id, values in items.items()}
+        closed = True
+
+    catalog = state.data['catalog']
+    categories = defaultdict(lambda: {'avgValue': 0.0, 'fifoValue': 0.0, 'cogsAvg': 0.0, 'cogsFifo': 0.0})
+    rows = []
+    for ing_id, values in items.items():
+        info = catalog.get(ing_id, {})
+        category = info.get('category', 'outros')
+        for key in categories[category]:
+            categories[category][key] += values[key]
+        rows.append({'ingredientId': ing_id, 'name': info.get('name', ''), 'category': category,
+                     'unit': info.get('unit', ''), **values})
+    rows.sort(key=lambda r: -r['avgValue'])
+
+    def total(key):
+        return round(sum(r[key] for r in rows), 2)
+
+    return {
+        'period': period,
+        'cadence': state.cadence,
+        'closed': closed,
+        'source': source,
+        'totalValueAvg': total('avgValue'),
+        'totalValueFifo': total('fifoValue'),
+        'cogsAvg': total('cogsAvg'),
+        'cogsFifo': total('cogsFifo'),
+        'categories': {cat: {k: round(v, 2) for k, v in values.items()} for cat, values in sorted(categories.items())},
+        'items': rows
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Valorização do estoque (custo médio e FIFO)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Processa os movimentos novos')
+    run.add_argument('--rebuild', action='store_true', help='Descarta o estado e reproduz todo o histórico')
+    run.add_argument('--cadence', choices=CADENCES, help=f'Período dos fechamentos (padrão: {DEFAULT_CADENCE}; '
+                                                         'mudar reconstrói o estado)')
+    run.add_argument('--write-costs', action='store_true', help='Grava average_cost nos ingredientes alterados')
+    run.add_argument('--dry-run', action='store_true', help='Só calcula, sem gravar estado nem custos')
+
+    report = subparsers.add_parser('report', help='Valor do estoque no fim de um período (do estado salvo)')
+    report.add_argument('--period', help='Ex: 2024-01 (padrão: período aberto)')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        print("📦 Valorizando estoque...", file=sys.stderr)
+        result = run_valuation(args.rebuild, args.cadence, args.write_costs, args.dry_run)
+        result['firestoreOps'] = get_op_stats()
+        print(f"✓ [{result['mode']}] {result['movementsApplied']} movimentos aplicados, "
+              f"período aberto {result['currentPeriod']}, {result['closedPeriods']} fechados", file=sys.stderr)
+        if result['stockDrift']:
+            print(f"⚠️  {result['stockDrift']} ingredientes com saldo diferente do current_stock "
+                  f"(ajustes sem movimento?)", file=sys.stderr)
+        if result['writeScheduler']:
+            print(f"💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+    else:
+        try:
+            result = valuation_report(ValuationState(), args.period)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        status = 'fechado' if result['closed'] else 'aberto'
+        print(f"✓ {result['period']} ({status}): custo médio R$ {result['totalValueAvg']:,.2f} | "
+              f"FIFO R$ {result['totalValueFifo']:,.2f}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Snapshots periódicos de estoque + consultas point-in-time
+
+Grava em 'stock_snapshots' um documento compacto com o currentStock de
+todos os ingredientes (um documento por período, ex: um por dia).
+Para saber o estoque em uma data, parte do snapshot mais próximo anterior
+e soma apenas os movimentos de 'stock_movements' depois dele, sem replay
+do histórico inteiro.
+
+Uso:
+    python tools/estoque/snapshot_stock.py take [--cadence daily|weekly|monthly|hourly] [--force]
+    python tools/estoque/snapshot_stock.py at <data ISO> [--ingredient <id> ...]
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from firebase_helper import get_firestore_client, server_timestamp
+
+SNAPSHOTS_COLLECTION = 'stock_snapshots'
+
+CADENCES = ('hourly', 'daily', 'weekly', 'monthly')
+
+# Folga para o relógio local não pedir ao servidor um read_time no futuro
+READ_TIME_LAG = timedelta(seconds=5)
+
+def period_key(moment, cadence='daily'):
+    """
+    Retorna a chave do período (ID do documento) para um instante
+
+    Ex: daily → '2024-01-15', weekly → '2024-W03', monthly → '2024-01'
+    """
+    if cadence == 'hourly':
+        return moment.strftime('%Y-%m-%dT%H')
+    if cadence == 'daily':
+        return moment.strftime('%Y-%m-%d')
+    if cadence == 'weekly':
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    if cadence == 'monthly':
+        return moment.strftime('%Y-%m')
+    raise ValueError(f"Cadência inválida: {cadence}. Use: {', '.join(CADENCES)}")
+
+def read_stock_level(ing_data):
+    """Lê o estoque atual (Python grava currentStock, backend grava current_stock)"""
+    value = ing_data.get('currentStock', ing_data.get('current_stock', 0))
+    return float(value or 0)
+
+def take_stock_snapshot(db, cadence='daily', force=False, now=None):
+    """
+    Grava snapshot de estoque de todos os ingredientes
+
+    O ID do documento é '<cadence>_<period_key>', então rodar o job mais de
+    uma vez no mesmo período não duplica snapshots (use force para regravar).
+
+    Os ingredientes são lidos com read_time fixo e esse mesmo instante vira
+    o takenAt: um movimento (gravado no mesmo batch que o estoque) ou já está
+    nos níveis do snapshot ou tem created_at > takenAt, nunca os dois.
+
+    Args:
+        db: Firestore client
+        cadence (str): hourly | daily | weekly | monthly
+        force (bool): Regrava mesmo se já existe snapshot no período
+        now (datetime): Instante que define o período (default: agora, UTC)
+
+    Returns:
+        dict: {'snapshotId', 'created', 'ingredientCount', 'takenAt'}
+    """
+    read_time = datetime.now(timezone.utc) - READ_TIME_LAG
+    now = now or read_time
+    snapshot_id = f"{cadence}_{period_key(now, cadence)}"
+    snapshot_ref = db.collection(SNAPSHOTS_COLLECTION).document(snapshot_id)
+
+    if not force and snapshot_ref.get().exists:
+        return {
+            'snapshotId': snapshot_id,
+            'created': False,
+            'ingredientCount': 0,
+            'takenAt': None
+        }
+
+    levels = {}
+    units = {}
+    for doc in db.collection('ingredients').stream(read_time=read_time):
+        data = doc.to_dict()
+        levels[doc.id] = read_stock_level(data)
+        units[doc.id] = data.get('unit', '')
+
+    snapshot_ref.set({
+        'id': snapshot_id,
+        'cadence': cadence,
+        'period': period_key(now, cadence),
+        'takenAt': read_time,
+        'ingredientCount': len(levels),
+        'levels': levels,
+        'units': units,
+        'createdAt': server_timestamp()
+    })
+
+    return {
+        'snapshotId': snapshot_id,
+        'created': True,
+        'ingredientCount': len(levels),
+        'takenAt': read_time.isoformat()
+    }
+
+def find_nearest_snapshot(db, at):
+    """
+    Busca o snapshot mais recente com takenAt <= at
+
+    Returns:
+        dict | None: Dados do snapshot
+    """
+    query = (
+        db.collection(SNAPSHOTS_COLLECTION)
+        .where('takenAt', '<=', at)
+        .order_by('takenAt', direction='DESCENDING')
+        .limit(1)
+    )
+    for doc in query.stream():
+        return doc.to_dict()
+    return None
+
+def sum_movements(db, start, end, ingredient_ids=None):
+    """
+    Soma 'quantity' dos movimentos em (start, end] por ingrediente
+
+    Returns:
+        dict: {ingredient_id: {'delta': float, 'movements': int}}
+    """
+    query = db.collection('stock_movements').where('created_at', '<=', end)
+    if start is not None:
+        query = query.where('created_at', '>', start)
+
+    wanted = set(ingredient_ids) if ingredient_ids else None
+    totals = defaultdict(lambda: {'delta': 0.0, 'movements': 0})
+
+    for doc in query.stream():
+        data = doc.to_dict()
+        ing_id = data.get('ingredient_id')
+        if not ing_id or (wanted is not None and ing_id not in wanted):
+            continue
+        totals[ing_id]['delta'] += float(data.get('quantity', 0) or 0)
+        totals[ing_id]['movements'] += 1
+
+    return dict(totals)
+
+def get_stock_at(db, at, ingredient_ids=None):
+    """
+    Estoque de cada ingrediente em um instante (snapshot + movimentos)
+
+    Sem snapshot anterior ao instante não há saldo de partida: a soma dos
+    movimentos não é estoque, então 'stock' fica vazio e 'complete' False
+    (os movimentos somados vão em 'movementDeltas', só como informação).
+
+    Args:
+        db: Firestore client
+        at (datetime): Instante desejado (timezone-aware)
+        ingredient_ids (list): Restringe a estes ingredientes (opcional)
+
+    Returns:
+        dict: {
+            'at': str,
+            'snapshotId': str | None,
+            'complete': bool,
+            'movementsApplied': int,
+            'stock': {ingredient_id: float},
+            'movementDeltas': {ingredient_id: float},  # só sem snapshot
+            'message': str                             # só sem snapshot
+        }
+    """
+    snapshot = find_nearest_snapshot(db, at)
+
+    if snapshot is None:
+        movements = sum_movements(db, None, at, ingredient_ids)
+        return {
+            'at': at.isoformat(),
+            'snapshotId': None,
+            'complete': False,
+            'movementsApplied': 0,
+            'stock': {},
+            'movementDeltas': {ing_id: totals['delta'] for ing_id, totals in movements.items()},
+            'message': 'Nenhum snapshot anterior a esta data: estoque desconhecido'
+        }
+
+    levels = dict(snapshot.get('levels', {}))
+    if ingredient_ids:
+        levels = {ing_id: levels.get(ing_id, 0.0) for ing_id in ingredient_ids}
+
+    movements = sum_movements(db, snapshot.get('takenAt'), at, ingredient_ids)
+    for ing_id, totals in movements.items():
+        levels[ing_id] = levels.get(ing_id, 0.0) + totals['delta']
+
+    return {
+        'at': at.isoformat(),
+        'snapshotId': snapshot.get('id'),
+        'complete': True,
+        'movementsApplied': sum(t['movements'] for t in movements.values()),
+        'stock': levels
+    }
+
+def parse_moment(value):
+    """Converte data ISO para datetime com timezone (UTC se ausente)"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshots de estoque e consultas point-in-time')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    take = subparsers.add_parser('take', help='Grava snapshot do estoque atual')
+    take.add_argument('--cadence', choices=CADENCES, default='daily')
+    take.add_argument('--force', action='store_true', help='Regrava snapshot do período')
+
+    at = subparsers.add_parser('at', help='Estoque em uma data (ISO)')
+    at.add_argument('moment', help="Ex: 2024-01-01 ou 2024-01-01T23:59:59")
+    at.add_argument('--ingredient', action='append', dest='ingredients')
+
+    args = parser.parse_args()
+    db = get_firestore_client()
+
+    if args.command == 'take':
+        result = take_stock_snapshot(db, cadence=args.cadence, force=args.force)
+        if result['created']:
+            print(f"✓ Snapshot {result['snapshotId']}: {result['ingredientCount']} ingredientes", file=sys.stderr)
+        else:
+            print(f"ℹ️  Snapshot {result['snapshotId']} já existe (use --force para regravar)", file=sys.stderr)
+    else:
+        result = get_stock_at(db, parse_moment(args.moment), args.ingredients)
+        if not result['complete']:
+            print(f"⚠️  {result['message']}", file=sys.stderr)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
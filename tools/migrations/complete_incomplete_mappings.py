@@ -15,12 +15,11 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
-from google.cloud import firestore
-from firebase_helper import get_firestore_client
-import pandas as pd
+from firebase_helper import get_firestore_client, server_timestamp
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.vendas.sales_history import sku_sales_counts
 from datetime import datetime
+from functools import lru_cache
 import random
 import string
 
@@ -29,16 +28,6 @@ project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
 load_dotenv(env_path)
 
-# Initialize Firebase
-creds_path = project_root / 'firebase-credentials.json'
-cred = credentials.Certificate(str(creds_path))
-
-# Verifica se Firebase já foi inicializado
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = get_firestore_client()
-
 def generate_id():
     """Gera ID único"""
     return 'rec_' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=20))
@@ -77,15 +66,18 @@ def classify_category(product_type):
     }
     return categories.get(product_type, 'Não Categorizado')
 
+@lru_cache(maxsize=1)
+def load_sales_counts():
+    """Vendas por SKU (histórico de vendas; sem histórico, Excel de janeiro), lidas uma vez"""
+    return sku_sales_counts()
+
 def get_sales_count(sku):
     """Busca quantidade de vendas de um SKU"""
-    excel_path = project_root / "Relatório de produtos vendidos - janeiro.xlsx"
-    df = pd.read_excel(excel_path)
-    sales = df[df['SKU'] == sku]
-    return len(sales)
+    return load_sales_counts().get(sku, 0)
 
 def create_recipe_for_product(product_name, product_type, sales_count):
     """Cria receita básica para produto"""
+    db = get_firestore_client()
     recipe_id = generate_id()
 
     needs_inventory_control = product_type in ['dish', 'beverage_bar']
@@ -104,15 +96,16 @@ def create_recipe_for_product(product_name, product_type, sales_count):
         'needsReview': True,
         'inventoryControlled': needs_inventory_control,
         'productType': product_type,
-        'createdAt': firestore.SERVER_TIMESTAMP,
+        'createdAt': server_timestamp(),
         'createdBy': 'auto_migration'
     }
 
-    db.collection('recipes').document(recipe_id).set(recipe_data)
+    get_write_scheduler().set(db.collection('recipes').document(recipe_id), recipe_data)
     return recipe_id
 
 def create_review_alert(recipe_id, recipe_name, sales_count, product_type):
     """Cria alerta para receita que precisa revisão"""
+    db = get_firestore_client()
     if product_type not in ['dish', 'beverage_bar']:
         return
 
@@ -128,13 +121,15 @@ def create_review_alert(recipe_id, recipe_name, sales_count, product_type):
         'message': f'Ficha técnica "{recipe_name}" precisa ser completada. Produto vendeu {sales_count}x em janeiro.',
         'salesVolume': sales_count,
         'status': 'pending',
-        'createdAt': firestore.SERVER_TIMESTAMP,
+        'createdAt': server_timestamp(),
         'resolvedAt': None
     }
 
-    db.collection('alerts').document(alert_id).set(alert_data)
+    get_write_scheduler().set(db.collection('alerts').document(alert_id), alert_data)
 
 def main():
+    db = get_firestore_client()
+    writer = get_write_scheduler()
     print("="*80)
     print("COMPLETANDO MAPEAMENTOS INCOMPLETOS")
     print("="*80)
@@ -176,9 +171,9 @@ def main():
         if sku in skus_processed:
             recipe_id = skus_processed[sku]
             # Atualizar mapeamento com recipe_id existente
-            mapping['doc_ref'].update({
+            writer.update(mapping['doc_ref'], {
                 'recipe_id': recipe_id,
-                'updated_at': firestore.SERVER_TIMESTAMP,
+                'updated_at': server_timestamp(),
                 'updated_by': 'auto_migration'
             })
             updated_count += 1
@@ -194,13 +189,13 @@ def main():
         skus_processed[sku] = recipe_id
 
         # Atualizar mapeamento
-        mapping['doc_ref'].update({
+        writer.update(mapping['doc_ref'], {
             'recipe_id': recipe_id,
             'recipe_name': name.title(),
             'confidence': 1.0,
             'productType': product_type,
             'needsReview': product_type in ['dish', 'beverage_bar'],
-            'updated_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': server_timestamp(),
             'updated_by': 'auto_migration'
         })
 
@@ -222,6 +217,9 @@ def main():
         print(f"   {icon} SKU {sku:4s} | {name:45s} | {sales:3d} vendas | {status}")
         created_count += 1
 
+    writer.flush()
+    print(f"\n   💾 {format_write_stats(writer.stats)}")
+
     # Resumo
     print("\n" + "="*80)
     print("✅ MAPEAMENTOS COMPLETADOS!")
@@ -237,15 +235,14 @@ def main():
     print(f"\nAlertas criados: {alerts_count}")
 
     # Calcular cobertura
-    excel_path = project_root / "Relatório de produtos vendidos - janeiro.xlsx"
-    df = pd.read_excel(excel_path)
+    sales_counts = load_sales_counts()
 
-    total_sales = len(df)
-    mapped_sales = len(df[df['SKU'].isin(skus_processed.keys())])
+    total_sales = sum(sales_counts.values())
+    mapped_sales = sum(count for sku, count in sales_counts.items() if sku in skus_processed)
     coverage = (mapped_sales / total_sales) * 100 if total_sales > 0 else 0
 
     print(f"\n📊 Cobertura de vendas:")
-    print(f"  Total vendas janeiro: {total_sales}")
+    print(f"  Total vendas: {total_sales}")
     print(f"  Vendas mapeadas: {mapped_sales} ({coverage:.1f}%)")
 
     print("\n📋 Próximos passos:")
@@ -15,11 +15,9 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
-from google.cloud import firestore
-from firebase_helper import get_firestore_client
-import pandas as pd
+from firebase_helper import get_firestore_client, server_timestamp
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.vendas.sales_history import product_sales_counts
 from datetime import datetime
 import random
 import string
@@ -29,16 +27,6 @@ project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
 load_dotenv(env_path)
 
-# Initialize Firebase
-creds_path = project_root / 'firebase-credentials.json'
-cred = credentials.Certificate(str(creds_path))
-
-# Verifica se Firebase já foi inicializado
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = get_firestore_client()
-
 def generate_id():
     """Gera ID único"""
     return 'rec_' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=20))
@@ -69,12 +57,9 @@ def classify_product_type(product_name):
 
 def get_unmapped_products():
     """Retorna produtos do Zig que não têm recipe_id"""
-    # Ler Excel do Zig
-    excel_path = project_root / "Relatório de produtos vendidos - janeiro.xlsx"
-    df = pd.read_excel(excel_path)
-
-    # Contar vendas por produto
-    sales_count = df.groupby(['SKU', 'Nome do Produto']).size().reset_index(name='vendas')
+    db = get_firestore_client()
+    # Contar vendas por produto (histórico de vendas; sem histórico, Excel de janeiro)
+    sales_count = product_sales_counts()
 
     # Buscar mapeamentos existentes COM recipe_id válido
     mappings_ref = db.collection('product_mappings')
@@ -96,6 +81,7 @@ def get_unmapped_products():
 
 def create_recipe_for_product(product_name, product_type, sales_count):
     """Cria receita básica para produto"""
+    db = get_firestore_client()
     recipe_id = generate_id()
 
     # Configuração baseada no tipo
@@ -115,12 +101,12 @@ def create_recipe_for_product(product_name, product_type, sales_count):
         'needsReview': True,
         'inventoryControlled': needs_inventory_control,
         'productType': product_type,
-        'createdAt': firestore.SERVER_TIMESTAMP,
+        'createdAt': server_timestamp(),
         'createdBy': 'auto_migration'
     }
 
     # Salvar no Firestore
-    db.collection('recipes').document(recipe_id).set(recipe_data)
+    get_write_scheduler().set(db.collection('recipes').document(recipe_id), recipe_data)
 
     return recipe_id
 
@@ -136,6 +122,7 @@ def classify_category(product_type):
 
 def create_or_update_mapping(sku, product_name, recipe_id, product_type):
     """Cria ou atualiza mapeamento SKU → Receita"""
+    db = get_firestore_client()
     mappings_ref = db.collection('product_mappings')
 
     # Buscar mapeamento existente para este SKU
@@ -150,22 +137,23 @@ def create_or_update_mapping(sku, product_name, recipe_id, product_type):
         'confidence': 1.0,  # Auto-criado = 100%
         'productType': product_type,
         'needsReview': product_type in ['dish', 'beverage_bar'],  # Apenas pratos/bebidas bar precisam revisão
-        'updated_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': server_timestamp(),
         'updated_by': 'auto_migration'
     }
 
     if docs:
         # Atualizar mapeamento existente
-        docs[0].reference.update(mapping_data)
+        get_write_scheduler().update(docs[0].reference, mapping_data)
     else:
         # Criar novo mapeamento
         mapping_id = generate_id()
         mapping_data['id'] = mapping_id
-        mapping_data['createdAt'] = firestore.SERVER_TIMESTAMP
-        mappings_ref.document(mapping_id).set(mapping_data)
+        mapping_data['createdAt'] = server_timestamp()
+        get_write_scheduler().set(mappings_ref.document(mapping_id), mapping_data)
 
 def create_review_alert(recipe_id, recipe_name, sales_count, product_type):
     """Cria alerta para receita que precisa revisão"""
+    db = get_firestore_client()
     if product_type not in ['dish', 'beverage_bar']:
         return  # Não criar alerta para bebidas industriais/serviços
 
@@ -182,11 +170,11 @@ def create_review_alert(recipe_id, recipe_name, sales_count, product_type):
         'message': f'Ficha técnica "{recipe_name}" precisa ser completada. Produto vendeu {sales_count}x em janeiro.',
         'salesVolume': sales_count,
         'status': 'pending',  # pending | resolved
-        'createdAt': firestore.SERVER_TIMESTAMP,
+        'createdAt': server_timestamp(),
         'resolvedAt': None
     }
 
-    db.collection('alerts').document(alert_id).set(alert_data)
+    get_write_scheduler().set(db.collection('alerts').document(alert_id), alert_data)
 
 def main():
     print("="*80)
@@ -240,6 +228,10 @@ def main():
         print(f"   {icon} SKU {sku:4s} | {name:45s} | {sales:3d} vendas | {status}")
         created_count += 1
 
+    writer = get_write_scheduler()
+    writer.flush()
+    print(f"\n   💾 {format_write_stats(writer.stats)}")
+
     # Resumo
     print("\n" + "="*80)
     print("✅ CADASTRO COMPLETO!")
@@ -8,10 +8,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
-from google.cloud import firestore
-from firebase_helper import get_firestore_client
+from firebase_helper import get_firestore_client, server_timestamp
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
 from datetime import datetime
 
 # Load environment variables
@@ -19,16 +17,6 @@ project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
 load_dotenv(env_path)
 
-# Initialize Firebase
-creds_path = project_root / 'firebase-credentials.json'
-cred = credentials.Certificate(str(creds_path))
-
-# Verifica se Firebase já foi inicializado
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = get_firestore_client()
-
 # Nomes corretos fornecidos pelo usuário
 CORRECT_NAMES = {
     "Quinotto": "Quinotto",
@@ -67,6 +55,7 @@ def generate_id():
 
 def find_or_create_recipe(name):
     """Encontra receita existente ou cria nova"""
+    db = get_firestore_client()
     recipes_ref = db.collection('recipes')
 
     # Procurar receita existente (case insensitive)
@@ -88,16 +77,17 @@ def find_or_create_recipe(name):
         'costPerPortion': 0.0,
         'suggestedPrice': 0.0,
         'notes': 'Criado automaticamente com nome oficial',
-        'createdAt': firestore.SERVER_TIMESTAMP,
+        'createdAt': server_timestamp(),
         'createdBy': 'data_cleanup_script'
     }
 
-    recipes_ref.document(recipe_id).set(recipe_data)
+    get_write_scheduler().set(recipes_ref.document(recipe_id), recipe_data)
     print(f"  ✅ Receita criada: {name}")
     return recipe_id, name
 
 def update_or_create_mapping(sku, zig_name, recipe_id, recipe_name):
     """Atualiza ou cria mapeamento SKU → Receita"""
+    db = get_firestore_client()
     mappings_ref = db.collection('product_mappings')
 
     # Procurar mapeamento existente
@@ -110,24 +100,25 @@ def update_or_create_mapping(sku, zig_name, recipe_id, recipe_name):
         'recipe_id': recipe_id,
         'recipe_name': recipe_name,
         'confidence': 1.0,  # Manual = 100%
-        'updated_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': server_timestamp(),
         'updated_by': 'manual_correction'
     }
 
     if docs:
         # Atualizar existente
-        docs[0].reference.update(mapping_data)
+        get_write_scheduler().update(docs[0].reference, mapping_data)
         print(f"  ✓ Mapeamento atualizado: SKU {sku} → {recipe_name}")
     else:
         # Criar novo
         mapping_id = generate_id()
         mapping_data['id'] = mapping_id
-        mapping_data['createdAt'] = firestore.SERVER_TIMESTAMP
-        mappings_ref.document(mapping_id).set(mapping_data)
+        mapping_data['createdAt'] = server_timestamp()
+        get_write_scheduler().set(mappings_ref.document(mapping_id), mapping_data)
         print(f"  ✓ Mapeamento criado: SKU {sku} → {recipe_name}")
 
 def consolidate_patacones_duplicate():
     """Consolida duplicata de Porção de Patacones"""
+    db = get_firestore_client()
     recipes_ref = db.collection('recipes')
 
     # Buscar todas as receitas de Patacones
@@ -146,24 +137,24 @@ def consolidate_patacones_duplicate():
         mappings_ref = db.collection('product_mappings')
         query = mappings_ref.where('recipe_id', '==', doc.id)
         for mapping in query.stream():
-            mapping.reference.update({
+            get_write_scheduler().update(mapping.reference, {
                 'recipe_id': keep_id,
                 'recipe_name': 'Porção de Patacones',
-                'updated_at': firestore.SERVER_TIMESTAMP
+                'updated_at': server_timestamp()
             })
 
         # Arquivar receita duplicada
-        doc.reference.update({
+        get_write_scheduler().update(doc.reference, {
             'archived': True,
             'merged_into': keep_id,
-            'archived_at': firestore.SERVER_TIMESTAMP
+            'archived_at': server_timestamp()
         })
         print(f"  ✓ Duplicata arquivada: {doc.id}")
 
     # Atualizar nome da receita mantida
-    docs[0].reference.update({
+    get_write_scheduler().update(docs[0].reference, {
         'name': 'Porção de Patacones',  # Nome oficial sem (250g)
-        'updated_at': firestore.SERVER_TIMESTAMP
+        'updated_at': server_timestamp()
     })
     print(f"  ✅ Consolidado em: Porção de Patacones")
 
@@ -179,6 +170,10 @@ def main():
         recipe_id, recipe_name = find_or_create_recipe(name)
         recipe_map[name] = (recipe_id, recipe_name)
 
+    # Cada etapa lê o que a anterior gravou: commita antes de seguir
+    writer = get_write_scheduler()
+    writer.flush()
+
     # 2. Atualizar mapeamentos SKU
     print("\n2️⃣ Atualizando mapeamentos SKU → Receita...")
 
@@ -200,14 +195,18 @@ def main():
             # Buscar nome original no Zig
             zig_name = get_zig_name(sku)
             update_or_create_mapping(sku, zig_name, recipe_id, recipe_name)
+    writer.flush()
 
     # 3. Consolidar duplicata
     print("\n3️⃣ Consolidando duplicata de Patacones...")
     consolidate_patacones_duplicate()
+    writer.flush()
 
     # 4. Padronizar nomes de receitas existentes
     print("\n4️⃣ Padronizando nomes de receitas...")
     standardize_recipe_names()
+    writer.flush()
+    print(f"\n💾 {format_write_stats(writer.stats)}")
 
     print("\n" + "="*80)
     print("✅ CORREÇÃO COMPLETA!")
@@ -233,6 +232,7 @@ def get_zig_name(sku):
 
 def standardize_recipe_names():
     """Padroniza nomes de receitas para Title Case"""
+    db = get_firestore_client()
     recipes_ref = db.collection('recipes')
     count = 0
 
@@ -248,9 +248,9 @@ def standardize_recipe_names():
         normalized = ' '.join(original_name.split()).title()
 
         if original_name != normalized and not data.get('archived'):
-            doc.reference.update({
+            get_write_scheduler().update(doc.reference, {
                 'name': normalized,
-                'updated_at': firestore.SERVER_TIMESTAMP
+                'updated_at': server_timestamp()
             })
             print(f"  ✓ Padronizado: {original_name} → {normalized}")
             count += 1
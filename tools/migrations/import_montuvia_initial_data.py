@@ -3,14 +3,22 @@
 Script de Migração: Importar dados do Excel Montuvia para Firebase
 
 Este script:
-1. Lê 236 ingredientes do sheet "CADASTRO DE INSUMOS"
-2. Lê ~100 produtos do sheet "PRECIFICADOS"
-3. Cria mapeamentos automáticos SKU Zig → Recipe ID
-4. Popula Firebase Firestore
-5. Gera relatório de migração
+1. Lê cada planilha uma única vez: "CADASTRO DE INSUMOS" (fornecedores e
+   ~236 ingredientes), "PRECIFICADOS" (~100 produtos) e o relatório do Zig
+2. Monta todos os documentos em memória (fornecedores, ingredientes,
+   receitas e mapeamentos SKU Zig → Recipe ID)
+3. Grava em batches de 500 commitados em paralelo, com progresso
+4. Gera relatório de migração
+
+Pode rodar de novo: IDs são derivados do nome normalizado (ou do SKU) e
+documentos já existentes são reconhecidos pela mesma chave. Na
+reimportação só os campos que vêm da planilha (preço, quantidades,
+fornecedor, preço de venda) são atualizados, e só quando mudaram —
+estoque, mínimo/máximo, fichas técnicas e mapeamentos revisados ficam
+intactos.
 
 Uso:
-    python tools/migrations/import_montuvia_initial_data.py
+    python tools/migrations/import_montuvia_initial_data.py [--dry-run] [--workers 4]
 """
 
 import sys
@@ -18,14 +26,15 @@ import os
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 import json
-import re
+import time
+import hashlib
+import argparse
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
 import pandas as pd
-import firebase_admin
-from firebase_admin import credentials
-from google.cloud import firestore
-from firebase_helper import get_firestore_client
+from firebase_helper import get_firestore_client, get_storage_backend, server_timestamp
+from tools.common.write_scheduler import MAX_BATCH_OPS, get_write_scheduler, format_write_stats
 from fuzzywuzzy import fuzz
 import unicodedata
 
@@ -34,11 +43,9 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 EXCEL_FICHA_TECNICA = os.path.join(PROJECT_ROOT, "MONTUVIA - FICHA TECNICA PRO (1).xlsx")
 EXCEL_RELATORIO_ZIG = os.path.join(PROJECT_ROOT, "Relatório de produtos vendidos - janeiro.xlsx")
 CREDENTIALS_PATH = os.path.join(PROJECT_ROOT, "firebase-credentials.json")
-
-# Initialize Firebase
-cred = credentials.Certificate(CREDENTIALS_PATH)
-firebase_admin.initialize_app(cred)
-db = get_firestore_client()
+SHEET_INSUMOS = "CADASTRO DE INSUMOS"
+SHEET_PRECIFICADOS = "PRECIFICADOS"
+DEFAULT_WORKERS = 4
 
 # Helper functions
 def normalize_string(s: str) -> str:
@@ -49,9 +56,18 @@ def normalize_string(s: str) -> str:
     s = unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
     return s
 
-def generate_id() -> str:
-    """Gera ID único para documentos"""
-    return db.collection('_temp').document().id
+def stable_id(collection: str, key: str) -> str:
+    """ID determinístico (mesma chave → mesmo documento a cada importação)"""
+    return hashlib.sha1(f"{collection}:{key}".encode('utf-8')).hexdigest()[:20]
+
+def to_float(value, default: float = 0.0) -> float:
+    """float() que trata vazio/NaN como default (NaN nunca compara igual)"""
+    if value is None or pd.isna(value):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
 
 def classify_category(nome: str) -> str:
     """Classifica categoria do ingrediente baseado no nome"""
@@ -128,7 +144,7 @@ def find_best_match(search_name: str, candidates: List[Dict[str, str]], threshol
     best_match = None
 
     for candidate in candidates:
-        candidate_normalized = normalize_string(candidate['name'])
+        candidate_normalized = candidate.get('key') or normalize_string(candidate['name'])
         score = fuzz.ratio(search_normalized, candidate_normalized)
 
         if score > best_score:
@@ -146,142 +162,167 @@ def find_best_match(search_name: str, candidates: List[Dict[str, str]], threshol
         "needs_review": needs_review
     }
 
-# Main import functions
-def import_suppliers() -> Dict[str, str]:
-    """Importa fornecedores do Excel e retorna mapeamento nome → ID"""
-    print("\n[1/5] Importando fornecedores...")
-
-    df = pd.read_excel(EXCEL_FICHA_TECNICA, sheet_name="CADASTRO DE INSUMOS")
-    unique_suppliers = df['FORNECEDORES'].dropna().unique()
 
+# Leitura (uma vez por planilha)
+def read_sources() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Lê CADASTRO DE INSUMOS, PRECIFICADOS e o relatório do Zig, cada um uma vez"""
+    with pd.ExcelFile(EXCEL_FICHA_TECNICA) as workbook:
+        insumos = workbook.parse(SHEET_INSUMOS)
+        # PRECIFICADOS: headers estão na linha 2 (zero-indexed)
+        precificados = workbook.parse(SHEET_PRECIFICADOS, header=2)
+    zig = pd.read_excel(EXCEL_RELATORIO_ZIG, usecols=['SKU', 'Nome do Produto'])
+    return insumos, precificados, zig
+
+def load_existing(db, collection: str, key_field: str) -> Dict[str, Tuple[str, Dict]]:
+    """Documentos já gravados por chave (nome normalizado ou SKU) → (id, dados)"""
+    existing = {}
+    for doc in db.collection(collection).stream():
+        data = doc.to_dict()
+        value = data.get(key_field)
+        key = str(value) if key_field == 'sku' else normalize_string(value)
+        if key and key not in existing:
+            existing[key] = (doc.id, data)
+    return existing
+
+# Montagem dos documentos em memória
+class ImportPlan:
+    """Escritas planejadas + contadores por collection (created/updated/unchanged)"""
+
+    def __init__(self):
+        self.writes = []
+        self.counts = {}
+
+    def _count(self, collection: str, outcome: str):
+        counts = self.counts.setdefault(collection, {'created': 0, 'updated': 0, 'unchanged': 0})
+        counts[outcome] += 1
+
+    def upsert(self, collection: str, key: str, existing: Dict, sheet_fields: Dict, new_fields: Dict) -> str:
+        """
+        Planeja um documento e retorna seu ID
+
+        Já existente: grava (merge) só os campos da planilha que mudaram.
+        Novo: ID determinístico com campos da planilha + valores iniciais.
+        """
+        if key in existing:
+            doc_id, current = existing[key]
+            changes = {field: value for field, value in sheet_fields.items() if current.get(field) != value}
+            if changes:
+                self.writes.append((collection, doc_id, changes, True))
+                self._count(collection, 'updated')
+            else:
+                self._count(collection, 'unchanged')
+            return doc_id
+
+        doc_id = stable_id(collection, key)
+        existing[key] = (doc_id, {**sheet_fields, **new_fields})
+        data = {'id': doc_id, **new_fields, **sheet_fields, 'createdAt': server_timestamp()}
+        self.writes.append((collection, doc_id, data, False))
+        self._count(collection, 'created')
+        return doc_id
+
+def build_suppliers(plan: ImportPlan, insumos: pd.DataFrame, existing: Dict) -> Dict[str, str]:
+    """Fornecedores únicos do CADASTRO DE INSUMOS → mapeamento nome → ID"""
+    print("\n[1/5] Montando fornecedores...")
     supplier_map = {}
-    suppliers_created = 0
 
-    for supplier_name in unique_suppliers:
+    for supplier_name in insumos['FORNECEDORES'].dropna().unique():
         supplier_name = str(supplier_name).strip()
-        if not supplier_name or supplier_name == 'nan':
+        key = normalize_string(supplier_name)
+        if not key or key == 'nan':
             continue
 
-        supplier_id = generate_id()
-        supplier_data = {
-            'id': supplier_id,
+        supplier_map[supplier_name] = plan.upsert('suppliers', key, existing, {}, {
             'name': supplier_name,
             'contact': '',  # Preencher manualmente depois
             'deliveryTime': 2,  # Padrão: 2 dias
             'paymentTerms': 'A vista',  # Padrão
-            'createdAt': firestore.SERVER_TIMESTAMP
-        }
-
-        db.collection('suppliers').document(supplier_id).set(supplier_data)
-        supplier_map[supplier_name] = supplier_id
-        suppliers_created += 1
-        print(f"  ✓ {supplier_name}")
+        })
 
-    print(f"✓ {suppliers_created} fornecedores criados")
+    print(f"✓ {len(supplier_map)} fornecedores")
     return supplier_map
 
-def import_ingredients(supplier_map: Dict[str, str]) -> int:
-    """Importa 236 ingredientes do Excel"""
-    print("\n[2/5] Importando ingredientes...")
-
-    df = pd.read_excel(EXCEL_FICHA_TECNICA, sheet_name="CADASTRO DE INSUMOS")
-    ingredients_created = 0
+def build_ingredients(plan: ImportPlan, insumos: pd.DataFrame, supplier_map: Dict[str, str], existing: Dict) -> int:
+    """Ingredientes do CADASTRO DE INSUMOS (mesmo DataFrame dos fornecedores)"""
+    print("\n[2/5] Montando ingredientes...")
+    ingredients = 0
+    seen = set()
 
-    for _, row in df.iterrows():
+    for _, row in insumos.iterrows():
         nome = row.get('NOME INSUMO')
-        if pd.isna(nome):
+        key = normalize_string(nome)
+        if not key or key in seen:
             continue
+        seen.add(key)
 
-        supplier_name = str(row.get('FORNECEDORES', ''))
-        supplier_id = supplier_map.get(supplier_name, '')
-
-        ingredient_id = generate_id()
-        ingredient_data = {
-            'id': ingredient_id,
+        supplier_name = str(row.get('FORNECEDORES', '')).strip()
+        purchase_date = row.get('Data da Compra')
+        plan.upsert('ingredients', key, existing, {
+            'unit': normalize_unit(row.get('Unidade')),
+            'grossQuantity': to_float(row.get('Qtd. BRUTA')),
+            'netQuantity': to_float(row.get('Qtd. LÍQUIDA')),
+            'yieldFactor': to_float(row.get('Fator'), 1.0),
+            'price': to_float(row.get('Preço')),
+            'supplierId': supplier_map.get(supplier_name, ''),
+            'purchaseDate': str(purchase_date)[:10] if not pd.isna(purchase_date) else '',
+        }, {
             'name': str(nome).strip(),
             'category': classify_category(nome),
-            'unit': normalize_unit(row.get('Unidade')),
-            'grossQuantity': float(row.get('Qtd. BRUTA', 0)),
-            'netQuantity': float(row.get('Qtd. LÍQUIDA', 0)),
-            'yieldFactor': float(row.get('Fator', 1.0)),
-            'price': float(row.get('Preço', 0)),
-            'supplierId': supplier_id,
-            'purchaseDate': str(row.get('Data da Compra', ''))[:10] if not pd.isna(row.get('Data da Compra')) else '',
             'currentStock': 0.0,  # Iniciar zerado
             'minStock': estimate_min_stock(row),
             'maxStock': estimate_max_stock(row),
             'storageCenter': 'cozinha',  # Padrão
-            'createdAt': firestore.SERVER_TIMESTAMP
-        }
-
-        db.collection('ingredients').document(ingredient_id).set(ingredient_data)
-        ingredients_created += 1
-
-        if ingredients_created % 50 == 0:
-            print(f"  → {ingredients_created} ingredientes...")
-
-    print(f"✓ {ingredients_created} ingredientes criados")
-    return ingredients_created
+        })
+        ingredients += 1
 
-def import_recipes() -> Tuple[int, List[Dict[str, str]]]:
-    """Importa ~100 produtos/receitas do Excel"""
-    print("\n[3/5] Importando produtos/receitas...")
+    print(f"✓ {ingredients} ingredientes")
+    return ingredients
 
-    # Ler sheet - headers estão na linha 2 (zero-indexed)
-    df = pd.read_excel(EXCEL_FICHA_TECNICA, sheet_name="PRECIFICADOS", header=2)
-    recipes_created = 0
+def build_recipes(plan: ImportPlan, precificados: pd.DataFrame, existing: Dict) -> List[Dict[str, str]]:
+    """Produtos do PRECIFICADOS; retorna [{'id', 'name', 'key'}] para o fuzzy matching"""
+    print("\n[3/5] Montando produtos/receitas...")
     recipes_list = []
+    seen = set()
 
-    for _, row in df.iterrows():
+    for _, row in precificados.iterrows():
         nome = row.get('LISTA DE PRODUTOS')
-
-        # Pular se nome vazio
-        if pd.isna(nome) or str(nome).strip() == '':
+        key = normalize_string(nome)
+        if not key or key in seen:
             continue
+        seen.add(key)
 
-        recipe_id = generate_id()
-        price = extract_price(row.get('PREÇO DE VENDA', 0))
-
-        recipe_data = {
-            'id': recipe_id,
-            'name': str(nome).strip(),
+        name = str(nome).strip()
+        recipe_id = plan.upsert('recipes', key, existing, {
+            'suggestedPrice': extract_price(row.get('PREÇO DE VENDA', 0)),
+        }, {
+            'name': name,
             'category': 'Não categorizado',  # Revisar depois
             'portions': 1,
-            'ingredients': [],  # Vazio (sheets P01-P100 são complexas, fazer manual)
+            'ingredients': [],  # Preenchido por import_technical_sheets.py (abas P01-P100)
             'totalCost': 0.0,
             'costPerPortion': 0.0,
-            'suggestedPrice': price,
             'notes': 'Importado automaticamente. Revisar ficha técnica completa.',
-            'createdAt': firestore.SERVER_TIMESTAMP
-        }
-
-        db.collection('recipes').document(recipe_id).set(recipe_data)
-        recipes_list.append({'id': recipe_id, 'name': recipe_data['name']})
-        recipes_created += 1
-
-    print(f"✓ {recipes_created} receitas criadas")
-    return recipes_created, recipes_list
-
-def import_product_mappings(recipes_list: List[Dict[str, str]]) -> Tuple[int, int]:
-    """Cria mapeamentos SKU Zig → Recipe ID"""
-    print("\n[4/5] Criando mapeamentos SKU → Receita...")
+        })
+        recipes_list.append({'id': recipe_id, 'name': name, 'key': key})
 
-    df_zig = pd.read_excel(EXCEL_RELATORIO_ZIG)
-    unique_products = df_zig[['SKU', 'Nome do Produto']].drop_duplicates()
+    print(f"✓ {len(recipes_list)} receitas")
+    return recipes_list
 
+def build_product_mappings(plan: ImportPlan, zig: pd.DataFrame, recipes_list: List[Dict[str, str]],
+                           existing: Dict) -> Tuple[int, int]:
+    """Mapeamentos SKU Zig → Recipe ID (só SKUs novos; os existentes já podem ter sido revisados)"""
+    print("\n[4/5] Montando mapeamentos SKU → Receita...")
     mappings_high = 0
     mappings_low = 0
 
-    for _, zig_product in unique_products.iterrows():
+    for _, zig_product in zig.drop_duplicates().iterrows():
         sku = str(zig_product['SKU'])
-        product_name = str(zig_product['Nome do Produto'])
+        if sku in existing:
+            plan.upsert('product_mappings', sku, existing, {}, {})
+            continue
 
-        # Fuzzy match com receitas
+        product_name = str(zig_product['Nome do Produto'])
         best_match = find_best_match(product_name, recipes_list)
-
-        mapping_id = generate_id()
-        mapping_data = {
-            'id': mapping_id,
+        plan.upsert('product_mappings', sku, existing, {}, {
             'sku': sku,
             'product_name_zig': product_name,
             'recipe_id': best_match['recipe_id'],
@@ -289,21 +330,82 @@ def import_product_mappings(recipes_list: List[Dict[str, str]]) -> Tuple[int, in
             'confidence': best_match['confidence'],
             'match_score': best_match['score'],
             'needs_review': best_match['needs_review'],
-            'last_updated': firestore.SERVER_TIMESTAMP
-        }
-
-        db.collection('product_mappings').document(mapping_id).set(mapping_data)
+            'last_updated': server_timestamp()
+        })
 
         if best_match['needs_review']:
             mappings_low += 1
         else:
             mappings_high += 1
 
-    print(f"✓ {mappings_high} mapeamentos alta confiança (>80%)")
-    print(f"⚠ {mappings_low} mapeamentos precisam revisão (<80%)")
-
+    print(f"✓ {mappings_high} mapeamentos novos alta confiança (>80%)")
+    print(f"⚠ {mappings_low} mapeamentos novos precisam revisão (<80%)")
     return mappings_high, mappings_low
 
+# Gravação
+def commit_plan(db, writes: List[Tuple], workers: int = DEFAULT_WORKERS) -> None:
+    """Commita as escritas em batches de até 500, em paralelo, com progresso"""
+    if not writes:
+        print("  → Nada a gravar (banco já está igual à planilha)")
+        return
+
+    writer = get_write_scheduler()
+    batches = [writes[i:i + MAX_BATCH_OPS] for i in range(0, len(writes), MAX_BATCH_OPS)]
+
+    def commit_batch(chunk):
+        batch = db.batch()
+        for collection, doc_id, data, merge in chunk:
+            batch.set(db.collection(collection).document(doc_id), data, merge=merge)
+        writer.commit(batch, len(chunk))
+        return len(chunk)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(commit_batch, chunk) for chunk in batches]
+        for done, future in enumerate(as_completed(futures), 1):
+            written += future.result()
+            print(f"  → {written}/{len(writes)} documentos ({done}/{len(batches)} batches)")
+
+def run_import(dry_run: bool = False, workers: int = DEFAULT_WORKERS) -> Dict:
+    """Lê as planilhas, monta o plano e grava; retorna as estatísticas para o relatório"""
+    started = time.perf_counter()
+    db = get_firestore_client()
+
+    print("\n📖 Lendo planilhas...")
+    insumos, precificados, zig = read_sources()
+    existing = {
+        'suppliers': load_existing(db, 'suppliers', 'name'),
+        'ingredients': load_existing(db, 'ingredients', 'name'),
+        'recipes': load_existing(db, 'recipes', 'name'),
+        'product_mappings': load_existing(db, 'product_mappings', 'sku'),
+    }
+
+    plan = ImportPlan()
+    supplier_map = build_suppliers(plan, insumos, existing['suppliers'])
+    build_ingredients(plan, insumos, supplier_map, existing['ingredients'])
+    recipes_list = build_recipes(plan, precificados, existing['recipes'])
+    mappings_high, mappings_low = build_product_mappings(plan, zig, recipes_list, existing['product_mappings'])
+
+    print(f"\n💾 Gravando {len(plan.writes)} documentos...")
+    if dry_run:
+        print("  → --dry-run: nada foi gravado")
+    else:
+        commit_plan(db, plan.writes, workers)
+
+    def counts(collection):
+        return plan.counts.get(collection, {'created': 0, 'updated': 0, 'unchanged': 0})
+
+    return {
+        'suppliers': counts('suppliers')['created'],
+        'ingredients': counts('ingredients')['created'],
+        'recipes': counts('recipes')['created'],
+        'mappings_high': mappings_high,
+        'mappings_low': mappings_low,
+        'collections': {c: counts(c) for c in existing},
+        'dry_run': dry_run,
+        'elapsed_s': round(time.perf_counter() - started, 2)
+    }
+
 def generate_report(stats: Dict) -> None:
     """Gera relatório de migração em JSON"""
     print("\n[5/5] Gerando relatório...")
@@ -316,6 +418,10 @@ def generate_report(stats: Dict) -> None:
         'mappings_high_confidence': stats['mappings_high'],
         'mappings_need_review': stats['mappings_low'],
         'total_mappings': stats['mappings_high'] + stats['mappings_low'],
+        'collections': stats['collections'],
+        'dry_run': stats['dry_run'],
+        'elapsed_s': stats['elapsed_s'],
+        'writes': get_write_scheduler().stats,
         'success_rate': round(
             (stats['mappings_high'] / (stats['mappings_high'] + stats['mappings_low'])) * 100, 1
         ) if (stats['mappings_high'] + stats['mappings_low']) > 0 else 0
@@ -330,9 +436,13 @@ def generate_report(stats: Dict) -> None:
     print("📊 RESUMO DA MIGRAÇÃO")
     print("=" * 80)
     for key, value in report.items():
-        if key != 'migration_date':
+        if key not in ('migration_date', 'writes', 'collections'):
             label = key.replace('_', ' ').title()
             print(f"  {label:.<50} {value}")
+    for collection, counts in report['collections'].items():
+        print(f"  {collection:.<50} +{counts['created']} novos, {counts['updated']} atualizados, "
+              f"{counts['unchanged']} iguais")
+    print(f"  💾 {format_write_stats(report['writes'])}")
     print("=" * 80)
     print(f"\n✅ Taxa de sucesso: {report['success_rate']}%")
     print(f"⚠️  Mapeamentos para revisar: {stats['mappings_low']}")
@@ -340,6 +450,11 @@ def generate_report(stats: Dict) -> None:
 
 # Main execution
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Importa dados iniciais do Excel Montuvia')
+    parser.add_argument('--dry-run', action='store_true', help='Monta os documentos e mostra o plano, sem gravar')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Batches commitados em paralelo')
+    args = parser.parse_args()
+
     print("\n" + "=" * 80)
     print("🚀 MIGRAÇÃO: Dados Montuvia → Firebase")
     print("=" * 80)
@@ -353,27 +468,13 @@ if __name__ == '__main__':
         print(f"❌ Arquivo não encontrado: {EXCEL_RELATORIO_ZIG}")
         sys.exit(1)
 
-    if not os.path.exists(CREDENTIALS_PATH):
+    if get_storage_backend() == 'firestore' and not os.path.exists(CREDENTIALS_PATH):
         print(f"❌ Credenciais Firebase não encontradas: {CREDENTIALS_PATH}")
         print("Execute: Siga SETUP_FIREBASE.md para gerar credenciais")
         sys.exit(1)
 
     try:
-        # Executar importações
-        supplier_map = import_suppliers()
-        ingredients_count = import_ingredients(supplier_map)
-        recipes_count, recipes_list = import_recipes()
-        mappings_high, mappings_low = import_product_mappings(recipes_list)
-
-        # Gerar relatório
-        generate_report({
-            'suppliers': len(supplier_map),
-            'ingredients': ingredients_count,
-            'recipes': recipes_count,
-            'mappings_high': mappings_high,
-            'mappings_low': mappings_low
-        })
-
+        generate_report(run_import(args.dry_run, args.workers))
         print("✅ Migração concluída com sucesso!\n")
 
     except Exception as e:
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Script de Migração: fichas técnicas P01–P100 → ingredientes das receitas
+
+import_montuvia_initial_data.py cria as receitas com ingredients vazio; as
+abas por produto (P01, P02, ... P100) da FICHA TÉCNICA têm as linhas de
+insumo de cada prato. Este script:
+
+1. Parseia as abas em paralelo (ProcessPoolExecutor, cada worker abre a
+   planilha uma vez e lê um lote de abas). O layout é detectado pelo
+   cabeçalho: linha com a coluna de insumo/ingrediente, quantidade
+   (líquida, se houver), unidade e custo; nome do produto e rendimento
+   vêm das linhas acima do cabeçalho
+2. Resolve nomes de produto → receita e de insumo → ingrediente por um
+   índice (chave normalizada exata, senão trigramas com Jaccard ≥ 0.6)
+3. Converte g↔kg e ml↔l para a unidade do ingrediente
+4. Grava ingredients/portions das receitas em batch (WriteScheduler) e
+   recalcula custos com recipe_costs
+
+Receitas que já têm ingredientes não são tocadas (use --overwrite).
+Linhas não resolvidas vão para o relatório (technical_sheets_report.json).
+
+Uso:
+    python tools/migrations/import_technical_sheets.py [--sheets P01,P02] [--workers 4]
+        [--overwrite] [--dry-run] [--no-costs]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client, server_timestamp
+from tools.common.write_scheduler import get_write_scheduler, format_write_stats
+from tools.analysis.find_near_duplicates import normalize_key, shingles, jaccard
+from tools.migrations.import_montuvia_initial_data import (
+    EXCEL_FICHA_TECNICA, normalize_string, normalize_unit, extract_price, to_float
+)
+
+SHEET_PATTERN = re.compile(r'^P\s*\d{1,3}$', re.IGNORECASE)
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+MATCH_THRESHOLD = 0.6
+REPORT_PATH = PROJECT_ROOT / 'tools' / 'migrations' / 'technical_sheets_report.json'
+
+UNIT_FACTORS = {
+    ('g', 'kg'): 0.001, ('kg', 'g'): 1000.0,
+    ('ml', 'l'): 0.001, ('l', 'ml'): 1000.0,
+}
+STOP_LABELS = ('total', 'custo total', 'preco', 'cmv', 'margem', 'modo de preparo')
+
+# ==================== PARSING (workers) ====================
+
+def _text(value):
+    return '' if value is None or pd.isna(value) else str(value).strip()
+
+def detect_columns(header):
+    """
+    Índices das colunas pelo texto do cabeçalho
+
+    Returns:
+        dict | None: {'name', 'qty', 'gross', 'unit', 'cost'} (None se não achar insumo/quantidade)
+    """
+    columns = {}
+    for index, cell in enumerate(header):
+        label = normalize_string(cell)
+        if not label:
+            continue
+        if 'name' not in columns and ('insumo' in label or 'ingrediente' in label):
+            columns['name'] = index
+        elif 'brut' in label:
+            columns['gross'] = index
+        elif 'liquid' in label:
+            columns['qty'] = index
+        elif 'qty' not in columns and re.match(r'(qtd|quant|peso)', label):
+            columns['qty'] = index
+        elif 'unit' not in columns and (label.startswith('unid') or label in ('un', 'und', 'medida')):
+            columns['unit'] = index
+        elif 'custo' in label or 'valor' in label:
+            columns['cost'] = index  # última coluna de custo (total da linha)
+    if 'qty' not in columns and 'gross' in columns:
+        columns['qty'] = columns['gross']
+    return columns if 'name' in columns and 'qty' in columns else None
+
+def parse_title(rows):
+    """Nome do produto e rendimento nas linhas acima do cabeçalho"""
+    title, portions, fallback = None, None, None
+    for row in rows:
+        cells = [c for c in row if _text(c)]
+        for position, cell in enumerate(cells):
+            label = normalize_string(cell).rstrip(':').strip()
+            following = cells[position + 1] if position + 1 < len(cells) else None
+            if label.startswith(('produto', 'nome', 'prato', 'receita')) and following is not None and title is None:
+                title = _text(following)
+            elif label.startswith(('rendimento', 'porc')) and following is not None and portions is None:
+                number = re.search(r'\d+(?:[.,]\d+)?', _text(following))
+                portions = float(number.group().replace(',', '.')) if number else None
+            elif fallback is None and isinstance(cell, str) and len(label) > 3 and 'ficha' not in label:
+                fallback = _text(cell)
+    return title or fallback, portions
+
+def parse_sheet(sheet_name, frame):
+    """
+    Linhas de insumo de uma aba
+
+    Returns:
+        dict: {'sheet', 'title', 'portions', 'lines': [{'name', 'quantity', 'gross', 'unit', 'cost'}], 'error'}
+    """
+    rows = frame.values.tolist()
+    for header_index, row in enumerate(rows):
+        columns = detect_columns(row)
+        if columns:
+            break
+    else:
+        return {'sheet': sheet_name, 'title': None, 'portions': None, 'lines': [],
+                'error': 'cabeçalho de insumos não encontrado'}
+
+    title, portions = parse_title(rows[:header_index])
+    lines = []
+    for row in rows[header_index + 1:]:
+        name = _text(row[columns['name']])
+        if not name:
+            continue
+        if normalize_string(name).startswith(STOP_LABELS):
+            break
+        quantity = to_float(row[columns['qty']])
+        if quantity <= 0:
+            continue
+        lines.append({
+            'name': name,
+            'quantity': quantity,
+            'gross': to_float(row[columns['gross']]) if 'gross' in columns else None,
+            'unit': normalize_unit(row[columns['unit']]) if 'unit' in columns else None,
+            'cost': extract_price(row[columns['cost']]) if 'cost' in columns else None
+        })
+    return {'sheet': sheet_name, 'title': title, 'portions': portions, 'lines': lines, 'error': None}
+
+def parse_sheets(path, sheet_names):
+    """Worker: abre a planilha uma vez e parseia um lote de abas"""
+    with pd.ExcelFile(path) as workbook:
+        return [parse_sheet(name, workbook.parse(name, header=None)) for name in sheet_names]
+
+def list_technical_sheets(path, only=None):
+    """Abas P01–P100 da planilha, na ordem numérica"""
+    with pd.ExcelFile(path) as workbook:
+        names = [name for name in workbook.sheet_names if SHEET_PATTERN.match(name.strip())]
+    if only:
+        wanted = {name.strip().upper() for name in only}
+        names = [name for name in names if name.strip().upper() in wanted]
+    return sorted(names, key=lambda name: int(re.sub(r'\D', '', name)))
+
+def parse_workbook(path, sheet_names, workers=DEFAULT_WORKERS):
+    """Distribui as abas entre os workers (um lote contíguo por worker)"""
+    if workers <= 1 or len(sheet_names) <= 1:
+        return parse_sheets(path, sheet_names)
+    size = -(-len(sheet_names) // workers)
+    chunks = [sheet_names[i:i + size] for i in range(0, len(sheet_names), size)]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        results = pool.map(parse_sheets, [path] * len(chunks), chunks)
+        return [sheet for chunk in results for sheet in chunk]
+
+# ==================== RESOLUÇÃO DE NOMES ====================
+
+class NameIndex:
+    """Nome → ID por chave normalizada exata, senão pelo melhor Jaccard de trigramas"""
+
+    def __init__(self, items, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.exact = {}
+        self.shingles = {}
+        self.by_shingle = defaultdict(set)
+        for item_id, name in items:
+            key = normalize_key(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, item_id)
+            self.shingles[item_id] = grams = shingles(key)
+            for gram in grams:
+                self.by_shingle[gram].add(item_id)
+
+    def resolve(self, name):
+        """
+        Returns:
+            tuple: (id | None, score)
+        """
+        key = normalize_key(name)
+        if key in self.exact:
+            return self.exact[key], 1.0
+        grams = shingles(key)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.by_shingle.get(gram, set())
+        best_id, best_score = None, 0.0
+        for item_id in candidates:
+            score = jaccard(grams, self.shingles[item_id])
+            if score > best_score:
+                best_id, best_score = item_id, score
+        return (best_id, round(best_score, 3)) if best_score >= self.threshold else (None, round(best_score, 3))
+
+def convert_quantity(quantity, from_unit, to_unit):
+    """Converte entre g/kg e ml/l; (quantidade, convertido?) — outras unidades ficam como estão"""
+    if not from_unit or not to_unit or from_unit == to_unit:
+        return quantity, True
+    factor = UNIT_FACTORS.get((from_unit, to_unit))
+    if factor is None:
+        return quantity, False
+    return quantity * factor, True
+
+def build_recipe_lines(sheet, ingredients, ingredient_index):
+    """
+    Linhas no formato das receitas (ingredientId/quantity, + id/name/unit do backend)
+
+    Returns:
+        tuple: (linhas, não resolvidas, unidades incompatíveis)
+    """
+    lines, unresolved, unit_mismatches = [], [], []
+    merged = {}
+    for line in sheet['lines']:
+        ing_id, score = ingredient_index.resolve(line['name'])
+        if ing_id is None:
+            unresolved.append({'name': line['name'], 'bestScore': score})
+            continue
+        ingredient = ingredients[ing_id]
+        unit = normalize_unit(ingredient.get('unit')) if ingredient.get('unit') else line['unit']
+        quantity, converted = convert_quantity(line['quantity'], line['unit'], unit)
+        if not converted:
+            unit_mismatches.append({'name': line['name'], 'sheetUnit': line['unit'], 'ingredientUnit': unit})
+        if ing_id in merged:
+            merged[ing_id]['quantity'] += quantity  # mesmo insumo em duas linhas
+            continue
+        merged[ing_id] = {
+            'ingredientId': ing_id,
+            'id': ing_id,
+            'name': ingredient.get('name', line['name']),
+            'quantity': quantity,
+            'unit': unit or ''
+        }
+        lines.append(merged[ing_id])
+    for line in lines:
+        line['quantity'] = round(line['quantity'], 6)
+    return lines, unresolved, unit_mismatches
+
+# ==================== IMPORTAÇÃO ====================
+
+def run_import(sheet_names=None, workers=DEFAULT_WORKERS, overwrite=False, dry_run=False, path=EXCEL_FICHA_TECNICA):
+    """
+    Parseia as abas, resolve nomes e grava os ingredientes das receitas
+
+    Returns:
+        dict: Resumo + detalhes por aba
+    """
+    started = time.perf_counter()
+    sheet_names = list_technical_sheets(path, sheet_names)
+    print(f"📖 {len(sheet_names)} abas de ficha técnica, {workers} workers...", file=sys.stderr)
+    sheets = parse_workbook(path, sheet_names, workers)
+    parse_ms = (time.perf_counter() - started) * 1000
+
+    db = get_firestore_client()
+    ingredients = {doc.id: doc.to_dict() for doc in db.collection('ingredients').stream()}
+    recipes = {doc.id: doc.to_dict() for doc in db.collection('recipes').stream()}
+    ingredient_index = NameIndex((ing_id, data.get('name', '')) for ing_id, data in ingredients.items())
+    recipe_index = NameIndex(
+        (recipe_id, data.get('name', '')) for recipe_id, data in recipes.items() if not data.get('archived')
+    )
+
+    writer = get_write_scheduler()
+    recipes_ref = db.collection('recipes')
+    details = []
+    counts = defaultdict(int)
+    claimed = {}
+
+    for sheet in sheets:
+        detail = {'sheet': sheet['sheet'], 'title': sheet['title'], 'lines': len(sheet['lines'])}
+        details.append(detail)
+        if sheet['error'] or not sheet['lines']:
+            detail['status'] = 'sem_linhas'
+            detail['error'] = sheet['error']
+            counts['empty'] += 1
+            continue
+
+        recipe_id, score = recipe_index.resolve(sheet['title'] or '')
+        detail.update({'recipeId': recipe_id, 'recipeScore': score})
+        if recipe_id is None:
+            detail['status'] = 'receita_nao_encontrada'
+            counts['recipeNotFound'] += 1
+            continue
+        if recipe_id in claimed:
+            detail['status'] = f"receita_ja_usada_por_{claimed[recipe_id]}"
+            counts['duplicateRecipe'] += 1
+            continue
+        claimed[recipe_id] = sheet['sheet']
+
+        lines, unresolved, unit_mismatches = build_recipe_lines(sheet, ingredients, ingredient_index)
+        detail.update({'recipeName': recipes[recipe_id].get('name'), 'resolved': len(lines),
+                       'unresolved': unresolved, 'unitMismatches': unit_mismatches})
+        counts['linesResolved'] += len(lines)
+        counts['linesUnresolved'] += len(unresolved)
+
+        if recipes[recipe_id].get('ingredients') and not overwrite:
+            detail['status'] = 'ja_preenchida'
+            counts['skippedFilled'] += 1
+            continue
+        if not lines:
+            detail['status'] = 'nenhum_insumo_resolvido'
+            counts['noLines'] += 1
+            continue
+
+        update = {'ingredients': lines, 'technical_sheet': sheet['sheet'], 'updated_at': server_timestamp()}
+        if sheet['portions']:
+            update['portions'] = sheet['portions']
+        if unresolved:
+            update['needs_completion'] = True
+        detail['status'] = 'importada'
+        counts['recipesUpdated'] += 1
+        if not dry_run:
+            writer.update(recipes_ref.document(recipe_id), update)
+
+    if not dry_run:
+        writer.flush()
+
+    return {
+        'sheets': len(sheets),
+        'parseMs': round(parse_ms, 1),
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1),
+        'dryRun': dry_run,
+        'recipesUpdated': counts['recipesUpdated'],
+        'skippedFilled': counts['skippedFilled'],
+        'recipeNotFound': counts['recipeNotFound'],
+        'duplicateRecipe': counts['duplicateRecipe'],
+        'emptySheets': counts['empty'],
+        'linesResolved': counts['linesResolved'],
+        'linesUnresolved': counts['linesUnresolved'],
+        'writeScheduler': None if dry_run else writer.stats,
+        'details': details
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa as fichas técnicas P01–P100 para as receitas')
+    parser.add_argument('--sheets', help='Abas a importar (ex: P01,P02); padrão: todas')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Processos de parsing')
+    parser.add_argument('--overwrite', action='store_true', help='Substitui ingredientes de receitas já preenchidas')
+    parser.add_argument('--dry-run', action='store_true', help='Só parseia e resolve, sem gravar')
+    parser.add_argument('--no-costs', action='store_true', help='Não recalcula custos das receitas ao final')
+    args = parser.parse_args()
+
+    if not os.path.exists(EXCEL_FICHA_TECNICA):
+        print(f"❌ Arquivo não encontrado: {EXCEL_FICHA_TECNICA}", file=sys.stderr)
+        sys.exit(1)
+
+    sheets = [s.strip() for s in args.sheets.split(',') if s.strip()] if args.sheets else None
+    result = run_import(sheets, args.workers, args.overwrite, args.dry_run)
+
+    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"✓ {result['sheets']} abas em {result['elapsedMs']:.0f}ms (parsing {result['parseMs']:.0f}ms): "
+          f"{result['recipesUpdated']} receitas preenchidas, {result['linesResolved']} insumos resolvidos",
+          file=sys.stderr)
+    if result['linesUnresolved']:
+        print(f"⚠️  {result['linesUnresolved']} linhas sem ingrediente correspondente", file=sys.stderr)
+    if result['recipeNotFound'] or result['emptySheets']:
+        print(f"⚠️  {result['recipeNotFound']} abas sem receita, {result['emptySheets']} sem linhas de insumo",
+              file=sys.stderr)
+    if result['skippedFilled']:
+        print(f"ℹ️  {result['skippedFilled']} receitas já preenchidas (use --overwrite)", file=sys.stderr)
+    if result['writeScheduler']:
+        print(f"💾 {format_write_stats(result['writeScheduler'])}", file=sys.stderr)
+    print(f"📄 Relatório: {REPORT_PATH}", file=sys.stderr)
+
+    if result['recipesUpdated'] and not args.dry_run and not args.no_costs:
+        from tools.calculations.recipe_costs import run_costs
+
+        costs = run_costs(ingredient_ids=None)
+        result['costs'] = {key: costs[key] for key in ('mode', 'recipesRecomputed', 'recipesUpdated')}
+        print(f"💰 Custos: {costs['recipesUpdated']} receitas com custo novo ({costs['mode']})", file=sys.stderr)
+
+    summary = {key: value for key, value in result.items() if key != 'details'}
+    print(json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Réplica local (SQLite) das collections do Firestore para análises
+
+Cada collection vira uma tabela com 'id' como chave, uma coluna por campo
+de primeiro nível (criada quando o campo aparece) e '_data' com o
+documento completo em JSON. Consultas agregadas rodam em SQL local em
+vez de varrer a collection no Firestore.
+
+Sync incremental: para cada campo de timestamp (updated_at, updatedAt,
+lastUpdated, ... e os específicos da collection, como last_stock_update
+em ingredients) guarda a maior data vista e busca só documentos com
+valor >= a ela. A primeira sincronização (ou --full) lê tudo e remove da
+réplica documentos que não existem mais. Escritas que não tocam nenhum
+desses campos e documentos apagados só aparecem no sync completo, por
+isso ele é refeito quando o último tem mais de LOCAL_REPLICA_FULL_SYNC_HOURS
+(padrão 24h).
+
+Uso:
+    python tools/replica/local_replica.py sync [--collections vendas,recipes] [--full]
+    python tools/replica/local_replica.py query "SELECT sku, confidence FROM product_mappings"
+    python tools/replica/local_replica.py status
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from firebase_helper import get_firestore_client
+from tools.common.ndjson_io import encode_value, make_decoder
+
+REPLICA_PATH = Path(os.getenv('LOCAL_REPLICA_PATH', PROJECT_ROOT / '.tmp' / 'firestore_replica.sqlite'))
+
+DEFAULT_COLLECTIONS = ['vendas', 'ingredients', 'recipes', 'product_mappings', 'stock_movements']
+
+# Campos de "última alteração" usados pelo backend (snake_case) e pelos tools (camelCase)
+TIMESTAMP_FIELDS = ('updated_at', 'updatedAt', 'lastUpdated', 'last_updated', 'created_at', 'createdAt')
+
+# Campos extras por collection: alterações que não passam pelos campos acima
+# (ex: ajuste/entrada de estoque no backend só grava last_stock_update)
+COLLECTION_TIMESTAMP_FIELDS = {
+    'ingredients': ('last_stock_update', 'average_cost_updated_at'),
+    'draft_orders': ('last_modified',),
+}
+
+FULL_SYNC_MAX_AGE = timedelta(hours=float(os.getenv('LOCAL_REPLICA_FULL_SYNC_HOURS', '24')))
+
+PAGE_SIZE = 1000
+
+def quote(identifier):
+    """Identificador SQL entre aspas (campos do Firestore aceitam qualquer caractere)"""
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def open_replica(path=None):
+    """
+    Abre (e cria, se preciso) o banco da réplica
+
+    Returns:
+        sqlite3.Connection
+    """
+    path = Path(path or REPLICA_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS _collections (
+            collection TEXT PRIMARY KEY,
+            documents INTEGER DEFAULT 0,
+            last_sync TEXT,
+            last_full_sync TEXT
+        );
+        CREATE TABLE IF NOT EXISTS _watermarks (
+            collection TEXT,
+            field TEXT,
+            watermark TEXT,
+            PRIMARY KEY (collection, field)
+        );
+    """)
+    return conn
+
+def to_column(value):
+    """Valor do Firestore → valor de coluna SQLite"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return json.dumps(value, ensure_ascii=False, default=encode_value)
+
+def ensure_table(conn, collection, fields):
+    """Cria a tabela da collection e adiciona colunas para campos novos"""
+    table = quote(collection)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, _data TEXT)")
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for field in fields:
+        if field not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {quote(field)}")
+            existing.add(field)
+
+def upsert_documents(conn, collection, docs):
+    """
+    Grava (id, data) na tabela da collection
+
+    Returns:
+        int: Documentos gravados
+    """
+    if not docs:
+        return 0
+
+    fields = sorted({key for _, data in docs for key in data if key not in ('id', '_data')})
+    ensure_table(conn, collection, fields)
+
+    columns = ['id', '_data', *fields]
+    sql = (
+        f"INSERT OR REPLACE INTO {quote(collection)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    rows = [
+        (
+            doc_id,
+            json.dumps(data, ensure_ascii=False, default=encode_value),
+            *(to_column(data.get(field)) for field in fields)
+        )
+        for doc_id, data in docs
+    ]
+    conn.executemany(sql, rows)
+    return len(rows)
+
+def get_watermarks(conn, collection):
+    rows = conn.execute("SELECT field, watermark FROM _watermarks WHERE collection = ?", (collection,))
+    return {row['field']: datetime.fromisoformat(row['watermark']) for row in rows}
+
+def timestamp_fields(collection):
+    """Campos de timestamp usados como watermark nesta collection"""
+    return TIMESTAMP_FIELDS + COLLECTION_TIMESTAMP_FIELDS.get(collection, ())
+
+def advance_watermarks(watermarks, data, fields=TIMESTAMP_FIELDS):
+    for field in fields:
+        value = data.get(field)
+        if isinstance(value, datetime) and (field not in watermarks or value > watermarks[field]):
+            watermarks[field] = value
+
+def save_watermarks(conn, collection, watermarks):
+    conn.executemany(
+        "INSERT OR REPLACE INTO _watermarks (collection, field, watermark) VALUES (?, ?, ?)",
+        [(collection, field, value.isoformat()) for field, value in watermarks.items()]
+    )
+
+def stream_pages(query_factory):
+    """Pagina uma query ordenada (query_factory(cursor) → query) em páginas de PAGE_SIZE"""
+    cursor = None
+    while True:
+        page = list(query_factory(cursor).limit(PAGE_SIZE).stream())
+        yield page
+        if len(page) < PAGE_SIZE:
+            return
+        cursor = page[-1]
+
+def sync_collection(db, conn, collection, full=False):
+    """
+    Sincroniza uma collection com a réplica
+
+    Returns:
+        dict: {'collection', 'mode', 'upserted', 'deleted', 'elapsedMs'}
+    """
+    started = time.perf_counter()
+    state = conn.execute("SELECT last_full_sync FROM _collections WHERE collection = ?", (collection,)).fetchone()
+    fields = timestamp_fields(collection)
+    watermarks = {}
+    if not full and state and state['last_full_sync']:
+        full_sync_age = datetime.now(timezone.utc) - datetime.fromisoformat(state['last_full_sync'])
+        if full_sync_age < FULL_SYNC_MAX_AGE:
+            watermarks = get_watermarks(conn, collection)
+    # Sem campo de timestamp (ou sync completo vencido) não há como filtrar: relê a collection inteira
+    mode = 'incremental' if watermarks else 'full'
+
+    collection_ref = db.collection(collection)
+    upserted = 0
+    deleted = 0
+    seen_ids = set()
+
+    if mode == 'full':
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {quote(collection)} (id TEXT PRIMARY KEY, _data TEXT)")
+        pages = stream_pages(
+            lambda cursor: collection_ref.order_by('__name__') if cursor is None
+            else collection_ref.order_by('__name__').start_after(cursor)
+        )
+        for page in pages:
+            docs = [(doc.id, doc.to_dict()) for doc in page]
+            for doc_id, data in docs:
+                seen_ids.add(doc_id)
+                advance_watermarks(watermarks, data, fields)
+            upserted += upsert_documents(conn, collection, docs)
+
+        stale = [
+            row['id'] for row in conn.execute(f"SELECT id FROM {quote(collection)}")
+            if row['id'] not in seen_ids
+        ]
+        conn.executemany(f"DELETE FROM {quote(collection)} WHERE id = ?", [(doc_id,) for doc_id in stale])
+        deleted = len(stale)
+    else:
+        start_marks = dict(watermarks)
+        for field, since in start_marks.items():
+            pages = stream_pages(
+                lambda cursor, field=field, since=since: (
+                    collection_ref.where(field, '>=', since).order_by(field) if cursor is None
+                    else collection_ref.where(field, '>=', since).order_by(field).start_after(cursor)
+                )
+            )
+            for page in pages:
+                docs = [(doc.id, doc.to_dict()) for doc in page if doc.id not in seen_ids]
+                for doc_id, data in docs:
+                    seen_ids.add(doc_id)
+                    advance_watermarks(watermarks, data, fields)
+                upserted += upsert_documents(conn, collection, docs)
+
+    now = datetime.now(timezone.utc).isoformat()
+    count = conn.execute(f"SELECT COUNT(*) FROM {quote(collection)}").fetchone()[0]
+    conn.execute(
+        """
+        INSERT INTO _collections (collection, documents, last_sync, last_full_sync) VALUES (?, ?, ?, ?)
+        ON CONFLICT(collection) DO UPDATE SET
+            documents = excluded.documents,
+            last_sync = excluded.last_sync,
+            last_full_sync = COALESCE(excluded.last_full_sync, _collections.last_full_sync)
+        """,
+        (collection, count, now, now if mode == 'full' else None)
+    )
+    save_watermarks(conn, collection, watermarks)
+    conn.commit()
+
+    return {
+        'collection': collection,
+        'mode': mode,
+        'upserted': upserted,
+        'deleted': deleted,
+        'documents': count,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def sync_replica(collections=None, full=False, path=None):
+    """
+    Sincroniza as collections com a réplica local
+
+    Returns:
+        dict: {'path', 'collections': [...], 'elapsedMs'}
+    """
+    started = time.perf_counter()
+    db = get_firestore_client()
+    conn = open_replica(path)
+    try:
+        results = [sync_collection(db, conn, name, full) for name in (collections or DEFAULT_COLLECTIONS)]
+    finally:
+        conn.close()
+
+    return {
+        'path': str(path or REPLICA_PATH),
+        'collections': results,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def query(sql, params=(), path=None):
+    """
+    Executa SQL na réplica
+
+    Returns:
+        list: Linhas como dicts
+    """
+    conn = open_replica(path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def load_documents(collection, path=None):
+    """
+    Documentos completos de uma collection (mesmo formato de doc.to_dict())
+
+    Returns:
+        list: [(doc_id, data)]
+    """
+    decode = make_decoder()
+    conn = open_replica(path)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (collection,)
+        ).fetchone()
+        if not exists:
+            raise LookupError(
+                f"Collection '{collection}' não está na réplica. "
+                f"Rode: python tools/cli.py replica sync --collections {collection}"
+            )
+        return [
+            (row['id'], json.loads(row['_data'], object_hook=decode))
+            for row in conn.execute(f"SELECT id, _data FROM {quote(collection)}")
+        ]
+    finally:
+        conn.close()
+
+def replica_status(path=None):
+    conn = open_replica(path)
+    try:
+        return [dict(row) for row in conn.execute("SELECT * FROM _collections ORDER BY collection")]
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Réplica local (SQLite) do Firestore')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sync = subparsers.add_parser('sync', help='Sincroniza collections (incremental)')
+    sync.add_argument('--collections', help='Lista separada por vírgula')
+    sync.add_argument('--full', action='store_true', help='Relê tudo e remove documentos apagados')
+
+    run = subparsers.add_parser('query', help='Executa SQL na réplica')
+    run.add_argument('sql')
+
+    subparsers.add_parser('status', help='Documentos e data de sync por collection')
+
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        collections = [c.strip() for c in args.collections.split(',') if c.strip()] if args.collections else None
+        result = sync_replica(collections, full=args.full)
+        for item in result['collections']:
+            print(
+                f"✓ {item['collection']}: {item['upserted']} atualizados, {item['deleted']} removidos "
+                f"({item['mode']}, {item['elapsedMs']:.0f}ms)",
+                file=sys.stderr
+            )
+    elif args.command == 'query':
+        result = query(args.sql)
+    else:
+        result = replica_status()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
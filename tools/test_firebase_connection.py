@@ -9,10 +9,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, storage
 from google.cloud import firestore
-from firebase_helper import get_firestore_client
+from firebase_helper import init_firebase_app, get_firestore_client, get_storage_bucket, get_client_stats
 
 # Load environment variables
 project_root = Path(__file__).parent.parent
@@ -40,11 +38,7 @@ def test_firebase_connection():
 
     # Initialize Firebase
     try:
-        cred = credentials.Certificate(str(creds_path))
-        firebase_admin.initialize_app(cred, {
-            'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET'),
-            'databaseURL': f'https://{os.getenv("FIREBASE_PROJECT_ID")}.firebaseio.com'
-        })
+        init_firebase_app()
         print("✅ Firebase inicializado com sucesso")
     except Exception as e:
         print(f"❌ ERRO ao inicializar Firebase: {e}")
@@ -77,12 +71,15 @@ def test_firebase_connection():
 
     # Test Storage
     try:
-        bucket = storage.bucket()
+        bucket = get_storage_bucket()
         print(f"✅ Storage: Bucket '{bucket.name}' acessível")
     except Exception as e:
         print(f"❌ ERRO no Storage: {e}")
         return False
 
+    stats = get_client_stats()
+    print(f"✅ Cliente Firestore: setup {stats['setupMs']}ms ({stats['builds']} build, {stats['cacheHits']} reusos)")
+
     print("\n🎉 Todos os testes passaram! Firebase está configurado corretamente.\n")
     return True
 
@@ -2,7 +2,7 @@
 """
 Parse sales file from Zig PDV (Excel or CSV format)
 
-Input: Path to XLSX/XLS/CSV file
+Input: Path to XLSX/XLS/CSV file [--profile] [--memory-budget=MB] [--memory-trace]
 Output: JSON with structured sales data
 
 Expected columns from Zig:
@@ -16,6 +16,12 @@ from pathlib import Path
 from datetime import datetime
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from tools.common.profiling import consume_profile_flag, profile_stage, get_profile_summary
+from tools.common.memory_tracking import (
+    consume_memory_flags, memory_stage, get_memory_summary, memory_error_result, MemoryBudgetExceeded
+)
+
 def normalize_column_name(col):
     """Normaliza nome de coluna para camelCase"""
     mapping = {
@@ -173,14 +179,25 @@ def parse_sales_file(file_path):
     return result
 
 def main():
-    if len(sys.argv) < 2:
+    args = consume_memory_flags(consume_profile_flag(sys.argv[1:]))
+    if len(args) < 1:
         print(json.dumps({
-            "error": "Uso: python parse_sales_file.py <arquivo.xlsx>"
+            "error": "Uso: python parse_sales_file.py <arquivo.xlsx> [--profile] [--memory-budget=MB] [--memory-trace]"
         }), file=sys.stderr)
         sys.exit(1)
 
-    file_path = sys.argv[1]
-    result = parse_sales_file(file_path)
+    file_path = args[0]
+    try:
+        with profile_stage('parse'), memory_stage('parse'):
+            result = parse_sales_file(file_path)
+    except MemoryBudgetExceeded as e:
+        print(json.dumps(memory_error_result(e), ensure_ascii=False, indent=2))
+        sys.exit(1)
+
+    profile = get_profile_summary()
+    if profile:
+        result['profile'] = profile
+    result['memory'] = get_memory_summary()
 
     # Output JSON para stdout
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -6,21 +6,38 @@ Executes the full pipeline:
 1. Parse Excel file
 2. Validate and enrich with mappings
 3. Update stock from sales
-4. Update sales_uploads document with results
+4. Append the parsed export to the local sales history (Parquet)
+5. Recompute draft purchase orders (tools/calculations/reorder_engine.py)
+6. Update sales_uploads document with results
 
-Usage: python process_sales_upload.py <excel_file> <upload_id>
+Usage: python process_sales_upload.py <excel_file> <upload_id> [--profile] [--memory-budget=MB] [--memory-trace]
+
+Com --profile (ou MONTUVIA_PROFILE=1) cada etapa grava um cProfile em
+'<upload_id>.profile/' ao lado do arquivo e o resultado traz as funções
+mais quentes de cada etapa.
+
+A memória de cada etapa fica em 'memory' (--memory-trace adiciona pico do
+tracemalloc e maiores pontos de alocação). Com --memory-budget (ou
+MONTUVIA_MEMORY_BUDGET_MB) a etapa que passar do orçamento aborta e o
+upload é marcado como failed com a mensagem do erro.
 """
 
+import os
 import sys
 import json
 import subprocess
 from pathlib import Path
 from datetime import datetime
 import tempfile
+import importlib.util
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from firebase_helper import get_firestore_client
-from google.cloud import firestore
+from firebase_helper import get_firestore_client, get_client_stats, server_timestamp
+from tools.common.instrumentation import op_stage, get_op_stats, merge_op_stats
+from tools.common.profiling import consume_profile_flag, profiling_enabled, merge_profile_summary
+from tools.common.memory_tracking import (
+    consume_memory_flags, memory_stage, get_memory_summary, merge_memory_summary, MemoryBudgetExceeded
+)
 
 def run_tool(script_name, args):
     """
@@ -33,7 +50,7 @@ def run_tool(script_name, args):
     Returns:
         dict: Resultado do script (parsed JSON)
     """
-    script_path = Path(__file__).parent / script_name
+    script_path = (Path(__file__).parent / script_name).resolve()
     cmd = ['python3', str(script_path)] + args
 
     try:
@@ -79,39 +96,52 @@ def update_sales_upload_status(db, upload_id, status, data=None):
 
     update_data = {
         'status': status,
-        'updatedAt': firestore.SERVER_TIMESTAMP
+        'updatedAt': server_timestamp()
     }
 
     if status == 'completed':
-        update_data['completedAt'] = firestore.SERVER_TIMESTAMP
+        update_data['completedAt'] = server_timestamp()
 
     if data:
         update_data.update(data)
 
     # Use set with merge to create if not exists
-    upload_ref.set(update_data, merge=True)
+    with op_stage('status'):
+        upload_ref.set(update_data, merge=True)
 
-def process_sales_upload(excel_file, upload_id):
+def run_pipeline(excel_file, upload_id, result):
     """
-    Processa upload de vendas completo
+    Executa as etapas do pipeline preenchendo 'result'
+
+    Os JSONs temporários entre as etapas são removidos em qualquer saída
+    (sucesso, falha de etapa ou exceção, ex: MemoryBudgetExceeded).
 
     Args:
         excel_file (str): Caminho do arquivo Excel
         upload_id (str): ID do upload para rastreamento
+        result (dict): Resultado consolidado (preenchido etapa a etapa)
 
     Returns:
-        dict: Resultado consolidado
+        dict: result
     """
+    temp_files = []
+    try:
+        return _run_steps(excel_file, upload_id, result, temp_files)
+    finally:
+        for path in temp_files:
+            Path(path).unlink(missing_ok=True)
+
+def _run_steps(excel_file, upload_id, result, temp_files):
     db = get_firestore_client()
     start_time = datetime.now()
 
-    result = {
-        'uploadId': upload_id,
-        'status': 'processing',
-        'steps': {},
-        'errors': [],
-        'warnings': []
-    }
+    # Leituras/escritas do Firestore por etapa (cada tool reporta as suas)
+    firestore_ops = {}
+    profile = {}
+
+    if profiling_enabled() and not os.getenv('MONTUVIA_PROFILE_DIR'):
+        # Subprocessos herdam o ambiente: perfis ficam junto do upload
+        os.environ['MONTUVIA_PROFILE_DIR'] = str(Path(excel_file).parent / f"{upload_id}.profile")
 
     # Marcar como "processing"
     update_sales_upload_status(db, upload_id, 'processing')
@@ -123,6 +153,7 @@ def process_sales_upload(excel_file, upload_id):
     # STEP 1: Parse Excel
     print("1️⃣ Parsing arquivo Excel...")
     parse_result = run_tool('parse_sales_file.py', [excel_file])
+    merge_memory_summary(result['memory'], parse_result.pop('memory', None))
 
     if 'error' in parse_result or parse_result.get('parseErrors'):
         result['status'] = 'failed'
@@ -136,6 +167,7 @@ def process_sales_upload(excel_file, upload_id):
         })
         return result
 
+    merge_profile_summary(profile, parse_result.pop('profile', None))
     result['steps']['parse'] = {
         'totalRows': parse_result.get('totalRows', 0),
         'salesParsed': len(parse_result.get('sales', [])),
@@ -145,12 +177,14 @@ def process_sales_upload(excel_file, upload_id):
 
     # Salvar resultado temporário
     with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
-        json.dump(parse_result, f, ensure_ascii=False)
         parsed_file = f.name
+        temp_files.append(parsed_file)
+        json.dump(parse_result, f, ensure_ascii=False)
 
     # STEP 2: Validate and enrich
     print("\n2️⃣ Validando e enriquecendo com mapeamentos...")
     validate_result = run_tool('validate_sales_data.py', [parsed_file])
+    merge_memory_summary(result['memory'], validate_result.pop('memory', None))
 
     if 'error' in validate_result:
         result['status'] = 'failed'
@@ -163,6 +197,8 @@ def process_sales_upload(excel_file, upload_id):
         })
         return result
 
+    merge_op_stats(firestore_ops, validate_result.get('firestoreOps'), 'validate')
+    merge_profile_summary(profile, validate_result.pop('profile', None))
     stats = validate_result.get('stats', {})
     result['steps']['validate'] = {
         'total': stats.get('total', 0),
@@ -182,12 +218,14 @@ def process_sales_upload(excel_file, upload_id):
 
     # Salvar resultado validado
     with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
-        json.dump(validate_result, f, ensure_ascii=False)
         validated_file = f.name
+        temp_files.append(validated_file)
+        json.dump(validate_result, f, ensure_ascii=False)
 
     # STEP 3: Update stock
     print("\n3️⃣ Atualizando estoque...")
     stock_result = run_tool('update_stock_from_sales.py', [validated_file, upload_id])
+    merge_memory_summary(result['memory'], stock_result.pop('memory', None))
 
     if 'error' in stock_result:
         result['status'] = 'failed'
@@ -204,16 +242,80 @@ def process_sales_upload(excel_file, upload_id):
         'salesCreated': stock_result.get('salesCreated', 0),
         'totalRevenue': stock_result.get('totalRevenue', 0),
         'ingredientsUpdated': stock_result.get('ingredientsUpdated', 0),
-        'stockDecrements': stock_result.get('stockDecrements', {})
+        'stockMovementsCreated': stock_result.get('stockMovementsCreated', 0),
+        'stockDecrements': stock_result.get('stockDecrements', {}),
+        'writeScheduler': stock_result.get('writeScheduler', {})
     }
     result['warnings'].extend(stock_result.get('warnings', []))
+    result['errors'].extend(stock_result.get('errors', []))
+    merge_op_stats(firestore_ops, stock_result.get('firestoreOps'), 'update_stock')
+    merge_profile_summary(profile, stock_result.pop('profile', None))
+
+    if stock_result.get('errors'):
+        # Parte do estoque/vendas não foi gravada: não marcar como concluído
+        # (reenviar o arquivo baixaria de novo o que já foi aplicado)
+        result['status'] = 'failed'
+        update_sales_upload_status(db, upload_id, 'failed', {
+            'processingResults': {
+                'totalRows': result['steps']['parse']['totalRows'],
+                'validRows': result['steps']['validate']['valid'],
+                'invalidRows': result['steps']['validate']['invalid'],
+                'skippedRows': result['steps']['parse']['parseErrors'],
+                'stockUpdated': False
+            },
+            'salesCreated': result['steps']['update_stock']['salesCreated'],
+            'ingredientsUpdated': result['steps']['update_stock']['ingredientsUpdated'],
+            'stockMovementsCreated': result['steps']['update_stock']['stockMovementsCreated'],
+            'errors': result['errors'],
+            'warnings': result['warnings']
+        })
+        print(f"   ❌ {len(stock_result['errors'])} erros ao gravar estoque/vendas")
+        return result
 
     print(f"   ✓ {result['steps']['update_stock']['salesCreated']} vendas registradas")
     print(f"   ✓ {result['steps']['update_stock']['ingredientsUpdated']} ingredientes atualizados")
 
-    # Cleanup temp files
-    Path(parsed_file).unlink(missing_ok=True)
-    Path(validated_file).unlink(missing_ok=True)
+    # STEP 4: Histórico de vendas (Parquet local; falha aqui não invalida o upload)
+    # Sem pyarrow instalado o passo fica desligado, a menos que SALES_HISTORY_INGEST=1
+    history_default = '1' if importlib.util.find_spec('pyarrow') else '0'
+    if os.getenv('SALES_HISTORY_INGEST', history_default) != '0':
+        print("\n4️⃣ Arquivando no histórico de vendas...")
+        history_result = run_tool('sales_history.py', ['ingest', parsed_file, '--source-file', excel_file])
+        if isinstance(history_result, list) and history_result:
+            result['steps']['history'] = {
+                'rows': history_result[0]['rows'],
+                'partitions': len(history_result[0]['partitions'])
+            }
+            print(f"   ✓ {result['steps']['history']['rows']} vendas em {result['steps']['history']['partitions']} partições")
+        else:
+            result['warnings'].append({
+                'message': 'Vendas não arquivadas no histórico',
+                'details': history_result.get('error') if isinstance(history_result, dict) else None
+            })
+            print("   ⚠ Histórico de vendas não atualizado")
+
+    # STEP 5: Rascunhos de pedido com o estoque novo (falha aqui não invalida o upload)
+    if os.getenv('REORDER_ENGINE', '1') != '0':
+        print("\n5️⃣ Recalculando sugestões de compra...")
+        # Rascunhos ficam no nome de quem subiu o arquivo (o app também lista os automáticos para todos)
+        with op_stage('status'):
+            upload_doc = db.collection('sales_uploads').document(upload_id).get()
+        uploaded_by = (upload_doc.to_dict() or {}).get('uploadedBy') if upload_doc.exists else None
+        reorder_result = run_tool('../calculations/reorder_engine.py', ['--user', uploaded_by] if uploaded_by else [])
+        if 'error' in reorder_result:
+            result['warnings'].append({
+                'message': 'Rascunhos de pedido não recalculados',
+                'details': reorder_result.get('error')
+            })
+            print("   ⚠ Rascunhos de pedido não atualizados")
+        else:
+            result['steps']['reorder'] = {
+                'items': reorder_result.get('reorderItems', 0),
+                'drafts': len(reorder_result.get('drafts', [])),
+                'preserved': len(reorder_result.get('preserved', []))
+            }
+            merge_op_stats(firestore_ops, reorder_result.get('firestoreOps'), 'reorder')
+            print(f"   ✓ {result['steps']['reorder']['items']} itens em {result['steps']['reorder']['drafts']} rascunhos")
 
     # FINAL: Marcar como completed
     end_time = datetime.now()
@@ -221,6 +323,11 @@ def process_sales_upload(excel_file, upload_id):
 
     result['status'] = 'completed'
     result['processingTimeMs'] = processing_time_ms
+    result['firestoreClient'] = get_client_stats()
+    result['firestoreOps'] = merge_op_stats(firestore_ops, get_op_stats(), 'orchestrator')
+    total_ops = firestore_ops['total']
+    if profile:
+        result['profile'] = profile
 
     update_sales_upload_status(db, upload_id, 'completed', {
         'processingResults': {
@@ -233,9 +340,14 @@ def process_sales_upload(excel_file, upload_id):
         'salesCreated': result['steps']['update_stock']['salesCreated'],
         'totalRevenue': result['steps']['update_stock'].get('totalRevenue', 0),
         'ingredientsUpdated': result['steps']['update_stock']['ingredientsUpdated'],
+        'stockMovementsCreated': result['steps']['update_stock']['stockMovementsCreated'],
         'errors': result['errors'],
         'warnings': result['warnings'],
-        'processingTimeMs': processing_time_ms
+        'processingTimeMs': processing_time_ms,
+        'firestoreOps': firestore_ops,
+        'memoryMaxRssMb': {
+            stage: data['maxRssMb'] for stage, data in result['memory'].get('stages', {}).items()
+        }
     })
 
     print(f"\n{'='*80}")
@@ -244,21 +356,61 @@ def process_sales_upload(excel_file, upload_id):
     print(f"Tempo de processamento: {processing_time_ms}ms")
     print(f"Vendas registradas: {result['steps']['update_stock']['salesCreated']}")
     print(f"Ingredientes atualizados: {result['steps']['update_stock']['ingredientsUpdated']}")
+    print(f"Firestore: {total_ops['reads']} leituras, {total_ops['writes']} escritas, "
+          f"{total_ops['queries']} queries ({total_ops['roundTrips']} round trips, "
+          f"{total_ops['errors']} com erro)")
+
+    if profile:
+        print(f"Profiles: {profile['dir']}")
 
     if result['warnings']:
         print(f"\n⚠ {len(result['warnings'])} avisos - verifique os detalhes")
 
     return result
 
+def process_sales_upload(excel_file, upload_id):
+    """
+    Processa upload de vendas completo
+
+    Args:
+        excel_file (str): Caminho do arquivo Excel
+        upload_id (str): ID do upload para rastreamento
+
+    Returns:
+        dict: Resultado consolidado
+    """
+    result = {
+        'uploadId': upload_id,
+        'status': 'processing',
+        'steps': {},
+        'errors': [],
+        'warnings': [],
+        'memory': {}
+    }
+
+    try:
+        with memory_stage('orchestrator'):
+            run_pipeline(excel_file, upload_id, result)
+    except MemoryBudgetExceeded as e:
+        result['status'] = 'failed'
+        result['errors'].append({'step': 'orchestrator', 'message': str(e)})
+        update_sales_upload_status(get_firestore_client(), upload_id, 'failed', {
+            'errors': result['errors']
+        })
+
+    merge_memory_summary(result['memory'], get_memory_summary())
+    return result
+
 def main():
-    if len(sys.argv) < 3:
+    args = consume_memory_flags(consume_profile_flag(sys.argv[1:]))
+    if len(args) < 2:
         print(json.dumps({
-            "error": "Uso: python process_sales_upload.py <excel_file> <upload_id>"
+            "error": "Uso: python process_sales_upload.py <excel_file> <upload_id> [--profile] [--memory-budget=MB] [--memory-trace]"
         }), file=sys.stderr)
         sys.exit(1)
 
-    excel_file = sys.argv[1]
-    upload_id = sys.argv[2]
+    excel_file = args[0]
+    upload_id = args[1]
 
     result = process_sales_upload(excel_file, upload_id)
 
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Histórico de vendas multi-mês em Parquet particionado
+
+Cada export do Zig (já parseado por parse_sales_file.py) é anexado a um
+dataset local particionado por mês e bar:
+
+    data/sales_history/month=2024-01/bar=Bar%20Principal/part-<fonte>.parquet
+
+<fonte> é o hash do arquivo original, então reingerir o mesmo export
+sobrescreve as mesmas partes (idempotente). Consultas leem só as colunas
+pedidas e só as partições do intervalo/bares filtrados; o filtro por
+saleDate usa as estatísticas de row group do Parquet.
+
+Requer 'pyarrow' (pip install pyarrow). Sem histórico, product_sales_counts
+cai no Excel legado de janeiro.
+
+Uso:
+    python tools/vendas/sales_history.py ingest <vendas.xlsx|.csv> [...]
+    python tools/vendas/sales_history.py ingest <parsed.json> --source-file <vendas.xlsx>
+    python tools/vendas/sales_history.py query [--start 2024-01] [--end 2024-03] [--bar "Bar X"]
+        [--columns sku,quantity,saleDate] [--limit 20]
+    python tools/vendas/sales_history.py counts [--start 2024-01] [--end 2024-03]
+    python tools/vendas/sales_history.py status
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+HISTORY_DIR = Path(os.getenv('SALES_HISTORY_DIR', PROJECT_ROOT / 'data' / 'sales_history'))
+LEGACY_ZIG_REPORT = PROJECT_ROOT / "Relatório de produtos vendidos - janeiro.xlsx"
+
+NO_BAR = 'sem_bar'
+
+# Colunas gravadas (nomes do parse_sales_file); month/bar ficam no caminho
+STRING_COLUMNS = ('zigSaleId', 'sku', 'productNameZig', 'category', 'seller', 'customer', 'eventDate', 'sourceId')
+FLOAT_COLUMNS = ('unitPrice', 'quantity', 'discountValue', 'totalValue')
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Histórico de vendas requer o pacote 'pyarrow' (pip install pyarrow)")
+    return pyarrow
+
+def _schema(pa):
+    fields = [(name, pa.string()) for name in STRING_COLUMNS]
+    fields += [(name, pa.float64()) for name in FLOAT_COLUMNS]
+    fields.append(('saleDate', pa.timestamp('us')))
+    return pa.schema(fields)
+
+def _partitioning(pa):
+    return pa.dataset.partitioning(pa.schema([('month', pa.string()), ('bar', pa.string())]), flavor='hive')
+
+def source_id(path):
+    """Identificador estável de um export (hash do conteúdo)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+# ==================== INGESTÃO ====================
+
+def ingest_sales(sales, source, history_dir=None):
+    """
+    Anexa vendas parseadas ao histórico
+
+    Args:
+        sales (list): 'sales' do parse_sales_file
+        source (str): ID da fonte (partes com o mesmo ID são sobrescritas)
+
+    Returns:
+        dict: {'source', 'rows', 'partitions': [{'month', 'bar', 'rows'}]}
+    """
+    pa = _pyarrow()
+    history_dir = Path(history_dir or HISTORY_DIR)
+    schema = _schema(pa)
+
+    groups = {}
+    for sale in sales:
+        sale_date = datetime.fromisoformat(sale['saleDate']) if sale.get('saleDate') else None
+        if sale_date is None:
+            continue
+        row = {name: (str(sale[name]) if sale.get(name) not in (None, '') else None) for name in STRING_COLUMNS}
+        row.update({name: float(sale.get(name) or 0) for name in FLOAT_COLUMNS})
+        row['saleDate'] = sale_date.replace(tzinfo=None)
+        row['sourceId'] = source
+        groups.setdefault((sale_date.strftime('%Y-%m'), sale.get('bar') or NO_BAR), []).append(row)
+
+    # Reingestão da mesma fonte: remove partes antigas antes de regravar
+    for stale in history_dir.glob(f"month=*/bar=*/part-{source}.parquet"):
+        stale.unlink()
+
+    partitions = []
+    for (month, bar), rows in sorted(groups.items()):
+        rows.sort(key=lambda r: r['saleDate'])
+        directory = history_dir / f"month={month}" / f"bar={quote(bar, safe='')}"
+        directory.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=schema)
+        pa.parquet.write_table(table, directory / f"part-{source}.parquet", compression='zstd')
+        partitions.append({'month': month, 'bar': bar, 'rows': len(rows)})
+
+    return {'source': source, 'rows': sum(p['rows'] for p in partitions), 'partitions': partitions}
+
+def ingest_file(path, source_file=None, history_dir=None):
+    """
+    Ingere um export do Zig (xlsx/csv) ou o JSON já parseado
+
+    Args:
+        path (str): Arquivo do Zig ou output do parse_sales_file.py
+        source_file (str): Export original (define o ID da fonte quando path é JSON)
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            parsed = json.load(f)
+    else:
+        from tools.vendas.parse_sales_file import parse_sales_file
+        parsed = parse_sales_file(path)
+        if not parsed['sales'] and parsed['parseErrors']:
+            raise ValueError(f"Erro ao parsear {path}: {parsed['parseErrors'][0].get('error')}")
+
+    result = ingest_sales(parsed['sales'], source_id(source_file or path), history_dir)
+    result['file'] = str(path)
+    return result
+
+# ==================== CONSULTA ====================
+
+def history_available(history_dir=None):
+    history_dir = Path(history_dir or HISTORY_DIR)
+    return history_dir.exists() and next(history_dir.glob('month=*/bar=*/*.parquet'), None) is not None
+
+def _date_range(start, end):
+    """'YYYY-MM' ou 'YYYY-MM-DD' → (início, fim exclusivo); fim 'YYYY-MM' inclui o mês todo"""
+    def parse(value, is_end):
+        if value is None:
+            return None
+        if len(value) == 7:
+            first = datetime.strptime(value, '%Y-%m')
+            if not is_end:
+                return first
+            return first.replace(year=first.year + first.month // 12, month=first.month % 12 + 1)
+        day = datetime.fromisoformat(value)
+        if is_end and len(value) == 10:
+            day += timedelta(days=1)
+        return day
+    return parse(start, False), parse(end, True)
+
+def _filter_expression(pa, start=None, end=None, bars=None):
+    field = pa.dataset.field
+    start_dt, end_dt = _date_range(start, end)
+    expression = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    # Partições (month/bar) são podadas antes de abrir arquivos
+    if start_dt:
+        expression = both(expression, field('month') >= start_dt.strftime('%Y-%m'))
+        expression = both(expression, field('saleDate') >= pa.scalar(start_dt, pa.timestamp('us')))
+    if end_dt:
+        last_month = (end_dt - timedelta(microseconds=1)).strftime('%Y-%m')
+        expression = both(expression, field('month') <= last_month)
+        expression = both(expression, field('saleDate') < pa.scalar(end_dt, pa.timestamp('us')))
+    if bars:
+        expression = both(expression, field('bar').isin(list(bars)))
+    return expression
+
+def read_sales(start=None, end=None, bars=None, columns=None, history_dir=None):
+    """
+    Vendas do histórico como DataFrame
+
+    Args:
+        start (str): 'YYYY-MM' ou 'YYYY-MM-DD' (inclusivo)
+        end (str): 'YYYY-MM' ou 'YYYY-MM-DD' (inclusivo)
+        bars (list): Só estes bares
+        columns (list): Só estas colunas (inclui 'month'/'bar' se pedidas)
+
+    Returns:
+        pandas.DataFrame
+    """
+    pa = _pyarrow()
+    history_dir = Path(history_dir or HISTORY_DIR)
+    if not history_available(history_dir):
+        import pandas as pd
+        return pd.DataFrame(columns=columns or [*STRING_COLUMNS, *FLOAT_COLUMNS, 'saleDate', 'month', 'bar'])
+
+    dataset = pa.dataset.dataset(history_dir, format='parquet', partitioning=_partitioning(pa),
+                                 schema=_schema(pa).append(pa.field('month', pa.string())).append(pa.field('bar', pa.string())))
+    table = dataset.to_table(columns=columns, filter=_filter_expression(pa, start, end, bars))
+    # Partição hive já volta com o valor decodificado (Rooftop%2FDeck → Rooftop/Deck)
+    return table.to_pandas()
+
+def product_sales_counts(start=None, end=None, bars=None, history_dir=None):
+    """
+    Vendas (linhas do export) por produto
+
+    Sem histórico ingerido, usa o Excel legado de janeiro.
+
+    Returns:
+        pandas.DataFrame: colunas ['SKU', 'Nome do Produto', 'vendas']
+    """
+    if history_available(history_dir):
+        df = read_sales(start, end, bars, columns=['sku', 'productNameZig'], history_dir=history_dir)
+        df = df.rename(columns={'sku': 'SKU', 'productNameZig': 'Nome do Produto'})
+    else:
+        import pandas as pd
+        df = pd.read_excel(LEGACY_ZIG_REPORT, usecols=['SKU', 'Nome do Produto'])
+
+    return df.groupby(['SKU', 'Nome do Produto']).size().reset_index(name='vendas')
+
+def sku_sales_counts(start=None, end=None, bars=None, history_dir=None):
+    """
+    Vendas por SKU
+
+    Returns:
+        dict: {sku: vendas}
+    """
+    counts = product_sales_counts(start, end, bars, history_dir)
+    return counts.groupby('SKU')['vendas'].sum().to_dict()
+
+def history_status(history_dir=None):
+    """Partições do histórico com linhas e fontes"""
+    pa = _pyarrow()
+    history_dir = Path(history_dir or HISTORY_DIR)
+    partitions = []
+    for directory in sorted(history_dir.glob('month=*/bar=*')):
+        parts = sorted(directory.glob('*.parquet'))
+        partitions.append({
+            'month': directory.parent.name.split('=', 1)[1],
+            'bar': unquote(directory.name.split('=', 1)[1]),
+            'files': len(parts),
+            'rows': sum(pa.parquet.ParquetFile(p).metadata.num_rows for p in parts)
+        })
+    return {'dir': str(history_dir), 'partitions': partitions, 'rows': sum(p['rows'] for p in partitions)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Histórico de vendas (Parquet particionado por mês e bar)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Anexa exports do Zig ao histórico')
+    ingest.add_argument('files', nargs='+', help='XLSX/CSV do Zig ou JSON do parse_sales_file')
+    ingest.add_argument('--source-file', help='Export original (quando o input é o JSON parseado; um arquivo por vez)')
+
+    for name, help_text in (('query', 'Consulta vendas'), ('counts', 'Vendas por produto')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--start', help='YYYY-MM ou YYYY-MM-DD (inclusivo)')
+        sub.add_argument('--end', help='YYYY-MM ou YYYY-MM-DD (inclusivo)')
+        sub.add_argument('--bar', action='append', help='Filtra por bar (repetível)')
+        if name == 'query':
+            sub.add_argument('--columns', help='Colunas separadas por vírgula')
+            sub.add_argument('--limit', type=int, default=50)
+
+    subparsers.add_parser('status', help='Partições, arquivos e linhas')
+
+    args = parser.parse_args()
+
+    if args.command == 'ingest' and args.source_file and len(args.files) > 1:
+        # O source_id vem do export original: um só para vários arquivos colidiria
+        parser.error('--source-file só pode ser usado com um único arquivo')
+
+    if args.command == 'ingest':
+        result = []
+        for path in args.files:
+            item = ingest_file(path, args.source_file)
+            print(f"✓ {path}: {item['rows']} vendas em {len(item['partitions'])} partições", file=sys.stderr)
+            result.append(item)
+    elif args.command == 'query':
+        columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+        df = read_sales(args.start, args.end, args.bar, columns)
+        print(f"📊 {len(df)} vendas", file=sys.stderr)
+        result = json.loads(df.head(args.limit).to_json(orient='records', date_format='iso', force_ascii=False))
+    elif args.command == 'counts':
+        df = product_sales_counts(args.start, args.end, args.bar).sort_values('vendas', ascending=False)
+        result = df.to_dict('records')
+    else:
+        result = history_status()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Simulação offline (what-if) da atualização de estoque
+
+Usa um cache local de 'ingredients' e 'recipes' e NÃO faz nenhuma escrita
+no Firestore. Calcula os mesmos decrementos de update_stock_from_sales.py,
+o estoque resultante e os avisos (estoque negativo / abaixo do mínimo).
+
+Serve para:
+- Conferir um upload grande antes de aplicar (JSON do validate_sales_data.py)
+- Previsão com volumes hipotéticos ({recipe_id: quantidade})
+
+Uso:
+    python tools/vendas/simulate_stock_update.py refresh-cache [--cache <path>]
+    python tools/vendas/simulate_stock_update.py run <validated.json> [--scale 1.0] [--cache <path>]
+    python tools/vendas/simulate_stock_update.py forecast <volumes.json> [--scale 1.0] [--cache <path>]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from tools.vendas.update_stock_from_sales import group_sales_by_recipe, calculate_stock_decrements
+
+DEFAULT_CACHE_PATH = PROJECT_ROOT / '.tmp' / 'stock_simulation_cache.json'
+
+INGREDIENT_FIELDS = ('name', 'unit', 'currentStock', 'current_stock', 'minStock', 'maxStock')
+RECIPE_FIELDS = ('name', 'portions', 'ingredients')
+
+def refresh_cache(cache_path=DEFAULT_CACHE_PATH):
+    """
+    Baixa 'ingredients' e 'recipes' do Firestore para o cache local
+
+    Returns:
+        dict: {'ingredients': int, 'recipes': int, 'path': str}
+    """
+    from firebase_helper import get_firestore_client
+    db = get_firestore_client()
+
+    cache = {
+        'createdAt': datetime.now(timezone.utc).isoformat(),
+        'ingredients': {},
+        'recipes': {}
+    }
+
+    for doc in db.collection('ingredients').stream():
+        data = doc.to_dict()
+        cache['ingredients'][doc.id] = {k: data[k] for k in INGREDIENT_FIELDS if k in data}
+
+    for doc in db.collection('recipes').stream():
+        data = doc.to_dict()
+        cache['recipes'][doc.id] = {k: data[k] for k in RECIPE_FIELDS if k in data}
+
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, default=str)
+
+    return {
+        'ingredients': len(cache['ingredients']),
+        'recipes': len(cache['recipes']),
+        'path': str(cache_path)
+    }
+
+def load_cache(cache_path=DEFAULT_CACHE_PATH):
+    """Lê o cache local (gerado por refresh_cache)"""
+    cache_path = Path(cache_path)
+    if not cache_path.exists():
+        raise FileNotFoundError(
+            f"Cache não encontrado: {cache_path}. Execute: simulate_stock_update.py refresh-cache"
+        )
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def volumes_to_sales(volumes):
+    """
+    Converte volumes hipotéticos em vendas sintéticas
+
+    Args:
+        volumes (dict): {recipe_id: quantidade vendida}
+
+    Returns:
+        list: Vendas no formato de validSales
+    """
+    return [
+        {'recipeId': recipe_id, 'quantity': float(quantity)}
+        for recipe_id, quantity in volumes.items()
+        if quantity
+    ]
+
+def simulate_stock_update(valid_sales, cache, scale=1.0):
+    """
+    Simula a atualização de estoque sem tocar no Firestore
+
+    Args:
+        valid_sales (list): Vendas válidas (validSales) ou sintéticas
+        cache (dict): Cache local de ingredientes e receitas
+        scale (float): Multiplicador de volume (ex: 1.2 = +20% de vendas)
+
+    Returns:
+        dict: Decrementos, estoque resultante e avisos
+    """
+    started = time.perf_counter()
+
+    if scale != 1.0:
+        valid_sales = [
+            {**sale, 'quantity': sale.get('quantity', 0) * scale}
+            for sale in valid_sales
+        ]
+
+    grouped = group_sales_by_recipe(valid_sales)
+    recipes = {
+        recipe_id: cache['recipes'][recipe_id]
+        for recipe_id in grouped
+        if recipe_id in cache['recipes']
+    }
+    missing_recipes = sorted(set(grouped) - set(recipes))
+    decrements = calculate_stock_decrements(grouped, recipes)
+
+    result = {
+        'simulated': True,
+        'firestoreWrites': 0,
+        'scale': scale,
+        'salesSimulated': len(valid_sales),
+        'ingredientsAffected': len(decrements),
+        'stockDecrements': {},
+        'resultingStock': {},
+        'warnings': [],
+        'cacheCreatedAt': cache.get('createdAt')
+    }
+
+    for recipe_id in missing_recipes:
+        result['warnings'].append({
+            'recipeId': recipe_id,
+            'message': f"Receita {recipe_id} não encontrada no cache"
+        })
+
+    for ing_id, decrement_data in decrements.items():
+        ing_data = cache['ingredients'].get(ing_id)
+        result['stockDecrements'][ing_id] = decrement_data['totalDecrement']
+
+        if ing_data is None:
+            result['warnings'].append({
+                'ingredientId': ing_id,
+                'message': f"Ingrediente '{decrement_data['name']}' não encontrado no cache"
+            })
+            continue
+
+        current_stock = ing_data.get('currentStock', ing_data.get('current_stock', 0)) or 0
+        new_stock = current_stock - decrement_data['totalDecrement']
+        min_stock = ing_data.get('minStock', 0) or 0
+
+        result['resultingStock'][ing_id] = {
+            'name': ing_data.get('name', decrement_data['name']),
+            'unit': decrement_data['unit'],
+            'currentStock': current_stock,
+            'decrement': decrement_data['totalDecrement'],
+            'newStock': new_stock,
+            'minStock': min_stock
+        }
+
+        if new_stock < 0:
+            result['warnings'].append({
+                'ingredientId': ing_id,
+                'ingredientName': decrement_data['name'],
+                'newStock': new_stock,
+                'shortfall': -new_stock,
+                'unit': decrement_data['unit'],
+                'message': f"Estoque de '{decrement_data['name']}' ficaria negativo ({new_stock:.2f} {decrement_data['unit']})"
+            })
+        elif new_stock < min_stock:
+            result['warnings'].append({
+                'ingredientId': ing_id,
+                'ingredientName': decrement_data['name'],
+                'newStock': new_stock,
+                'minStock': min_stock,
+                'unit': decrement_data['unit'],
+                'message': f"Estoque de '{decrement_data['name']}' ficaria abaixo do mínimo ({new_stock:.2f} < {min_stock:.2f} {decrement_data['unit']})"
+            })
+
+    result['elapsedMs'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulação offline de atualização de estoque')
+    parser.add_argument('--cache', default=str(DEFAULT_CACHE_PATH), help='Caminho do cache local')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('refresh-cache', help='Atualiza o cache local a partir do Firestore')
+
+    run = subparsers.add_parser('run', help='Simula um JSON do validate_sales_data.py')
+    run.add_argument('validated_file')
+    run.add_argument('--scale', type=float, default=1.0)
+
+    forecast = subparsers.add_parser('forecast', help='Simula volumes hipotéticos {recipe_id: qtd}')
+    forecast.add_argument('volumes_file')
+    forecast.add_argument('--scale', type=float, default=1.0)
+
+    args = parser.parse_args()
+
+    if args.command == 'refresh-cache':
+        result = refresh_cache(args.cache)
+        print(f"✓ Cache atualizado: {result['ingredients']} ingredientes, {result['recipes']} receitas", file=sys.stderr)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0)
+
+    cache = load_cache(args.cache)
+
+    if args.command == 'run':
+        with open(args.validated_file, 'r', encoding='utf-8') as f:
+            valid_sales = json.load(f).get('validSales', [])
+    else:
+        with open(args.volumes_file, 'r', encoding='utf-8') as f:
+            valid_sales = volumes_to_sales(json.load(f))
+
+    result = simulate_stock_update(valid_sales, cache, scale=args.scale)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if result['warnings']:
+        print(f"\n⚠ {len(result['warnings'])} avisos:", file=sys.stderr)
+        for warning in result['warnings']:
+            print(f"  - {warning.get('message')}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
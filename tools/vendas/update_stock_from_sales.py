@@ -9,13 +9,15 @@ Process:
 1. Group sales by recipe
 2. Fetch recipes with ingredients
 3. Calculate stock decrements
-4. Apply decrements using Firestore transactions
-5. Create sale documents
-6. Return statistics
+4. Apply decrements + stock_movements ledger entries (concurrent batched writes)
+5. Create sale documents, flagging stockDecremented from the stock outcome
+6. Return statistics (failed batches are reported in 'errors')
 """
 
+import os
 import sys
 import json
+import asyncio
 from pathlib import Path
 from collections import defaultdict
 from datetime import datetime
@@ -23,8 +25,13 @@ import random
 import string
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from firebase_helper import get_firestore_client
-from google.cloud import firestore
+from firebase_helper import server_timestamp, increment, transform_values
+from tools.common.write_scheduler import WriteScheduler
+from tools.common.instrumentation import op_stage, get_op_stats
+from tools.common.profiling import consume_profile_flag, profile_stage, get_profile_summary
+from tools.common.memory_tracking import (
+    consume_memory_flags, memory_stage, get_memory_summary, memory_error_result, MemoryBudgetExceeded
+)
 
 def generate_id():
     """Gera ID único para documentos"""
@@ -44,25 +51,6 @@ def group_sales_by_recipe(valid_sales):
             grouped[recipe_id].append(sale)
     return grouped
 
-def fetch_recipes(db, recipe_ids):
-    """
-    Busca receitas do Firestore
-
-    Returns:
-        dict: {recipe_id: recipe_data}
-    """
-    recipes = {}
-    recipes_ref = db.collection('recipes')
-
-    for recipe_id in recipe_ids:
-        doc = recipes_ref.document(recipe_id).get()
-        if doc.exists:
-            recipes[recipe_id] = doc.to_dict()
-        else:
-            print(f"⚠ Receita {recipe_id} não encontrada", file=sys.stderr)
-
-    return recipes
-
 def calculate_stock_decrements(grouped_sales, recipes):
     """
     Calcula quanto decrementar de cada ingrediente
@@ -112,142 +100,411 @@ def calculate_stock_decrements(grouped_sales, recipes):
 
     return dict(decrements)
 
-def apply_stock_decrements(db, decrements):
+def build_stock_movement(ing_id, ing_data, decrement_data, upload_id, previous_stock=None, new_stock=None):
     """
-    Aplica decrementos no Firestore usando transactions
+    Monta o movimento agregado de estoque (um por ingrediente por upload)
+
+    Segue o mesmo schema de 'stock_movements' usado pelo backend
+    (EstoqueService.adjustStock / OperacoesService.createStockMovement).
+    Os saldos só são conhecidos depois do commit do increment e são
+    preenchidos por stock_balance_updates.
 
     Returns:
-        dict: {
-            'ingredientsUpdated': int,
-            'warnings': [...]
-        }
+        dict: Dados do documento em 'stock_movements'
     """
-    result = {
-        'ingredientsUpdated': 0,
-        'warnings': []
+    return {
+        'ingredient_id': ing_id,
+        'ingredient_name': ing_data.get('name', decrement_data['name']),
+        'movement_type': 'sale',
+        'quantity': -decrement_data['totalDecrement'],
+        'unit': decrement_data['unit'],
+        'previous_stock': previous_stock,
+        'new_stock': new_stock,
+        'reference_type': 'sales_upload',
+        'reference_id': upload_id,
+        'upload_id': upload_id,
+        'storage_center': ing_data.get('storageCenter', ing_data.get('storage_center', '')),
+        'notes': f"Baixa automática por vendas (upload {upload_id})",
+        'created_by': 'sales_pipeline',
+        'created_at': server_timestamp()
     }
 
-    ingredients_ref = db.collection('ingredients')
+def plan_stock_updates(decrements, snapshots, upload_id):
+    """
+    Calcula updates de estoque + movimentos a partir dos documentos lidos
 
-    for ing_id, decrement_data in decrements.items():
-        try:
-            doc_ref = ingredients_ref.document(ing_id)
-            doc = doc_ref.get()
-
-            if not doc.exists:
-                result['warnings'].append({
-                    'ingredientId': ing_id,
-                    'message': f"Ingrediente '{decrement_data['name']}' não encontrado no Firestore"
-                })
-                continue
-
-            ing_data = doc.to_dict()
-            current_stock = ing_data.get('currentStock', 0)
-            new_stock = current_stock - decrement_data['totalDecrement']
-
-            # Atualizar estoque
-            doc_ref.update({
-                'currentStock': new_stock,
-                'lastUpdated': firestore.SERVER_TIMESTAMP
-            })
+    O estoque é baixado com increment atômico: a leitura serve só para
+    existência/nome/centro de estoque, e ajustes concorrentes entre a
+    leitura e o commit não são sobrescritos.
 
-            result['ingredientsUpdated'] += 1
+    Args:
+        decrements (dict): Output de calculate_stock_decrements
+        snapshots (dict): {ingredient_id: DocumentSnapshot}
+        upload_id (str): ID do upload
 
-            # Warning se estoque ficou negativo
-            if new_stock < 0:
-                result['warnings'].append({
-                    'ingredientId': ing_id,
-                    'ingredientName': decrement_data['name'],
-                    'newStock': new_stock,
-                    'unit': decrement_data['unit'],
-                    'message': f"Estoque de '{decrement_data['name']}' ficou negativo ({new_stock:.2f} {decrement_data['unit']})"
-                })
+    Returns:
+        tuple: ([(doc_ref, stock_update, movement_data)], [warnings de ingredientes não encontrados])
+    """
+    planned = []
+    missing = []
 
-        except Exception as e:
-            result['warnings'].append({
+    for ing_id, decrement_data in decrements.items():
+        doc = snapshots.get(ing_id)
+
+        if doc is None or not doc.exists:
+            missing.append({
                 'ingredientId': ing_id,
-                'message': f"Erro ao atualizar estoque: {str(e)}"
+                'message': f"Ingrediente '{decrement_data['name']}' não encontrado no Firestore"
             })
+            continue
 
-    return result
+        stock_update = {
+            'currentStock': increment(-decrement_data['totalDecrement']),
+            'lastUpdated': server_timestamp()
+        }
+        movement_data = build_stock_movement(ing_id, doc.to_dict(), decrement_data, upload_id)
+
+        planned.append((doc.reference, stock_update, movement_data))
+
+    return planned, missing
+
+def committed_stock(write_result):
+    """Valor de 'currentStock' gravado pelo increment (o outro transform é o timestamp)"""
+    for value in transform_values(write_result):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+def negative_stock_warning(movement_data, new_stock):
+    """Warning se o estoque commitado ficou negativo"""
+    if new_stock is None or new_stock >= 0:
+        return None
+    name, unit = movement_data['ingredient_name'], movement_data['unit']
+    return {
+        'ingredientId': movement_data['ingredient_id'],
+        'ingredientName': name,
+        'newStock': new_stock,
+        'unit': unit,
+        'message': f"Estoque de '{name}' ficou negativo ({new_stock:.2f} {unit})"
+    }
 
-def create_sale_documents(db, valid_sales, upload_id):
+def stock_balance_updates(chunk, movement_refs, write_results):
     """
-    Cria documentos na collection 'vendas'
+    Saldos do ledger a partir do resultado do commit
+
+    Args:
+        chunk (list): Itens de plan_stock_updates commitados no batch
+        movement_refs (list): Referências dos movimentos, na ordem do chunk
+        write_results (list): Retorno de batch.commit() (2 escritas por ingrediente)
 
     Returns:
-        int: Número de documentos criados
+        tuple: ([(movement_ref, {'previous_stock', 'new_stock'})], [warnings])
     """
-    vendas_ref = db.collection('vendas')
-    batch = db.batch()
-    count = 0
+    updates = []
+    warnings = []
+    for (_, _, movement_data), movement_ref, write_result in zip(chunk, movement_refs, write_results[::2]):
+        new_stock = committed_stock(write_result)
+        if new_stock is None:
+            continue
+        updates.append((movement_ref, {
+            'previous_stock': new_stock - movement_data['quantity'],
+            'new_stock': new_stock
+        }))
+        warning = negative_stock_warning(movement_data, new_stock)
+        if warning:
+            warnings.append(warning)
+    return updates, warnings
+
+def chunked(items, size):
+    """Divide uma lista em pedaços de até 'size' itens"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+# Firestore tem limite de 500 ops por batch (2 ops por ingrediente: estoque + movimento)
+INGREDIENTS_PER_BATCH = 250
+SALES_PER_BATCH = 500
+BALANCES_PER_BATCH = 500
+
+def record_batch_success(result, chunk):
+    result['ingredientsUpdated'] += len(chunk)
+    result['stockMovementsCreated'] += len(chunk)
+
+def is_already_exists(error):
+    """Retry de um commit que já tinha sido aplicado (o create do movimento colide)"""
+    return type(error).__name__ == 'AlreadyExists'
+
+def record_batch_error(result, chunk, error):
+    for doc_ref, *_ in chunk:
+        result['failedIngredients'].add(doc_ref.id)
+        result['errors'].append({
+            'step': 'apply_stock',
+            'ingredientId': doc_ref.id,
+            'message': f"Erro ao atualizar estoque: {str(error)}"
+        })
 
-    for sale in valid_sales:
-        sale_id = generate_id()
-
-        sale_data = {
-            'id': sale_id,
-            'uploadId': upload_id,
-
-            # Dados originais do Zig
-            'zigSaleId': sale.get('zigSaleId', ''),
-            'sku': sale.get('sku', ''),
-            'productNameZig': sale.get('productNameZig', ''),
-            'category': sale.get('category', ''),
-            'unitPrice': sale.get('unitPrice', 0),
-            'quantity': sale.get('quantity', 0),
-            'totalValue': sale.get('totalValue', 0),
-            'discountValue': sale.get('discountValue', 0),
-            'seller': sale.get('seller', ''),
-            'customer': sale.get('customer', ''),
-            'saleDate': sale.get('saleDate', ''),
-            'bar': sale.get('bar', ''),
-
-            # Dados enriquecidos
-            'recipeId': sale.get('recipeId', ''),
-            'recipeName': sale.get('recipeName', ''),
-            'mappingConfidence': sale.get('mappingConfidence', 0),
-            'productType': sale.get('productType', 'dish'),
-
-            # Controle
-            'stockDecremented': True,
-            'createdAt': firestore.SERVER_TIMESTAMP
+def failed_recipe_ids(recipes, failed_ingredients):
+    """Receitas com algum ingrediente cujo estoque não foi baixado"""
+    return {
+        recipe_id for recipe_id, recipe in recipes.items()
+        if any(line.get('ingredientId') in failed_ingredients for line in recipe.get('ingredients', []))
+    }
+
+def build_sale_document(sale, sale_id, upload_id, stock_decremented=True):
+    """
+    Monta o documento de uma venda na collection 'vendas'
+
+    stock_decremented fica False quando o batch de estoque de algum
+    ingrediente da receita falhou (a venda existe, mas não baixou estoque).
+
+    Returns:
+        dict: Dados do documento
+    """
+    return {
+        'id': sale_id,
+        'uploadId': upload_id,
+
+        # Dados originais do Zig
+        'zigSaleId': sale.get('zigSaleId', ''),
+        'sku': sale.get('sku', ''),
+        'productNameZig': sale.get('productNameZig', ''),
+        'category': sale.get('category', ''),
+        'unitPrice': sale.get('unitPrice', 0),
+        'quantity': sale.get('quantity', 0),
+        'totalValue': sale.get('totalValue', 0),
+        'discountValue': sale.get('discountValue', 0),
+        'seller': sale.get('seller', ''),
+        'customer': sale.get('customer', ''),
+        'saleDate': sale.get('saleDate', ''),
+        'bar': sale.get('bar', ''),
+
+        # Dados enriquecidos
+        'recipeId': sale.get('recipeId', ''),
+        'recipeName': sale.get('recipeName', ''),
+        'mappingConfidence': sale.get('mappingConfidence', 0),
+        'productType': sale.get('productType', 'dish'),
+
+        # Controle
+        'stockDecremented': stock_decremented,
+        'createdAt': server_timestamp()
+    }
+
+def calculate_total_revenue(valid_sales):
+    """Soma o valor total das vendas (totalValue ou unitPrice × quantity)"""
+    return sum(
+        (s.get('totalValue') or (s.get('unitPrice', 0) * s.get('quantity', 0)))
+        for s in valid_sales
+    )
+
+# ==================== I/O CONCORRENTE ====================
+
+DEFAULT_CONCURRENCY = 8
+READS_PER_CALL = 100
+
+async def _get_all_async(db, refs, semaphore):
+    """get_all de um grupo de referências, limitado pelo semáforo"""
+    async with semaphore:
+        return [doc async for doc in db.get_all(refs)]
+
+async def _commit_async(writer, batch, ops, semaphore):
+    async with semaphore:
+        return await writer.commit_async(batch, ops)
+
+async def _in_stage(name, coroutine):
+    # Cada task do gather tem sua cópia do contexto: a etapa vale só para ela
+    with op_stage(name):
+        return await coroutine
+
+async def fetch_recipes_async(db, recipe_ids, semaphore):
+    """
+    Busca receitas em paralelo (grupos de get_all concorrentes)
+
+    Returns:
+        dict: {recipe_id: recipe_data}
+    """
+    recipes_ref = db.collection('recipes')
+    refs = [recipes_ref.document(recipe_id) for recipe_id in recipe_ids]
+    groups = await asyncio.gather(*[
+        _get_all_async(db, chunk, semaphore) for chunk in chunked(refs, READS_PER_CALL)
+    ])
+
+    recipes = {}
+    for doc in (doc for group in groups for doc in group):
+        if doc.exists:
+            recipes[doc.id] = doc.to_dict()
+    for recipe_id in set(recipe_ids) - set(recipes):
+        print(f"⚠ Receita {recipe_id} não encontrada", file=sys.stderr)
+
+    return recipes
+
+async def apply_stock_decrements_async(db, decrements, upload_id, semaphore, writer):
+    """
+    Aplica decrementos no Firestore e registra o movimento no ledger
+
+    Para cada ingrediente, o increment de 'currentStock' e o documento em
+    'stock_movements' vão no mesmo batch, então estoque e histórico nunca
+    ficam dessincronizados. O movimento é gravado com create: se um retry
+    reenviar um batch que já tinha sido aplicado, o commit falha em vez de
+    baixar o estoque duas vezes. Os saldos (previous_stock/new_stock) vêm
+    do valor commitado e são gravados no movimento logo depois.
+    Leituras de ingredientes e commits de batches rodam concorrentemente,
+    respeitando o semáforo (limite de concorrência).
+
+    Returns:
+        dict: {
+            'ingredientsUpdated': int,
+            'stockMovementsCreated': int,
+            'warnings': [...],
+            'errors': [...],
+            'failedIngredients': set
         }
+    """
+    result = {
+        'ingredientsUpdated': 0,
+        'stockMovementsCreated': 0,
+        'warnings': [],
+        'errors': [],
+        'failedIngredients': set()
+    }
 
-        doc_ref = vendas_ref.document(sale_id)
-        batch.set(doc_ref, sale_data)
-        count += 1
+    if not decrements:
+        return result
 
-        # Firestore tem limite de 500 ops por batch
-        if count % 500 == 0:
-            batch.commit()
-            batch = db.batch()
+    ingredients_ref = db.collection('ingredients')
+    refs = [ingredients_ref.document(ing_id) for ing_id in decrements]
+    groups = await asyncio.gather(*[
+        _get_all_async(db, chunk, semaphore) for chunk in chunked(refs, READS_PER_CALL)
+    ])
+    snapshots = {doc.id: doc for group in groups for doc in group}
+
+    planned, missing = plan_stock_updates(decrements, snapshots, upload_id)
+    result['warnings'].extend(missing)
+    movements_ref = db.collection('stock_movements')
+
+    chunks = chunked(planned, INGREDIENTS_PER_BATCH)
+    batches = []
+    chunk_movement_refs = []
+    for chunk in chunks:
+        batch = db.batch()
+        movement_refs = []
+        for doc_ref, stock_update, movement_data in chunk:
+            movement_ref = movements_ref.document()
+            batch.update(doc_ref, stock_update)
+            batch.create(movement_ref, movement_data)
+            movement_refs.append(movement_ref)
+        batches.append(batch)
+        chunk_movement_refs.append(movement_refs)
+
+    outcomes = await asyncio.gather(
+        *[_commit_async(writer, batch, 2 * len(chunk), semaphore) for chunk, batch in zip(chunks, batches)],
+        return_exceptions=True
+    )
 
-    # Commit final
-    if count % 500 != 0:
-        batch.commit()
+    balances = []
+    for chunk, movement_refs, outcome in zip(chunks, chunk_movement_refs, outcomes):
+        if is_already_exists(outcome):
+            record_batch_success(result, chunk)
+            result['warnings'].extend({
+                'ingredientId': doc_ref.id,
+                'message': "Movimento de estoque gravado sem saldos (commit confirmado só no retry)"
+            } for doc_ref, *_ in chunk)
+        elif isinstance(outcome, Exception):
+            record_batch_error(result, chunk, outcome)
+        else:
+            record_batch_success(result, chunk)
+            updates, warnings = stock_balance_updates(chunk, movement_refs, outcome)
+            balances.extend(updates)
+            result['warnings'].extend(warnings)
+
+    # Saldos no ledger: estoque já está correto, falha aqui só vira warning
+    balance_chunks = chunked(balances, BALANCES_PER_BATCH)
+    balance_batches = []
+    for chunk in balance_chunks:
+        batch = db.batch()
+        for movement_ref, balance in chunk:
+            batch.update(movement_ref, balance)
+        balance_batches.append(batch)
+
+    outcomes = await asyncio.gather(
+        *[_commit_async(writer, batch, len(chunk), semaphore) for chunk, batch in zip(balance_chunks, balance_batches)],
+        return_exceptions=True
+    )
+    for chunk, outcome in zip(balance_chunks, outcomes):
+        if isinstance(outcome, Exception):
+            result['warnings'].append({
+                'message': f"Saldos de {len(chunk)} movimentos de estoque não gravados: {str(outcome)}"
+            })
 
-    return count
+    return result
 
-def update_stock_from_sales(validated_data, upload_id):
+async def create_sale_documents_async(db, valid_sales, upload_id, semaphore, writer, failed_recipes=frozenset()):
+    """
+    Cria documentos na collection 'vendas' (batches commitados em paralelo)
+
+    Cada batch é commitado pelo WriteScheduler (taxa controlada + retry);
+    um batch que falha mesmo assim não derruba os outros e vira um erro no
+    resultado com o intervalo de vendas afetado. Vendas de receitas em
+    failed_recipes saem com stockDecremented False.
+
+    Returns:
+        dict: {'salesCreated': int, 'errors': [...]}
+    """
+    vendas_ref = db.collection('vendas')
+    chunks = chunked(valid_sales, SALES_PER_BATCH)
+    batches = []
+
+    for chunk in chunks:
+        batch = db.batch()
+        for sale in chunk:
+            sale_id = generate_id()
+            stock_decremented = sale.get('recipeId') not in failed_recipes
+            batch.set(vendas_ref.document(sale_id), build_sale_document(sale, sale_id, upload_id, stock_decremented))
+        batches.append(batch)
+
+    outcomes = await asyncio.gather(
+        *[_commit_async(writer, batch, len(chunk), semaphore) for chunk, batch in zip(chunks, batches)],
+        return_exceptions=True
+    )
+
+    result = {'salesCreated': 0, 'errors': []}
+    for index, (chunk, outcome) in enumerate(zip(chunks, outcomes)):
+        if isinstance(outcome, Exception):
+            first = index * SALES_PER_BATCH
+            result['errors'].append({
+                'step': 'create_sales',
+                'message': f"Erro ao gravar vendas {first + 1}-{first + len(chunk)}: {str(outcome)}"
+            })
+        else:
+            result['salesCreated'] += len(chunk)
+    return result
+
+async def update_stock_from_sales_async(validated_data, upload_id, concurrency=DEFAULT_CONCURRENCY):
     """
     Processa vendas válidas e atualiza estoque
 
+    Busca de receitas → cálculo → (estoque + ledger) → criação de vendas.
+    As vendas só são gravadas depois dos commits de estoque, para que
+    'stockDecremented' reflita o que de fato foi baixado; batches que falham
+    vão para 'errors' sem descartar o resultado dos outros.
+
     Args:
         validated_data (dict): Output de validate_sales_data.py
         upload_id (str): ID do upload para rastreamento
+        concurrency (int): Máximo de RPCs simultâneas (1 = sequencial)
 
     Returns:
         dict: Resultado do processamento
     """
-    db = get_firestore_client()
+    from firebase_helper import get_async_firestore_client
 
+    db = get_async_firestore_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    writer = WriteScheduler(db)
     valid_sales = validated_data.get('validSales', [])
 
     result = {
         'salesCreated': 0,
         'totalRevenue': 0,
         'ingredientsUpdated': 0,
+        'stockMovementsCreated': 0,
         'stockDecrements': {},
         'warnings': [],
         'errors': []
@@ -259,59 +516,121 @@ def update_stock_from_sales(validated_data, upload_id):
         })
         return result
 
-    print(f"\nProcessando {len(valid_sales)} vendas válidas...")
+    print(f"\nProcessando {len(valid_sales)} vendas válidas (concorrência {concurrency})...")
 
     # 1. Agrupar por receita
     grouped = group_sales_by_recipe(valid_sales)
     print(f"✓ {len(grouped)} receitas distintas")
 
     # 2. Buscar receitas
-    recipes = fetch_recipes(db, list(grouped.keys()))
+    recipes = await _in_stage('fetch_recipes', fetch_recipes_async(db, list(grouped.keys()), semaphore))
     print(f"✓ {len(recipes)} receitas carregadas")
 
     # 3. Calcular decrementos
     decrements = calculate_stock_decrements(grouped, recipes)
     print(f"✓ {len(decrements)} ingredientes afetados")
-
-    # 4. Aplicar decrementos
-    update_result = apply_stock_decrements(db, decrements)
-    result['ingredientsUpdated'] = update_result['ingredientsUpdated']
-    result['warnings'].extend(update_result['warnings'])
     result['stockDecrements'] = {
         ing_id: data['totalDecrement']
         for ing_id, data in decrements.items()
     }
-    print(f"✓ {result['ingredientsUpdated']} ingredientes atualizados")
 
-    # 5. Calcular receita total
-    result['totalRevenue'] = sum(
-        (s.get('totalValue') or (s.get('unitPrice', 0) * s.get('quantity', 0)))
-        for s in valid_sales
-    )
+    # 4. Aplicar decrementos (estoque + ledger)
+    try:
+        update_result = await _in_stage(
+            'apply_stock', apply_stock_decrements_async(db, decrements, upload_id, semaphore, writer)
+        )
+    except Exception as e:
+        failed_ingredients = set(decrements)
+        result['errors'].append({
+            'step': 'apply_stock',
+            'message': f"Erro ao atualizar estoque: {str(e)}"
+        })
+    else:
+        failed_ingredients = update_result['failedIngredients']
+        result['ingredientsUpdated'] = update_result['ingredientsUpdated']
+        result['stockMovementsCreated'] = update_result['stockMovementsCreated']
+        result['warnings'].extend(update_result['warnings'])
+        result['errors'].extend(update_result['errors'])
+
+    # 5. Criar documentos de venda
+    failed_recipes = failed_recipe_ids(recipes, failed_ingredients)
+    try:
+        sales_result = await _in_stage(
+            'create_sales',
+            create_sale_documents_async(db, valid_sales, upload_id, semaphore, writer, failed_recipes)
+        )
+    except Exception as e:
+        result['errors'].append({
+            'step': 'create_sales',
+            'message': f"Erro ao gravar vendas: {str(e)}"
+        })
+    else:
+        result['salesCreated'] = sales_result['salesCreated']
+        result['errors'].extend(sales_result['errors'])
 
-    # 6. Criar documentos de venda
-    result['salesCreated'] = create_sale_documents(db, valid_sales, upload_id)
+    # 6. Calcular receita total
+    result['totalRevenue'] = calculate_total_revenue(valid_sales)
+    result['writeScheduler'] = writer.stats
+
+    print(f"✓ {result['ingredientsUpdated']} ingredientes atualizados")
+    print(f"✓ {result['stockMovementsCreated']} movimentos registrados em stock_movements")
     print(f"✓ {result['salesCreated']} vendas registradas")
     print(f"✓ R$ {result['totalRevenue']:.2f} receita total")
+    for error in result['errors']:
+        print(f"❌ {error['message']}", file=sys.stderr)
 
     return result
 
+def update_stock_from_sales(validated_data, upload_id, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Ponto de entrada síncrono de update_stock_from_sales_async
+
+    Args:
+        validated_data (dict): Output de validate_sales_data.py
+        upload_id (str): ID do upload para rastreamento
+        concurrency (int): Máximo de RPCs simultâneas (1 = sequencial)
+
+    Returns:
+        dict: Resultado do processamento
+    """
+    return asyncio.run(update_stock_from_sales_async(validated_data, upload_id, concurrency))
+
 def main():
-    if len(sys.argv) < 3:
+    argv = consume_memory_flags(consume_profile_flag(sys.argv[1:]))
+    args = [arg for arg in argv if not arg.startswith('--')]
+    flags = [arg for arg in argv if arg.startswith('--')]
+
+    if len(args) < 2:
         print(json.dumps({
-            "error": "Uso: python update_stock_from_sales.py <validated.json> <upload_id>"
+            "error": "Uso: python update_stock_from_sales.py <validated.json> <upload_id> [--concurrency=N] [--profile] [--memory-budget=MB] [--memory-trace]"
         }), file=sys.stderr)
         sys.exit(1)
 
     # Ler JSON validado
-    input_file = sys.argv[1]
-    upload_id = sys.argv[2]
-
-    with open(input_file, 'r', encoding='utf-8') as f:
-        validated_data = json.load(f)
+    input_file = args[0]
+    upload_id = args[1]
+
+    concurrency = int(os.getenv('STOCK_UPDATE_CONCURRENCY', DEFAULT_CONCURRENCY))
+    for flag in flags:
+        if flag.startswith('--concurrency='):
+            concurrency = int(flag.split('=', 1)[1])
+
+    try:
+        with profile_stage('update_stock'), memory_stage('update_stock'):
+            with open(input_file, 'r', encoding='utf-8') as f:
+                validated_data = json.load(f)
+
+            # Processar
+            result = update_stock_from_sales(validated_data, upload_id, concurrency=concurrency)
+    except MemoryBudgetExceeded as e:
+        print(json.dumps(memory_error_result(e), ensure_ascii=False, indent=2))
+        sys.exit(1)
+    result['firestoreOps'] = get_op_stats()
 
-    # Processar
-    result = update_stock_from_sales(validated_data, upload_id)
+    profile = get_profile_summary()
+    if profile:
+        result['profile'] = profile
+    result['memory'] = get_memory_summary()
 
     # Output JSON
     print(json.dumps(result, ensure_ascii=False, indent=2))
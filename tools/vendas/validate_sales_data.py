@@ -2,7 +2,7 @@
 """
 Validate sales data and enrich with recipe mappings
 
-Input: JSON from parse_sales_file.py
+Input: JSON from parse_sales_file.py [--profile] [--memory-budget=MB] [--memory-trace]
 Output: JSON with validSales and invalidSales
 
 Connects to Firestore to fetch product_mappings (SKU → Recipe)
@@ -14,6 +14,11 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from firebase_helper import get_firestore_client
+from tools.common.instrumentation import op_stage, get_op_stats
+from tools.common.profiling import consume_profile_flag, profile_stage, get_profile_summary
+from tools.common.memory_tracking import (
+    consume_memory_flags, memory_stage, get_memory_summary, memory_error_result, MemoryBudgetExceeded
+)
 
 def load_mappings():
     """
@@ -26,16 +31,17 @@ def load_mappings():
     mappings = {}
 
     mappings_ref = db.collection('product_mappings')
-    for doc in mappings_ref.stream():
-        data = doc.to_dict()
-        sku = data.get('sku')
-        if sku:
-            mappings[sku] = {
-                'recipeId': data.get('recipe_id'),
-                'recipeName': data.get('recipe_name'),
-                'confidence': data.get('confidence', 0),
-                'productType': data.get('productType', 'dish')
-            }
+    with op_stage('load_mappings'):
+        for doc in mappings_ref.stream():
+            data = doc.to_dict()
+            sku = data.get('sku')
+            if sku:
+                mappings[sku] = {
+                    'recipeId': data.get('recipe_id'),
+                    'recipeName': data.get('recipe_name'),
+                    'confidence': data.get('confidence', 0),
+                    'productType': data.get('productType', 'dish')
+                }
 
     return mappings
 
@@ -122,19 +128,31 @@ def validate_sales_data(sales_data):
     return result
 
 def main():
-    if len(sys.argv) < 2:
+    args = consume_memory_flags(consume_profile_flag(sys.argv[1:]))
+    if len(args) < 1:
         print(json.dumps({
-            "error": "Uso: python validate_sales_data.py <sales.json>"
+            "error": "Uso: python validate_sales_data.py <sales.json> [--profile] [--memory-budget=MB] [--memory-trace]"
         }), file=sys.stderr)
         sys.exit(1)
 
-    # Ler JSON de entrada
-    input_file = sys.argv[1]
-    with open(input_file, 'r', encoding='utf-8') as f:
-        sales_data = json.load(f)
+    input_file = args[0]
+    try:
+        with profile_stage('validate'), memory_stage('validate'):
+            # Ler JSON de entrada
+            with open(input_file, 'r', encoding='utf-8') as f:
+                sales_data = json.load(f)
+
+            # Validar
+            result = validate_sales_data(sales_data)
+    except MemoryBudgetExceeded as e:
+        print(json.dumps(memory_error_result(e), ensure_ascii=False, indent=2))
+        sys.exit(1)
+    result['firestoreOps'] = get_op_stats()
 
-    # Validar
-    result = validate_sales_data(sales_data)
+    profile = get_profile_summary()
+    if profile:
+        result['profile'] = profile
+    result['memory'] = get_memory_summary()
 
     # Output JSON
     print(json.dumps(result, ensure_ascii=False, indent=2))